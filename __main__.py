@@ -0,0 +1,9 @@
+# -*- coding: utf-8 -*-
+"""Allow running the plugin package as ``python -m kngml2gpkg``."""
+import sys
+
+from .cli import main
+
+# Guarded because worker processes (spawn) re-import this module
+if __name__ == '__main__':
+    sys.exit(main())
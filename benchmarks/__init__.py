@@ -0,0 +1,6 @@
+# -*- coding: utf-8 -*-
+"""Benchmarks of the conversion pipeline on synthetic KN GML files.
+
+Not part of the plugin package deployed to QGIS. Run with
+``python -m kngml2gpkg.benchmarks.run`` (see docs/DEVELOPMENT_NOTES.md).
+"""
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""Synthetic KN GML generator.
+
+Writes a Register C and a Register E GML file shaped like the INSPIRE
+CadastralParcel files of the Slovak cadastre: parcels on a jittered grid
+inside one cadastral unit, coordinates in EPSG:4258 URN axis order
+(latitude longitude), the CadastralZoning of the unit at the end of the C
+file. A configurable share of parcels is written with swapped axes, like the
+corrupt parcels ConversionEngine fixes. Output only depends on the
+arguments and the seed, so benchmark runs read identical files.
+
+Usage:
+    python -m kngml2gpkg.benchmarks.generate --parcels 20000 --vertices 12 OUT_DIR
+"""
+import argparse
+import math
+import os
+import random
+import sys
+
+
+# South-west corner of the synthetic cadastral unit (longitude, latitude)
+ORIGIN = (17.10, 48.10)
+
+# Parcel grid cell size in degrees (about 35 x 45 m)
+CELL = (0.0005, 0.0004)
+
+SRS_NAME = 'urn:ogc:def:crs:EPSG::4258'
+
+_HEADER = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<gml:FeatureCollection xmlns:gml="http://www.opengis.net/gml/3.2" '
+    'xmlns:cp="http://inspire.ec.europa.eu/schemas/cp/4.0" '
+    'xmlns:base="http://inspire.ec.europa.eu/schemas/base/3.3" '
+    'xmlns:gn="http://inspire.ec.europa.eu/schemas/gn/4.0" '
+    'xmlns:gmd="http://www.isotc211.org/2005/gmd">\n'
+)
+_FOOTER = '</gml:FeatureCollection>\n'
+
+
+def _ring(points, swapped):
+    """Return a posList of (lon, lat) points in URN (lat lon) or swapped (lon lat) order"""
+    if swapped:
+        return ' '.join(f"{lon:.8f} {lat:.8f}" for lon, lat in points)
+    return ' '.join(f"{lat:.8f} {lon:.8f}" for lon, lat in points)
+
+
+def parcel_ring(column, row, vertices, rng):
+    """Return the closed outer ring of a grid parcel with the given number of vertices
+
+    Points are spread along the cell boundary and jittered, so rings are not
+    rectangles and consecutive parcels differ.
+    """
+    x0 = ORIGIN[0] + column * CELL[0]
+    y0 = ORIGIN[1] + row * CELL[1]
+    width, height = CELL
+    corners = [(x0, y0), (x0 + width, y0), (x0 + width, y0 + height), (x0, y0 + height)]
+
+    points = []
+    for i in range(max(vertices, 3)):
+        # Position along the perimeter, as a fraction of the 4 sides
+        position = 4 * i / max(vertices, 3)
+        side = int(position)
+        t = position - side
+        (ax, ay), (bx, by) = corners[side], corners[(side + 1) % 4]
+        jitter = 0.05 * (rng.random() - 0.5)
+        points.append((ax + (bx - ax) * t + jitter * width, ay + (by - ay) * t + jitter * height))
+    points.append(points[0])
+    return points
+
+
+def _parcel(register, number, ring, swapped, unit_code):
+    """Return the featureMember XML of one parcel"""
+    label = f"{number // 10 + 1}/{number % 10 + 1}" if register == 'C' else f"{number + 1}"
+    polygon = f'<gml:Polygon gml:id="P{register}.{number}.G"><gml:exterior><gml:LinearRing>' \
+              f'<gml:posList srsDimension="2">{_ring(ring, swapped)}</gml:posList>' \
+              f'</gml:LinearRing></gml:exterior></gml:Polygon>'
+    return (
+        f'<gml:featureMember><cp:CadastralParcel gml:id="SK.{unit_code}.{register}.{number}">'
+        f'<cp:areaValue uom="m2">{1200 + number % 900}</cp:areaValue>'
+        f'<cp:beginLifespanVersion>2021-03-01T00:00:00</cp:beginLifespanVersion>'
+        f'<cp:geometry><gml:MultiSurface gml:id="P{register}.{number}.M" srsName="{SRS_NAME}">'
+        f'<gml:surfaceMember>{polygon}</gml:surfaceMember></gml:MultiSurface></cp:geometry>'
+        f'<cp:inspireId><base:Identifier><base:localId>{unit_code}.{register}.{number}</base:localId>'
+        f'<base:namespace>SK.UGKK.CP.{register}</base:namespace></base:Identifier></cp:inspireId>'
+        f'<cp:label>{label}</cp:label>'
+        f'<cp:nationalCadastralReference>{unit_code}.{register}.{label}</cp:nationalCadastralReference>'
+        f'<cp:validFrom>2021-03-01T00:00:00</cp:validFrom>'
+        f'</cp:CadastralParcel></gml:featureMember>\n'
+    )
+
+
+def _zoning(unit_code, columns, rows):
+    """Return the featureMember XML of the CadastralZoning covering the grid"""
+    x0, y0 = ORIGIN
+    x1, y1 = x0 + columns * CELL[0], y0 + rows * CELL[1]
+    ring = [(x0, y0), (x1, y0), (x1, y1), (x0, y1), (x0, y0)]
+    return (
+        f'<gml:featureMember><cp:CadastralZoning gml:id="SK.{unit_code}.CZ">'
+        f'<cp:beginLifespanVersion>2021-03-01T00:00:00</cp:beginLifespanVersion>'
+        f'<cp:estimatedAccuracy uom="m">0.14</cp:estimatedAccuracy>'
+        f'<cp:geometry><gml:MultiSurface gml:id="CZ.M" srsName="{SRS_NAME}"><gml:surfaceMember>'
+        f'<gml:Polygon gml:id="CZ.G"><gml:exterior><gml:LinearRing>'
+        f'<gml:posList srsDimension="2">{_ring(ring, False)}</gml:posList>'
+        f'</gml:LinearRing></gml:exterior></gml:Polygon></gml:surfaceMember></gml:MultiSurface></cp:geometry>'
+        f'<cp:inspireId><base:Identifier><base:localId>{unit_code}</base:localId>'
+        f'<base:namespace>SK.UGKK.CZ</base:namespace></base:Identifier></cp:inspireId>'
+        f'<cp:label>{unit_code}</cp:label>'
+        f'<cp:level>3</cp:level>'
+        f'<cp:name><gn:GeographicalName><gn:language>slk</gn:language>'
+        f'<gn:sourceOfName>UGKK SR</gn:sourceOfName><gn:pronunciation/>'
+        f'<gn:spelling><gn:SpellingOfName><gn:text>Synteticke {unit_code}</gn:text>'
+        f'<gn:script>Latn</gn:script></gn:SpellingOfName></gn:spelling></gn:GeographicalName></cp:name>'
+        f'<cp:nationalCadastalZoningReference>{unit_code}</cp:nationalCadastalZoningReference>'
+        f'<cp:validFrom>2021-03-01T00:00:00</cp:validFrom>'
+        f'</cp:CadastralZoning></gml:featureMember>\n'
+    )
+
+
+def generate_pair(output_dir, name='800001', parcels=10000, vertices=12, swapped_share=0.01, seed=1):
+    """Write Register C and E GML files of one synthetic cadastral unit
+
+    Args:
+        output_dir: Folder receiving C/<name>.gml and E/<name>.gml
+        name: File name and cadastral unit code
+        parcels: Number of parcels per register
+        vertices: Vertices per parcel ring (without the closing point)
+        swapped_share: Share of parcels (0-1) written with swapped axes
+        seed: Random seed
+
+    Returns:
+        Tuple (C path, E path)
+    """
+    rng = random.Random(seed)
+    columns = max(1, int(math.ceil(math.sqrt(parcels))))
+    rows = max(1, int(math.ceil(parcels / columns)))
+
+    paths = []
+    for register in ('C', 'E'):
+        folder = os.path.join(output_dir, register)
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, f"{name}.gml")
+        with open(path, 'w', encoding='utf-8', newline='\n') as f:
+            f.write(_HEADER)
+            for number in range(parcels):
+                column, row = number % columns, number // columns
+                ring = parcel_ring(column, row, vertices, rng)
+                f.write(_parcel(register, number, ring, rng.random() < swapped_share, name))
+            if register == 'C':
+                f.write(_zoning(name, columns, rows))
+            f.write(_FOOTER)
+        paths.append(path)
+    return tuple(paths)
+
+
+def main(argv=None):
+    """Entry point"""
+    parser = argparse.ArgumentParser(description='Generate synthetic KN Register C/E GML files')
+    parser.add_argument('output', help='Output folder (C/ and E/ subfolders are created)')
+    parser.add_argument('--name', default='800001', help='Cadastral unit code / file name (default: 800001)')
+    parser.add_argument('--parcels', type=int, default=10000, help='Parcels per register (default: 10000)')
+    parser.add_argument('--vertices', type=int, default=12, help='Vertices per parcel (default: 12)')
+    parser.add_argument('--swapped', type=float, default=0.01,
+                        help='Share of parcels with swapped axes, 0-1 (default: 0.01)')
+    parser.add_argument('--seed', type=int, default=1, help='Random seed (default: 1)')
+    args = parser.parse_args(argv)
+
+    c_path, e_path = generate_pair(args.output, args.name, args.parcels, args.vertices, args.swapped, args.seed)
+    print(f"{c_path} ({os.path.getsize(c_path) / 1e6:.1f} MB)")
+    print(f"{e_path} ({os.path.getsize(e_path) / 1e6:.1f} MB)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+"""Benchmark harness for convert_gml_to_gpkg.
+
+Generates (once, cached in the work folder) the synthetic pairs of the
+selected scenarios, converts each of them to every selected format and
+reader under headless QGIS and records wall time, CPU time and peak RSS.
+Every run happens in a fresh spawned process, so peak RSS and caches of one
+run do not leak into the next. The median of the repeats is compared with a
+stored baseline; a run slower than the baseline by more than the threshold
+makes the harness exit with status 1.
+
+Usage:
+    python -m kngml2gpkg.benchmarks.run --scenario small --format GPKG --format DXF
+    python -m kngml2gpkg.benchmarks.run --save-baseline
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from .generate import generate_pair
+
+
+# Scenario name -> generator arguments
+SCENARIOS = {
+    'small': {'parcels': 2000, 'vertices': 12, 'swapped_share': 0.01},
+    'medium': {'parcels': 20000, 'vertices': 12, 'swapped_share': 0.01},
+    'dense': {'parcels': 5000, 'vertices': 80, 'swapped_share': 0.01},
+    'swapped': {'parcels': 5000, 'vertices': 12, 'swapped_share': 0.5},
+}
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+# Relative change of wall time / peak RSS reported as a regression
+DEFAULT_THRESHOLD = 0.10
+
+
+def machine_info():
+    """Return the description of this machine stored with results"""
+    return {
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'cpus': os.cpu_count(),
+        'python': platform.python_version(),
+    }
+
+
+def scenario_pair(work_dir, name, seed=1):
+    """Return (C path, E path) of a scenario, generating the files if needed"""
+    spec = SCENARIOS[name]
+    folder = os.path.join(
+        work_dir, f"{name}-{spec['parcels']}-{spec['vertices']}-{spec['swapped_share']}-{seed}"
+    )
+    c_path = os.path.join(folder, 'C', '800001.gml')
+    e_path = os.path.join(folder, 'E', '800001.gml')
+    if not (os.path.exists(c_path) and os.path.exists(e_path)):
+        generate_pair(folder, '800001', seed=seed, **spec)
+    return c_path, e_path
+
+
+def _run_case(prefix_path, c_path, e_path, output_file, output_format, engine_options):
+    """Convert one pair in a fresh process, return a picklable measurement dict"""
+    from ..core.headless import start_qgis, stop_qgis
+    from ..core.profiling import peak_rss_mb
+
+    app = start_qgis(prefix_path)
+    try:
+        from qgis.core import Qgis
+        from ..core.engine import ConversionEngine, make_transform_context
+
+        messages = []
+
+        def log(message, level=Qgis.Info):
+            if level in (Qgis.Warning, Qgis.Critical):
+                messages.append(message)
+
+        engine = ConversionEngine(log=log, transform_context=make_transform_context(), **engine_options)
+        rss_before = peak_rss_mb()
+        wall, cpu = time.perf_counter(), time.process_time()
+        success = engine.convert_gml_to_gpkg(c_path, e_path, output_file, output_format)
+        return {
+            'success': success,
+            'wall_s': time.perf_counter() - wall,
+            'cpu_s': time.process_time() - cpu,
+            'rss_before_mb': rss_before,
+            'peak_rss_mb': peak_rss_mb(),
+            'output_mb': os.path.getsize(output_file) / 1e6 if os.path.exists(output_file) else None,
+            'qgis': Qgis.version(),
+            'messages': messages[-5:],
+        }
+    finally:
+        stop_qgis(app)
+
+
+def run_case(c_path, e_path, output_file, output_format, engine_options, prefix_path=None):
+    """Run one measurement in a spawned process"""
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+        return pool.submit(_run_case, prefix_path, c_path, e_path, output_file, output_format,
+                           engine_options).result()
+
+
+def case_key(scenario, output_format, engine_options):
+    """Return the key identifying a case in results and baselines"""
+    key = f"{scenario}/{output_format}/{engine_options.get('reader', 'ogr')}"
+    if engine_options.get('bulk_write'):
+        key += '/bulk'
+    if output_format == 'DXF':
+        key += f"/dxf-{engine_options.get('dxf_writer', 'qgis')}"
+    return key
+
+
+def run_benchmarks(scenarios, formats, readers, repeat, work_dir, engine_options, prefix_path=None, log=print):
+    """Run all cases and return the results dict"""
+    cases = {}
+    qgis_version = None
+    for scenario in scenarios:
+        c_path, e_path = scenario_pair(work_dir, scenario)
+        features = 2 * SCENARIOS[scenario]['parcels'] + 1
+        for reader in readers:
+            options = dict(engine_options, reader=reader)
+            for output_format in formats:
+                key = case_key(scenario, output_format, options)
+                extension = '.gpkg' if output_format == 'GPKG' else '.dxf'
+                output_file = os.path.join(work_dir, 'out', f"{scenario}{extension}")
+                os.makedirs(os.path.dirname(output_file), exist_ok=True)
+
+                runs = []
+                for _ in range(repeat):
+                    result = run_case(c_path, e_path, output_file, output_format, options, prefix_path)
+                    if not result['success']:
+                        log(f"✗ {key}: conversion failed {result['messages']}")
+                        break
+                    runs.append(result)
+                    qgis_version = result['qgis']
+                if not runs:
+                    continue
+
+                wall = statistics.median(run['wall_s'] for run in runs)
+                cases[key] = {
+                    'wall_s': round(wall, 4),
+                    'cpu_s': round(statistics.median(run['cpu_s'] for run in runs), 4),
+                    'peak_rss_mb': max(run['peak_rss_mb'] or 0 for run in runs),
+                    'rss_before_mb': max(run['rss_before_mb'] or 0 for run in runs),
+                    'features_per_s': round(features / wall, 1),
+                    'output_mb': runs[-1]['output_mb'],
+                    'runs': [round(run['wall_s'], 4) for run in runs],
+                }
+                log(f"{key:40} {wall:8.2f} s {cases[key]['features_per_s']:10.0f} f/s "
+                    f"{cases[key]['peak_rss_mb']:8.0f} MB")
+
+    return {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'machine': dict(machine_info(), qgis=qgis_version),
+        'repeat': repeat,
+        'cases': cases,
+    }
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD, log=print):
+    """Compare results with a baseline, return the number of regressions"""
+    if baseline.get('machine', {}).get('platform') != results['machine']['platform'] or \
+            baseline.get('machine', {}).get('cpus') != results['machine']['cpus']:
+        log("⚠ Baseline was recorded on another machine, timings may not be comparable")
+
+    regressions = 0
+    for key, case in results['cases'].items():
+        base = baseline.get('cases', {}).get(key)
+        if base is None:
+            log(f"{key:40} (not in baseline)")
+            continue
+        wall_ratio = case['wall_s'] / base['wall_s'] if base['wall_s'] else 1.0
+        rss_ratio = case['peak_rss_mb'] / base['peak_rss_mb'] if base['peak_rss_mb'] else 1.0
+        if wall_ratio > 1 + threshold or rss_ratio > 1 + threshold:
+            marker = '✗'
+            regressions += 1
+        elif wall_ratio < 1 - threshold:
+            marker = '✓'
+        else:
+            marker = '='
+        log(f"{marker} {key:38} time {wall_ratio - 1:+7.1%}  peak RSS {rss_ratio - 1:+7.1%}")
+    return regressions
+
+
+def main(argv=None):
+    """Entry point"""
+    parser = argparse.ArgumentParser(description='Benchmark the KN GML conversion on synthetic data')
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS),
+                        help='Scenario, repeat for several (default: small, medium)')
+    parser.add_argument('-f', '--format', action='append', choices=['GPKG', 'DXF'], type=str.upper,
+                        help='Output format, repeat for several (default: GPKG, DXF)')
+    parser.add_argument('--reader', action='append', choices=['ogr', 'native'],
+                        help='GML reader, repeat for several (default: ogr)')
+    parser.add_argument('--bulk-write', action='store_true', help='Use the bulk GPKG writer')
+    parser.add_argument('--dxf-writer', default='qgis', choices=['qgis', 'native'],
+                        help='DXF writer (default: qgis)')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per case, the median is kept (default: 3)')
+    parser.add_argument('--work-dir', default=os.path.join(tempfile.gettempdir(), 'kngml2gpkg-bench'),
+                        help='Folder for generated GML files and outputs')
+    parser.add_argument('-o', '--output', help='Results JSON (default: results-<time>.json in the work folder)')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='Baseline JSON to compare with')
+    parser.add_argument('--save-baseline', action='store_true', help='Store the results as the new baseline')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='Relative slowdown reported as regression (default: 0.10)')
+    parser.add_argument('--prefix-path', help='QGIS install prefix (default: $QGIS_PREFIX_PATH)')
+    args = parser.parse_args(argv)
+
+    engine_options = {'bulk_write': args.bulk_write, 'dxf_writer': args.dxf_writer}
+    results = run_benchmarks(
+        args.scenario or ['small', 'medium'],
+        list(dict.fromkeys(args.format or ['GPKG', 'DXF'])),
+        list(dict.fromkeys(args.reader or ['ogr'])),
+        args.repeat,
+        args.work_dir,
+        engine_options,
+        args.prefix_path
+    )
+
+    output = args.output or os.path.join(args.work_dir, f"results-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=1)
+    print(f"Results: {output}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=1)
+        print(f"Baseline saved: {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("No baseline to compare with (use --save-baseline)")
+        return 0
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.threshold)
+    print(f"{regressions} regressions")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
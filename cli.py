@@ -0,0 +1,378 @@
+# -*- coding: utf-8 -*-
+"""Command line interface for batch conversion without the QGIS desktop.
+
+Usage (from the folder containing the plugin directory):
+
+    python -m kngml2gpkg convert --c-dir SlovenskoC --e-dir SlovenskoE --output out
+    python -m kngml2gpkg mosaic --c-dir SlovenskoC --e-dir SlovenskoE --output slovensko.gpkg -j 0
+    python -m kngml2gpkg watch --c-dir inbox/C --e-dir inbox/E --output out -j 2
+    python -m kngml2gpkg serve --listen 127.0.0.1:8765 -j 2
+"""
+import argparse
+import os
+import sys
+
+from .core.headless import start_qgis, stop_qgis
+
+
+def _list_gml(folder):
+    """Return sorted GML paths of the .gml, .gml.gz and .zip files in folder"""
+    from .core.vsi import list_inputs
+    return list_inputs(folder)
+
+
+def _print_log(message, level=None):
+    """Log callback printing to stdout, warnings and errors to stderr"""
+    from qgis.core import Qgis
+    stream = sys.stdout if level in (None, Qgis.Info) else sys.stderr
+    print(message, file=stream, flush=True)
+
+
+def _add_common_arguments(parser):
+    """Add the input folder and engine options shared by the batch commands"""
+    parser.add_argument('--c-dir', required=True, help='Folder with Register C GML files')
+    parser.add_argument('--e-dir', required=True, help='Folder with Register E GML files')
+    _add_engine_arguments(parser)
+
+
+def _add_engine_arguments(parser):
+    """Add the engine and worker options shared by all commands"""
+    parser.add_argument('--project', help='QGIS project whose transform context is used')
+    parser.add_argument('--operation',
+                        help='PROJ pipeline forced for EPSG:4258 -> EPSG:5514')
+    parser.add_argument('-j', '--workers', type=int, default=1,
+                        help='Number of worker processes converting pairs in parallel '
+                             '(default: 1, 0 = one per CPU)')
+    parser.add_argument('--batch-size', type=int, default=1000,
+                        help='Number of features written to the GPKG at once (default: 1000)')
+    parser.add_argument('--reader', default='ogr', choices=['ogr', 'native'],
+                        help='GML reader: OGR GML driver or native streaming KN reader (default: ogr)')
+    parser.add_argument('--parse-workers', type=int, default=1,
+                        help='Worker processes parsing one large GML file in parallel byte ranges '
+                             '(native reader only, default: 1)')
+    parser.add_argument('--gfs-cache', metavar='DIR',
+                        help='Folder for cached GML schema (.gfs) templates (default: user cache folder)')
+    parser.add_argument('--no-gfs-cache', action='store_true',
+                        help='Do not cache GML schemas, delete generated .gfs files instead')
+    parser.add_argument('--hilbert', action='store_true',
+                        help='Store the features of each layer in Hilbert curve order of their centroids '
+                             '(faster map display, holds each layer in memory)')
+    parser.add_argument('--attribute-index', action='append', metavar='LAYER=FIELD[,FIELD...]',
+                        help='Attribute indexes of a GPKG layer, replacing its defaults; repeat for '
+                             'several layers, an empty field list disables them for the layer')
+    parser.add_argument('--no-attribute-indexes', action='store_true',
+                        help='Do not create attribute indexes in GPKG outputs')
+    parser.add_argument('--prefix-path', help='QGIS install prefix (default: $QGIS_PREFIX_PATH)')
+
+
+def _add_output_arguments(parser):
+    """Add the output options shared by the convert and watch commands"""
+    parser.add_argument('-f', '--format', action='append', choices=['GPKG', 'DXF'], type=str.upper,
+                        help='Output format, repeat to write several formats in one pass (default: GPKG)')
+    parser.add_argument('--update', action='store_true',
+                        help='Update existing GPKG outputs in place, writing only changed features '
+                             '(implies --overwrite)')
+    parser.add_argument('--bulk-write', action='store_true',
+                        help='Write all GPKG layers in one transaction and build spatial indexes at the end')
+    parser.add_argument('--dxf-writer', default='qgis', choices=['qgis', 'native'],
+                        help='DXF writer: QgsDxfExport or native streaming writer (default: qgis)')
+
+
+def build_parser():
+    """Create the argument parser"""
+    parser = argparse.ArgumentParser(
+        prog='kngml2gpkg',
+        description='Convert Slovak cadastral GML files (KN Register C and E) to GeoPackage or DXF'
+    )
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    convert = subparsers.add_parser('convert', help='Convert all matching C/E pairs of two folders')
+    _add_common_arguments(convert)
+    convert.add_argument('-o', '--output', required=True, help='Output folder')
+    _add_output_arguments(convert)
+    convert.add_argument('--overwrite', action='store_true',
+                         help='Overwrite existing output files (default: skip them)')
+    convert.add_argument('--force', action='store_true',
+                         help='Convert pairs again even if the manifest shows them unchanged')
+    convert.add_argument('--profile', action='store_true',
+                         help='Write a per-stage profiling report (JSON) for every pair and a batch summary')
+    convert.set_defaults(func=run_convert)
+
+    mosaic = subparsers.add_parser('mosaic', help='Merge all matching C/E pairs into one national GPKG')
+    _add_common_arguments(mosaic)
+    mosaic.add_argument('-o', '--output', required=True, help='Output GPKG file')
+    mosaic.set_defaults(func=run_mosaic)
+
+    watch = subparsers.add_parser('watch', help='Watch the C and E folders and convert pairs as they arrive')
+    _add_common_arguments(watch)
+    watch.add_argument('-o', '--output', required=True, help='Output folder')
+    _add_output_arguments(watch)
+    watch.add_argument('--settle', type=float, default=5.0,
+                       help='Seconds a file must stay unchanged before it is converted (default: 5)')
+    watch.add_argument('--poll', action='store_true',
+                       help='Poll the folders instead of using inotify (network shares, non-Linux systems)')
+    watch.add_argument('--poll-interval', type=float, default=2.0,
+                       help='Seconds between folder listings when polling (default: 2)')
+    watch.set_defaults(func=run_watch)
+
+    serve = subparsers.add_parser('serve', help='Keep warm workers and convert jobs submitted over a local HTTP API')
+    _add_engine_arguments(serve)
+    _add_output_arguments(serve)
+    serve.add_argument('--listen', default='127.0.0.1:8765',
+                       help='HOST:PORT or Unix socket path the job API listens on (default: 127.0.0.1:8765)')
+    serve.add_argument('--profile', action='store_true',
+                       help='Write a per-stage profiling report for every job and return it with the job status')
+    serve.set_defaults(func=run_serve)
+
+    return parser
+
+
+def _engine_options(args):
+    """Return ConversionEngine keyword arguments from the command line options"""
+    from .core.gfs_cache import GfsCache
+    return {
+        'batch_size': args.batch_size,
+        'gfs_cache': None if args.no_gfs_cache else GfsCache(args.gfs_cache),
+        'reader': args.reader,
+        'parse_workers': args.parse_workers,
+        'bulk_write': getattr(args, 'bulk_write', False),
+        'dxf_writer': getattr(args, 'dxf_writer', 'qgis'),
+        'update_existing': getattr(args, 'update', False),
+        'hilbert_order': args.hilbert,
+        'attribute_indexes': _attribute_indexes(args),
+        'profile': getattr(args, 'profile', False),
+    }
+
+
+def _attribute_indexes(args):
+    """Return the attribute indexes from --attribute-index/--no-attribute-indexes"""
+    from .core.gpkg_writer import ATTRIBUTE_INDEXES
+    if args.no_attribute_indexes:
+        return {}
+    indexes = dict(ATTRIBUTE_INDEXES)
+    for value in args.attribute_index or []:
+        layer_name, _, field_names = value.partition('=')
+        indexes[layer_name.strip()] = tuple(name.strip() for name in field_names.split(',') if name.strip())
+    return indexes
+
+
+def _find_pairs(args):
+    """Return the C/E pairs of the input folders, logging unmatched files"""
+    from qgis.core import Qgis
+    from .core.engine import find_pairs
+
+    pairs, missing_e, missing_c = find_pairs(_list_gml(args.c_dir), _list_gml(args.e_dir))
+    for basename in missing_e:
+        _print_log(f"⚠ No matching E file for {basename}", Qgis.Warning)
+    for basename in missing_c:
+        _print_log(f"⚠ No matching C file for {basename}", Qgis.Warning)
+    return pairs
+
+
+def run_convert(args):
+    """Convert all pairs found in the C and E folders"""
+    from qgis.core import Qgis
+    from .core.engine import (ConversionEngine, PLUGIN_DIR, conversion_settings, output_files,
+                              make_transform_context)
+    from .core.manifest import Manifest, complete_record
+
+    formats = list(dict.fromkeys(args.format or ['GPKG']))
+    pairs = _find_pairs(args)
+
+    engine_options = _engine_options(args)
+    transform_context = make_transform_context(args.project, args.operation)
+
+    # Skip pairs converted before from the same inputs with the same settings
+    manifest = Manifest(args.output)
+    settings = conversion_settings(transform_context, PLUGIN_DIR, engine_options)
+    if args.force:
+        # Everything is converted: no planning, the records only need file stats
+        records = {basename: manifest.pair_record(c_path, e_path, basename, settings)
+                   for c_path, e_path, basename in pairs}
+    else:
+        pairs, unchanged, records = manifest.plan(
+            pairs, lambda basename: output_files(args.output, basename, formats), settings
+        )
+        for basename in unchanged:
+            _print_log(f"Skipping {basename}: unchanged since last conversion (use --force)")
+        if unchanged:
+            _print_log(f"{len(unchanged)} unchanged pairs skipped")
+
+    if not args.overwrite and not args.update:
+        existing = [
+            p for p in pairs
+            if all(os.path.exists(f) for f in output_files(args.output, p[2], formats).values())
+        ]
+        for _, _, basename in existing:
+            _print_log(f"Skipping {basename}: output exists (use --overwrite)")
+        pairs = [p for p in pairs if p not in existing]
+
+    if not pairs:
+        _print_log("No GML pairs to process")
+        return 0
+
+    os.makedirs(args.output, exist_ok=True)
+
+    _print_log(f"Found {len(pairs)} matching GML pairs to process")
+    _print_log(f"Output format: {', '.join(formats)}")
+    _print_log("=" * 50)
+
+    if args.workers == 1:
+        engine = ConversionEngine(
+            log=_print_log,
+            transform_context=transform_context,
+            **engine_options
+        )
+        results = engine.convert_batch(pairs, args.output, formats)
+        # Input hashes of the converted pairs, read after their conversion in this process
+        paths = {basename: (c_path, e_path) for c_path, e_path, basename in pairs}
+        for basename, _, success in results:
+            if success:
+                complete_record(records[basename], *paths[basename])
+    else:
+        from .core.parallel import convert_parallel
+        results = convert_parallel(
+            pairs, args.output, formats,
+            workers=args.workers or None,
+            log=_print_log,
+            prefix_path=args.prefix_path,
+            project_path=args.project,
+            operation=args.operation,
+            engine_options=engine_options,
+            records=records
+        )
+
+    for basename, _, success in results:
+        if success:
+            manifest.update(basename, records[basename], output_files(args.output, basename, formats))
+    try:
+        manifest.save()
+    except OSError as e:
+        _print_log(f"⚠ Could not write manifest: {e}", Qgis.Warning)
+
+    success_count = sum(1 for _, _, success in results if success)
+    failed_count = len(results) - success_count
+
+    _print_log("=" * 50)
+    _print_log(f"COMPLETED: {success_count} successful, {failed_count} failed")
+
+    if args.profile:
+        from .core.profiling import SUMMARY_NAME, report_path, write_summary
+        summary_path = os.path.join(args.output, SUMMARY_NAME)
+        try:
+            summary = write_summary(
+                [report_path(output_files(args.output, basename, formats)) for basename, _, _ in results],
+                summary_path
+            )
+            _print_log(f"Profile summary: {summary_path} ({summary['wall_s']:.1f} s in {summary['pairs']} pairs)")
+        except OSError as e:
+            _print_log(f"⚠ Could not write profile summary: {e}", Qgis.Warning)
+
+    return 1 if failed_count else 0
+
+
+def run_mosaic(args):
+    """Merge all pairs found in the C and E folders into one GPKG"""
+    from .core.engine import make_transform_context
+    from .core.mosaic import build_mosaic
+
+    pairs = _find_pairs(args)
+    if not pairs:
+        _print_log("No GML pairs to process")
+        return 0
+
+    output_folder = os.path.dirname(os.path.abspath(args.output))
+    os.makedirs(output_folder, exist_ok=True)
+
+    _print_log(f"Merging {len(pairs)} GML pairs into {args.output}")
+    _print_log("=" * 50)
+
+    merged, failed = build_mosaic(
+        pairs, args.output,
+        workers=args.workers,
+        log=_print_log,
+        prefix_path=args.prefix_path,
+        project_path=args.project,
+        operation=args.operation,
+        engine_options=_engine_options(args),
+        transform_context=make_transform_context(args.project, args.operation) if args.workers == 1 else None
+    )
+
+    _print_log("=" * 50)
+    _print_log(f"COMPLETED: {merged} units merged, {failed} failed")
+
+    return 1 if failed or not merged else 0
+
+
+def run_watch(args):
+    """Convert pairs arriving in the C and E folders until interrupted"""
+    import signal
+    from .core.engine import PLUGIN_DIR, conversion_settings, make_transform_context
+    from .core.hotfolder import HotFolder
+    from .core.manifest import Manifest
+
+    formats = list(dict.fromkeys(args.format or ['GPKG']))
+    engine_options = _engine_options(args)
+    transform_context = make_transform_context(args.project, args.operation)
+    os.makedirs(args.output, exist_ok=True)
+
+    hot_folder = HotFolder(
+        args.c_dir, args.e_dir, args.output, formats,
+        Manifest(args.output),
+        conversion_settings(transform_context, PLUGIN_DIR, engine_options),
+        log=_print_log,
+        workers=args.workers or os.cpu_count() or 1,
+        settle=args.settle,
+        polling=args.poll,
+        poll_interval=args.poll_interval,
+        prefix_path=args.prefix_path,
+        project_path=args.project,
+        operation=args.operation,
+        engine_options=engine_options
+    )
+    # systemd and docker stop with SIGTERM: finish running conversions, then exit
+    signal.signal(signal.SIGTERM, lambda signum, frame: hot_folder.stop())
+
+    _, failed = hot_folder.run()
+    return 1 if failed else 0
+
+
+def run_serve(args):
+    """Serve conversion jobs until interrupted"""
+    import signal
+    from .core.server import run_server, stop_server
+
+    # systemd and docker stop with SIGTERM: finish running jobs, then exit
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop_server())
+
+    return run_server(
+        args.listen,
+        args.workers or os.cpu_count() or 1,
+        log=_print_log,
+        formats=list(dict.fromkeys(args.format or ['GPKG'])),
+        profile=args.profile,
+        prefix_path=args.prefix_path,
+        project_path=args.project,
+        operation=args.operation,
+        engine_options=_engine_options(args)
+    )
+
+
+def main(argv=None):
+    """Entry point"""
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if getattr(args, 'parse_workers', 1) > 1 and args.reader != 'native':
+        parser.error('--parse-workers requires --reader native')
+    if any('=' not in value for value in args.attribute_index or []):
+        parser.error('--attribute-index expects LAYER=FIELD[,FIELD...]')
+
+    app = start_qgis(getattr(args, 'prefix_path', None))
+    try:
+        return args.func(args)
+    finally:
+        stop_qgis(app)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
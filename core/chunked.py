@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+"""Parallel parsing of one large KN GML file.
+
+A pre-pass over the memory-mapped file records the byte offset of every
+featureMember start tag (of every feature inside a featureMembers wrapper).
+The members are split into contiguous byte ranges, each range is wrapped in
+a copy of the root start tag (for the namespace declarations) and of the
+wrapper, and parsed with the native KN parser in a worker process. Ranges
+are merged back in file order, so the output keeps the original feature
+order. The worker processes are started once per process and reused for
+every file.
+"""
+import atexit
+import bisect
+import io
+import multiprocessing
+import re
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from .kn_reader import KnGmlReader, iter_records
+
+
+_ROOT_START = re.compile(rb'<(?![?!])[^>]*>', re.S)
+_ROOT_NAME = re.compile(rb'<([^\s>/]+)')
+_MEMBER_START = re.compile(rb'<(?:[\w.-]+:)?(featureMembers|featureMember|member)[\s>]')
+_TAG_END = re.compile(rb'>')
+_FEATURE_START = re.compile(rb'<(?:[\w.-]+:)?(?:CadastralParcel|CadastralZoning)[\s>]')
+
+# Files smaller than this are parsed sequentially
+MIN_PARALLEL_SIZE = 32 * 1024 * 1024
+
+# Ranges per worker (smaller ranges balance better, larger ones cost less overhead)
+RANGES_PER_WORKER = 4
+
+# Parse pools of this process by number of workers, shared by all readers
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def parse_pool(workers):
+    """Return the process pool parsing byte ranges with this many workers
+
+    The pool is created on first use and kept until the process exits, so the
+    interpreter start of the workers is paid once and not for every file.
+    """
+    with _pools_lock:
+        pool = _pools.get(workers)
+        if pool is None:
+            if not _pools:
+                atexit.register(shutdown_parse_pools)
+            # spawn gives every worker a clean interpreter (no inherited QGIS state)
+            pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+            _pools[workers] = pool
+        return pool
+
+
+def _discard_pool(workers, pool):
+    """Forget a broken pool, the next file starts a new one"""
+    with _pools_lock:
+        if _pools.get(workers) is pool:
+            del _pools[workers]
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_parse_pools():
+    """Stop the worker processes of all parse pools"""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+class MemberIndex:
+    """Byte offsets of the feature members of a GML file
+
+    Attributes:
+        root_start: Root start tag (with namespace declarations) and, for a
+            featureMembers wrapper, the wrapper start tag
+        root_end: Wrapper and root end tags
+        offsets: Offsets of the member start tags (of the features inside a
+            featureMembers wrapper), in file order
+        end: Offset of the wrapper or root end tag
+    """
+
+    def __init__(self, root_start, root_end, offsets, end):
+        self.root_start = root_start
+        self.root_end = root_end
+        self.offsets = offsets
+        self.end = end
+
+    def ranges(self, count):
+        """Split the members into at most count byte ranges of similar size
+
+        Returns:
+            List of (start, end) offsets, each starting at a member boundary
+        """
+        if not self.offsets:
+            return []
+        first = self.offsets[0]
+        span = self.end - first
+        starts = [first]
+        for k in range(1, count):
+            position = bisect.bisect_left(self.offsets, first + span * k / count)
+            if position < len(self.offsets) and self.offsets[position] > starts[-1]:
+                starts.append(self.offsets[position])
+        return list(zip(starts, starts[1:] + [self.end]))
+
+
+def index_members(buffer):
+    """Build the MemberIndex of a GML buffer (bytes or mmap), None if not a feature collection"""
+    root = _ROOT_START.search(buffer)
+    if root is None:
+        return None
+    root_start = root.group(0)
+    name = _ROOT_NAME.match(root_start).group(1)
+    root_end = b'</' + name + b'>'
+    end = buffer.rfind(root_end)
+    if end < 0:
+        return None
+
+    first = _MEMBER_START.search(buffer, root.end(), end)
+    if first is None or first.group(1) != b'featureMembers':
+        offsets = [match.start() for match in _MEMBER_START.finditer(buffer, root.end(), end)]
+        return MemberIndex(root_start, root_end, offsets, end)
+
+    # One wrapper holds all features: ranges start at feature boundaries inside it
+    tag_end = _TAG_END.search(buffer, first.end() - 1)
+    wrapper_start = buffer[first.start():tag_end.end()]
+    wrapper_end = b'</' + _ROOT_NAME.match(wrapper_start).group(1) + b'>'
+    members_end = buffer.rfind(wrapper_end, tag_end.end(), end)
+    if members_end < 0:
+        return None
+    offsets = [match.start() for match in _FEATURE_START.finditer(buffer, tag_end.end(), members_end)]
+    return MemberIndex(root_start + wrapper_start, wrapper_end + root_end, offsets, members_end)
+
+
+def parse_range(path, root_start, root_end, start, end, layer_names, swap_axes):
+    """Parse one byte range of a GML file (runs in a worker process)
+
+    Returns:
+        Tuple (list of KnRecord in file order, set of properties not in KN_SCHEMA)
+    """
+    with open(path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    source = io.BytesIO(root_start + data + root_end)
+    unknown = set()
+    return list(iter_records(source, layer_names, swap_axes, unknown)), unknown
+
+
+class ChunkedKnGmlReader(KnGmlReader):
+    """KnGmlReader that parses byte ranges of one file in worker processes
+
+    Args:
+        path: GML file path
+        workers: Number of worker processes
+        min_parallel_size: Files smaller than this (bytes) are parsed sequentially
+        layer_names: Feature classes the caller reads (see KnGmlReader)
+    """
+
+    def __init__(self, path, workers, min_parallel_size=MIN_PARALLEL_SIZE, layer_names=None):
+        super().__init__(path, layer_names)
+        self.workers = workers
+        self.min_parallel_size = min_parallel_size
+
+    def records(self, layer_names):
+        """Parse the file in parallel and yield KnRecord in file order
+
+        Yields:
+            Tuple (KnRecord, fraction of the file read 0-1)
+        """
+        size = max(len(self._map), 1)
+        index = None
+        if self.workers > 1 and size >= self.min_parallel_size:
+            index = index_members(self._map)
+
+        if index is None or len(index.offsets) < 2:
+            yield from super().records(layer_names)
+            return
+
+        ranges = index.ranges(self.workers * RANGES_PER_WORKER)
+        layer_names = list(layer_names)
+
+        pool = parse_pool(self.workers)
+        pending = deque()
+        try:
+            remaining = deque(ranges)
+            while remaining or pending:
+                # Keep a bounded number of ranges in flight so parsed records do not pile up
+                while remaining and len(pending) < self.workers * 2:
+                    start, end = remaining.popleft()
+                    future = pool.submit(
+                        parse_range, self.path, index.root_start, index.root_end,
+                        start, end, layer_names, self.swap_axes
+                    )
+                    pending.append((end, future))
+
+                end, future = pending.popleft()
+                records, unknown = future.result()
+                self.unknown_properties.update(unknown)
+                for record in records:
+                    yield record, end / size
+        except BrokenProcessPool:
+            _discard_pool(self.workers, pool)
+            raise
+        finally:
+            # Canceled or failed: drop the ranges not started yet, the pool stays for the next file
+            for _, future in pending:
+                future.cancel()
@@ -0,0 +1,316 @@
+# -*- coding: utf-8 -*-
+"""In-place delta update of an existing output GeoPackage.
+
+Instead of deleting and rewriting the GPKG, DeltaSink matches the converted
+features with the existing rows by gml_id (localId when gml_id is empty) and
+compares a hash of geometry and attributes with the one stored for the row
+in the kn_delta_hashes table. Only new, changed and vanished features are
+inserted, updated or deleted, in one transaction. The GPKG R-tree triggers
+keep the spatial index current row by row, and the file, its fids and its
+layer_styles stay in place.
+
+Full conversions in update mode store the same hashes (HashRecorder). A row
+without a stored hash (a file written without update mode) is read and
+compared field by field once; unchanged rows only get their hash, so the
+first update of any file only touches the features that changed. Features
+without a key cannot be matched: all of them are deleted and inserted again
+on every update.
+"""
+import hashlib
+
+from osgeo import gdal, ogr
+
+from qgis.PyQt.QtCore import QDate, QDateTime, QTime, Qt
+
+from .gpkg_writer import (
+    create_attribute_indexes,
+    delete_feature_hashes,
+    read_feature_hashes,
+    to_ogr_feature,
+    write_feature_hashes,
+)
+
+
+# Fields identifying a feature, in order of preference
+KEY_FIELDS = ('gml_id', 'localId')
+
+
+class DeltaError(Exception):
+    """Raised when a GeoPackage cannot be updated in place"""
+
+
+def feature_hash(feature):
+    """Return the hash (hex) of geometry and attributes of a QgsFeature"""
+    digest = hashlib.blake2b(digest_size=16)
+    geom = feature.geometry()
+    if not geom.isNull():
+        digest.update(bytes(geom.asWkb()))
+    for value in feature.attributes():
+        if value is None or (hasattr(value, 'isNull') and value.isNull()):
+            digest.update(b'\x00')
+        elif isinstance(value, (QDateTime, QDate, QTime)):
+            digest.update(value.toString(Qt.ISODateWithMs).encode())
+        else:
+            digest.update(str(value).encode())
+        digest.update(b'\x1f')
+    return digest.hexdigest()
+
+
+def key_indexes(fields):
+    """Return the indexes of the KEY_FIELDS present in QgsFields, in order of preference"""
+    return [fields.indexOf(name) for name in KEY_FIELDS if fields.indexOf(name) >= 0]
+
+
+def feature_key(feature, indexes):
+    """Return the key (str) of a QgsFeature, None if all key fields are empty"""
+    for index in indexes:
+        value = feature.attribute(index)
+        if value is not None and not (hasattr(value, 'isNull') and value.isNull()) and str(value):
+            return str(value)
+    return None
+
+
+class HashRecorder:
+    """Collects the key and hash of every feature written by a full conversion
+
+    Attributes:
+        hashes: Dict layer name -> list of (key, hash)
+    """
+
+    def __init__(self):
+        self.hashes = {}
+
+    def wrap(self, layer_name, fields, writer):
+        """Return writer recording the hashes of the features it is given"""
+        return HashingWriter(writer, key_indexes(fields), self.hashes.setdefault(layer_name, []))
+
+
+class HashingWriter:
+    """Writer wrapper with the addFeatures()/errorMessage() interface of QgsVectorFileWriter"""
+
+    def __init__(self, writer, indexes, hashes):
+        self.writer = writer
+        self.indexes = indexes
+        self.hashes = hashes
+
+    def addFeatures(self, features):
+        """Record the hashes of keyed features and write them"""
+        for feature in features:
+            key = feature_key(feature, self.indexes)
+            if key is not None:
+                self.hashes.append((key, feature_hash(feature)))
+        return self.writer.addFeatures(features)
+
+    def errorMessage(self):
+        return self.writer.errorMessage()
+
+
+class DeltaSink:
+    """Sink updating the layers of an existing GPKG in one transaction
+
+    Args:
+        path: Existing GPKG path
+        layer_names: Layers that must exist in the file
+        attribute_indexes: Dict layer name -> indexed field names, created if missing
+    """
+
+    def __init__(self, path, layer_names, attribute_indexes=None):
+        self.path = path
+        self.attribute_indexes = attribute_indexes or {}
+        try:
+            self.dataset = gdal.OpenEx(path, gdal.OF_VECTOR | gdal.OF_UPDATE, allowed_drivers=['GPKG'])
+        except RuntimeError as e:
+            raise DeltaError(str(e))
+        if self.dataset is None:
+            raise DeltaError(gdal.GetLastErrorMsg() or f"Could not open {path}")
+
+        missing = [name for name in layer_names if self.dataset.GetLayerByName(name) is None]
+        if missing:
+            self.dataset = None
+            raise DeltaError(f"Layers missing in {path}: {', '.join(missing)}")
+
+        try:
+            # Rows are matched before anything is written, duplicate keys fall back to a full conversion
+            self._existing = {
+                name: read_existing(self.dataset.GetLayerByName(name), read_feature_hashes(self.dataset, name))
+                for name in layer_names
+            }
+        except DeltaError:
+            self.dataset = None
+            raise
+
+        if self.dataset.StartTransaction() != ogr.OGRERR_NONE:
+            self.dataset = None
+            raise DeltaError(f"Could not start transaction on {path}")
+        self.layers = {}
+
+    def create_layer(self, layer_name, fields):
+        """Return the updater of an existing layer
+
+        Returns:
+            DeltaLayer with the addFeatures()/errorMessage() interface of QgsVectorFileWriter
+        """
+        layer = DeltaLayer(self.dataset.GetLayerByName(layer_name), fields, *self._existing[layer_name])
+        self.layers[layer_name] = layer
+        return layer
+
+    def close(self):
+        """Delete vanished features, store the changed hashes and commit
+
+        Returns:
+            Dict layer name -> (inserted, updated, deleted), None if the commit failed
+        """
+        counts = {}
+        for layer_name, layer in self.layers.items():
+            deleted = layer.delete_unseen()
+            counts[layer_name] = (layer.inserted, layer.updated, deleted)
+            write_feature_hashes(self.dataset, {layer_name: layer.changed.items()})
+            delete_feature_hashes(self.dataset, layer_name, layer.removed)
+        # Files written before attribute indexes existed get them on their first update
+        create_attribute_indexes(self.dataset, self.attribute_indexes)
+
+        success = self.dataset.CommitTransaction() == ogr.OGRERR_NONE
+        self.dataset = None
+        return counts if success else None
+
+    def abort(self):
+        """Roll back all changes"""
+        if self.dataset is not None:
+            self.dataset.RollbackTransaction()
+            self.dataset = None
+
+
+def read_existing(ogr_layer, hashes):
+    """Read the keys of the rows of an existing layer
+
+    Args:
+        ogr_layer: OGR layer
+        hashes: Dict key -> hash of the rows (read_feature_hashes)
+
+    Returns:
+        Tuple (dict key -> (fid, hash or None), fids of the rows without key)
+
+    Raises:
+        DeltaError: if several rows have the same key
+    """
+    layer_defn = ogr_layer.GetLayerDefn()
+    key_names = [name for name in KEY_FIELDS if layer_defn.GetFieldIndex(name) >= 0]
+    ignored = [
+        layer_defn.GetFieldDefn(i).GetName()
+        for i in range(layer_defn.GetFieldCount())
+        if layer_defn.GetFieldDefn(i).GetName() not in key_names
+    ]
+    ogr_layer.SetIgnoredFields(ignored + ['OGR_GEOMETRY'])
+
+    existing = {}
+    keyless = []
+    ogr_layer.ResetReading()
+    try:
+        for ogr_feature in ogr_layer:
+            key = next((ogr_feature.GetField(name) for name in key_names if ogr_feature.GetField(name)), None)
+            if key is None:
+                keyless.append(ogr_feature.GetFID())
+                continue
+            key = str(key)
+            if key in existing:
+                raise DeltaError(f"Duplicate key {key} in {ogr_layer.GetName()}")
+            existing[key] = (ogr_feature.GetFID(), hashes.get(key))
+    finally:
+        ogr_layer.SetIgnoredFields([])
+    return existing, keyless
+
+
+class DeltaLayer:
+    """Updater of one existing GPKG layer
+
+    Args:
+        ogr_layer: Existing OGR layer
+        fields: QgsFields of the converted features
+        existing: Dict key -> (fid, hash) of the existing rows (read_existing)
+        keyless: Fids of the existing rows without key
+    """
+
+    def __init__(self, ogr_layer, fields, existing, keyless):
+        self.ogr_layer = ogr_layer
+        self.layer_defn = ogr_layer.GetLayerDefn()
+
+        # Attributes are matched by name, the existing layer may order them differently
+        self.field_indexes = [self.layer_defn.GetFieldIndex(field.name()) for field in fields]
+        self.key_indexes = key_indexes(fields)
+
+        self.existing = existing
+        self.keyless = keyless
+        self.seen = set()
+        # Key -> hash of inserted and updated features, keys of deleted ones
+        self.changed = {}
+        self.removed = []
+        self.inserted = 0
+        self.updated = 0
+        self._error = ''
+
+    def addFeatures(self, features):
+        """Insert new and update changed features, return False on error
+
+        Features without key are always inserted (their old rows are deleted
+        by delete_unseen); a key seen twice in the new data is an error. A row
+        without stored hash is compared with the converted feature and only
+        gets its hash if they are equal.
+        """
+        for feature in features:
+            key = feature_key(feature, self.key_indexes)
+            digest = feature_hash(feature)
+            previous = None
+            if key is not None:
+                if key in self.seen:
+                    self._error = (f"Duplicate key {key} in {self.ogr_layer.GetName()}, "
+                                   f"cannot update in place (convert without update)")
+                    return False
+                self.seen.add(key)
+                previous = self.existing.get(key)
+                if previous is not None and previous[1] == digest:
+                    continue
+
+            ogr_feature = to_ogr_feature(feature, self.layer_defn, self.field_indexes)
+            if previous is None:
+                result = self.ogr_layer.CreateFeature(ogr_feature)
+                self.inserted += 1
+            else:
+                ogr_feature.SetFID(previous[0])
+                if previous[1] is None and self._unchanged(ogr_feature):
+                    self.changed[key] = digest
+                    continue
+                result = self.ogr_layer.SetFeature(ogr_feature)
+                self.updated += 1
+
+            if result != ogr.OGRERR_NONE:
+                self._error = gdal.GetLastErrorMsg() or 'Could not write feature'
+                return False
+            if key is not None:
+                self.changed[key] = digest
+        return True
+
+    def _unchanged(self, ogr_feature):
+        """Return True if the stored row with the fid of ogr_feature has the same geometry and fields"""
+        stored = self.ogr_layer.GetFeature(ogr_feature.GetFID())
+        return stored is not None and bool(stored.Equal(ogr_feature))
+
+    def delete_unseen(self):
+        """Delete rows whose key was not in the new data and the old rows without key
+
+        Returns:
+            Number of deleted rows
+        """
+        deleted = 0
+        for key, (fid, _) in self.existing.items():
+            if key not in self.seen:
+                self.ogr_layer.DeleteFeature(fid)
+                self.removed.append(key)
+                deleted += 1
+        for fid in self.keyless:
+            self.ogr_layer.DeleteFeature(fid)
+            deleted += 1
+        return deleted
+
+    def errorMessage(self):
+        """Return the last write error"""
+        return self._error
@@ -0,0 +1,302 @@
+# -*- coding: utf-8 -*-
+"""Streaming DXF writer for the cadastral layers.
+
+QgsDxfExport renders every feature through the symbology and labeling engine
+and keeps the whole document in memory until writeToFile. The KN layout is
+fixed (parcel and cadastral unit outlines plus the parcel number), so this
+writer emits LWPOLYLINE and TEXT entities directly while features arrive.
+Layer colours, text colour, font and text height are read once from the
+bundled QML styles (read_dxf_style); memory use does not depend on the
+number of features.
+
+The output is a DXF R2000 (AC1015) file with the tables, blocks and objects
+CAD applications require. $HANDSEED and the drawing extents are written as
+fixed width placeholders in the header and filled in by close().
+"""
+import struct
+import xml.etree.ElementTree as ET
+
+from .wkb import coordinate_arrays
+
+
+# Map scale the text heights are computed for (same as the QgsDxfExport path)
+DXF_SCALE = 500.0
+
+# Millimetres per font size unit of QGIS text formats
+_FONT_UNITS_MM = {
+    'MM': 1.0,
+    'Point': 25.4 / 72,
+    'Pixel': 25.4 / 96,
+}
+
+# Width of the header placeholders patched by close()
+_PLACEHOLDER_WIDTH = 24
+
+
+def _qgis_color(value):
+    """Parse a QGIS colour string 'r,g,b,a,...' into (r, g, b)"""
+    parts = value.split(',')
+    return tuple(int(part) for part in parts[:3])
+
+
+def read_dxf_style(qml_path, scale=DXF_SCALE):
+    """Read DXF output settings from a QML style
+
+    Args:
+        qml_path: QML file of the layer
+        scale: Map scale denominator used for the text height
+
+    Returns:
+        Dict with color (r, g, b), label_field (None without labels),
+        text_height (map units), text_color (r, g, b) and font
+    """
+    root = ET.parse(qml_path).getroot()
+
+    style = {
+        'color': (0, 0, 0),
+        'label_field': None,
+        'text_height': 0.0,
+        'text_color': (0, 0, 0),
+        'font': None,
+    }
+
+    # Outline colour: first line colour of the renderer symbol
+    renderer = root.find('renderer-v2')
+    if renderer is not None:
+        for option in renderer.iter('Option'):
+            if option.get('name') in ('line_color', 'outline_color'):
+                style['color'] = _qgis_color(option.get('value'))
+                break
+
+    text_style = root.find('labeling/settings/text-style')
+    if root.get('labelsEnabled') == '1' and text_style is not None and text_style.get('isExpression') != '1':
+        size = float(text_style.get('fontSize', 0))
+        unit = text_style.get('fontSizeUnit', 'Point')
+        if unit == 'MapUnit':
+            style['text_height'] = size
+        else:
+            style['text_height'] = size * _FONT_UNITS_MM.get(unit, 1.0) * scale / 1000
+        style['label_field'] = text_style.get('fieldName') or None
+        style['text_color'] = _qgis_color(text_style.get('textColor', '0,0,0'))
+        style['font'] = text_style.get('fontFamily') or None
+
+    return style
+
+
+def _true_color(rgb):
+    """Return the DXF 24-bit colour value (group code 420) of (r, g, b)"""
+    r, g, b = rgb
+    return (r << 16) | (g << 8) | b
+
+
+class DxfWriter:
+    """Streams layers of LWPOLYLINE outlines and TEXT labels into a DXF file
+
+    Args:
+        path: Output DXF path
+        layers: List of (layer name, style dict from read_dxf_style)
+        encoding: Text encoding ($DWGCODEPAGE ANSI_1250 for Slovak labels)
+    """
+
+    def __init__(self, path, layers, encoding='cp1250'):
+        self.path = path
+        self.styles = dict(layers)
+        self._file = open(path, 'w', encoding=encoding, errors='replace', newline='\n')
+        self._next_handle = 0x10
+        self._extent = [float('inf'), float('inf'), float('-inf'), float('-inf')]
+        self._placeholders = {}
+
+        self._write_header()
+        self._write_tables()
+        self._write_blocks()
+        self._tags(0, 'SECTION', 2, 'ENTITIES')
+
+    def _handle(self):
+        """Return the next free entity handle (hex string)"""
+        handle = f"{self._next_handle:X}"
+        self._next_handle += 1
+        return handle
+
+    def _tags(self, *pairs):
+        """Write (group code, value) pairs"""
+        self._file.write(''.join(f"{pairs[i]}\n{pairs[i + 1]}\n" for i in range(0, len(pairs), 2)))
+
+    def _placeholder(self, name, code):
+        """Write a header value to be filled in by close()"""
+        self._file.write(f"{code}\n")
+        self._placeholders[name] = self._file.tell()
+        self._file.write(' ' * _PLACEHOLDER_WIDTH + '\n')
+
+    def _write_header(self):
+        self._tags(0, 'SECTION', 2, 'HEADER',
+                   9, '$ACADVER', 1, 'AC1015',
+                   9, '$DWGCODEPAGE', 3, 'ANSI_1250',
+                   9, '$INSUNITS', 70, 6)
+        self._tags(9, '$EXTMIN')
+        self._placeholder('xmin', 10)
+        self._placeholder('ymin', 20)
+        self._tags(30, 0.0, 9, '$EXTMAX')
+        self._placeholder('xmax', 10)
+        self._placeholder('ymax', 20)
+        self._tags(30, 0.0, 9, '$HANDSEED')
+        self._placeholder('handseed', 5)
+        self._tags(0, 'ENDSEC', 0, 'SECTION', 2, 'CLASSES', 0, 'ENDSEC')
+
+    def _table(self, name, records):
+        """Write a symbol table; records are lists of tags after the record handle"""
+        table = self._handle()
+        self._tags(0, 'TABLE', 2, name, 5, table, 330, 0, 100, 'AcDbSymbolTable', 70, len(records))
+        handles = []
+        for record_type, subclass, tags in records:
+            handle = self._handle()
+            handles.append(handle)
+            self._tags(0, record_type, 5, handle, 330, table, 100, 'AcDbSymbolTableRecord', 100, subclass, *tags)
+        self._tags(0, 'ENDTAB')
+        return handles
+
+    def _write_tables(self):
+        self._tags(0, 'SECTION', 2, 'TABLES')
+        self._table('VPORT', [
+            ('VPORT', 'AcDbViewportTableRecord',
+             (2, '*Active', 70, 0, 10, 0.0, 20, 0.0, 11, 1.0, 21, 1.0, 12, 0.0, 22, 0.0,
+              40, 1000.0, 41, 1.0)),
+        ])
+        self._table('LTYPE', [
+            ('LTYPE', 'AcDbLinetypeTableRecord', (2, name, 70, 0, 3, '', 72, 65, 73, 0, 40, 0.0))
+            for name in ('ByBlock', 'ByLayer', 'Continuous')
+        ])
+        layer_records = [('LAYER', 'AcDbLayerTableRecord', (2, '0', 70, 0, 62, 7, 6, 'Continuous'))]
+        for name, style in self.styles.items():
+            layer_records.append(('LAYER', 'AcDbLayerTableRecord',
+                                  (2, name, 70, 0, 62, 7, 420, _true_color(style['color']), 6, 'Continuous')))
+        self._table('LAYER', layer_records)
+
+        fonts = sorted({style['font'] for style in self.styles.values() if style['font']})
+        self._table('STYLE', [
+            ('STYLE', 'AcDbTextStyleTableRecord',
+             (2, name, 70, 0, 40, 0.0, 41, 1.0, 50, 0.0, 71, 0, 42, 1.0, 3, font_file, 4, ''))
+            for name, font_file in [('Standard', 'txt')] + [(font, f"{font.lower()}.ttf") for font in fonts]
+        ])
+        self._table('VIEW', [])
+        self._table('UCS', [])
+        self._table('APPID', [('APPID', 'AcDbRegAppTableRecord', (2, 'ACAD', 70, 0))])
+        self._table('DIMSTYLE', [])
+        self._model_space, self._paper_space = self._table('BLOCK_RECORD', [
+            ('BLOCK_RECORD', 'AcDbBlockTableRecord', (2, '*Model_Space')),
+            ('BLOCK_RECORD', 'AcDbBlockTableRecord', (2, '*Paper_Space')),
+        ])
+        self._tags(0, 'ENDSEC')
+
+    def _write_blocks(self):
+        self._tags(0, 'SECTION', 2, 'BLOCKS')
+        for owner, name in ((self._model_space, '*Model_Space'), (self._paper_space, '*Paper_Space')):
+            self._tags(0, 'BLOCK', 5, self._handle(), 330, owner, 100, 'AcDbEntity', 8, '0',
+                       100, 'AcDbBlockBegin', 2, name, 70, 0, 10, 0.0, 20, 0.0, 30, 0.0, 3, name, 1, '')
+            self._tags(0, 'ENDBLK', 5, self._handle(), 330, owner, 100, 'AcDbEntity', 8, '0',
+                       100, 'AcDbBlockEnd')
+        self._tags(0, 'ENDSEC')
+
+    def create_layer(self, layer_name, fields):
+        """Return a writer for one output layer
+
+        Returns:
+            DxfLayer with the addFeatures()/errorMessage() interface of QgsVectorFileWriter
+        """
+        style = self.styles[layer_name]
+        label_index = fields.indexOf(style['label_field']) if style['label_field'] else -1
+        return DxfLayer(self, layer_name, style, label_index)
+
+    def polyline(self, layer_name, xs, ys):
+        """Write a closed LWPOLYLINE"""
+        self._extent[0] = min(self._extent[0], min(xs))
+        self._extent[1] = min(self._extent[1], min(ys))
+        self._extent[2] = max(self._extent[2], max(xs))
+        self._extent[3] = max(self._extent[3], max(ys))
+        self._tags(0, 'LWPOLYLINE', 5, self._handle(), 330, self._model_space, 100, 'AcDbEntity',
+                   8, layer_name, 100, 'AcDbPolyline', 90, len(xs), 70, 1, 43, 0.0)
+        self._file.write(''.join(f"10\n{x:.3f}\n20\n{y:.3f}\n" for x, y in zip(xs, ys)))
+
+    def text(self, layer_name, x, y, value, style):
+        """Write a TEXT centred on (x, y)"""
+        self._tags(0, 'TEXT', 5, self._handle(), 330, self._model_space, 100, 'AcDbEntity',
+                   8, layer_name, 420, _true_color(style['text_color']),
+                   100, 'AcDbText', 10, f"{x:.3f}", 20, f"{y:.3f}", 30, 0.0,
+                   40, f"{style['text_height']:.3f}", 1, value, 7, style['font'] or 'Standard',
+                   72, 1, 11, f"{x:.3f}", 21, f"{y:.3f}", 31, 0.0,
+                   100, 'AcDbText', 73, 2)
+
+    def close(self):
+        """Finish the file: OBJECTS section, extents and handle seed"""
+        root = self._handle()
+        group = self._handle()
+        self._tags(0, 'ENDSEC', 0, 'SECTION', 2, 'OBJECTS',
+                   0, 'DICTIONARY', 5, root, 330, 0, 100, 'AcDbDictionary', 281, 1,
+                   3, 'ACAD_GROUP', 350, group,
+                   0, 'DICTIONARY', 5, group, 330, root, 100, 'AcDbDictionary', 281, 1,
+                   0, 'ENDSEC', 0, 'EOF')
+
+        if self._extent[0] > self._extent[2]:
+            self._extent = [0.0, 0.0, 0.0, 0.0]
+        values = {
+            'xmin': f"{self._extent[0]:.3f}",
+            'ymin': f"{self._extent[1]:.3f}",
+            'xmax': f"{self._extent[2]:.3f}",
+            'ymax': f"{self._extent[3]:.3f}",
+            'handseed': f"{self._next_handle:0{_PLACEHOLDER_WIDTH}X}",
+        }
+        for name, position in self._placeholders.items():
+            self._file.seek(position)
+            self._file.write(values[name].rjust(_PLACEHOLDER_WIDTH))
+        self._file.close()
+
+    def abort(self):
+        """Close the file without finishing it"""
+        self._file.close()
+
+
+class DxfLayer:
+    """Writer of one layer of a DxfWriter"""
+
+    def __init__(self, writer, layer_name, style, label_index):
+        self.writer = writer
+        self.layer_name = layer_name
+        self.style = style
+        self.label_index = label_index
+        self._error = ''
+
+    def addFeatures(self, features):
+        """Write outlines and labels of features, return False on error"""
+        try:
+            for feature in features:
+                geom = feature.geometry()
+                if geom.isNull():
+                    continue
+                self._write_rings(bytes(geom.asWkb()))
+
+                if self.label_index >= 0:
+                    label = feature.attribute(self.label_index)
+                    if label is not None and not (hasattr(label, 'isNull') and label.isNull()) and str(label):
+                        # Labels sit on a point inside the parcel, like horizontal polygon labels
+                        point = geom.pointOnSurface().asPoint()
+                        self.writer.text(self.layer_name, point.x(), point.y(), str(label), self.style)
+        except (OSError, struct.error, ValueError) as e:
+            self._error = str(e)
+            return False
+        return True
+
+    def _write_rings(self, wkb):
+        """Write every ring of a (Multi)Polygon WKB as closed LWPOLYLINE"""
+        runs, _ = coordinate_arrays(wkb)
+        for byte_order, offset, count, dimension in runs:
+            coords = struct.unpack_from(f"{byte_order}{count * dimension}d", wkb, offset)
+            xs = coords[0::dimension]
+            ys = coords[1::dimension]
+            # The closing vertex is implied by the closed flag
+            if count > 1 and xs[0] == xs[-1] and ys[0] == ys[-1]:
+                xs, ys = xs[:-1], ys[:-1]
+            if len(xs) > 1:
+                self.writer.polyline(self.layer_name, xs, ys)
+
+    def errorMessage(self):
+        """Return the last write error"""
+        return self._error
@@ -0,0 +1,933 @@
+# -*- coding: utf-8 -*-
+"""Conversion engine for KN Register C/E GML files.
+
+The engine does not depend on the plugin dialog, so the same code runs inside
+QGIS (driven by knGML2GPKG) and from the headless command line (cli.py).
+"""
+import os
+import xml.etree.ElementTree as ET
+
+from qgis.core import (
+    QgsProject,
+    QgsCoordinateReferenceSystem,
+    QgsCoordinateTransform,
+    QgsCoordinateTransformContext,
+    QgsVectorFileWriter,
+    QgsWkbTypes,
+    QgsMessageLog,
+    QgsFeature,
+    QgsGeometry,
+    QgsDxfExport,
+    QgsPointXY,
+    QgsCsException,
+    Qgis
+)
+from qgis.PyQt.QtCore import QFile, QIODevice
+
+from .chunked import ChunkedKnGmlReader
+from .delta import DeltaError, DeltaSink, HashRecorder
+from .dxf_writer import DxfWriter, read_dxf_style
+from .fanout import FanOutSink
+from .gfs_cache import GfsCache, sibling_gfs, template_options
+from .gpkg_writer import ATTRIBUTE_INDEXES, GpkgWriter, GpkgWriterError, finish_gpkg
+from .hilbert import hilbert_sort
+from .kn_reader import KnGmlReader
+from .manifest import plugin_version, style_hashes
+from .memory_sink import MemoryLayerSink
+from .profiling import NULL_PROFILER, Profiler, report_path, write_report
+from .readers import OgrGmlReader, ProviderGmlReader, ReaderError
+from .styles import StyleError, layer_style
+from .vsi import gml_basename, is_virtual, real_path
+from .wkb import swap_xy_wkb
+
+
+PLUGIN_DIR = os.path.dirname(os.path.dirname(__file__))
+
+SOURCE_CRS = 'EPSG:4258'
+TARGET_CRS = 'EPSG:5514'
+
+# Feature classes of each register file -> output layers
+KN_LAYERS = {
+    'C': [
+        {'source': 'CadastralParcel', 'target': 'ParcelC', 'qml': 'kn_parcelC.qml', 'fix': True},
+        {'source': 'CadastralZoning', 'target': 'CadastralUnit', 'qml': 'kn_cadastralunit.qml', 'fix': False},
+    ],
+    'E': [
+        {'source': 'CadastralParcel', 'target': 'ParcelE', 'qml': 'kn_parcelE.qml', 'fix': True},
+    ],
+}
+
+# GML readers: 'ogr' uses the OGR GML driver, 'native' the streaming KN reader
+READERS = ('ogr', 'native')
+
+# DXF writers: 'qgis' uses QgsDxfExport, 'native' the streaming DxfWriter
+DXF_WRITERS = ('qgis', 'native')
+
+# Output format -> file extension
+OUTPUT_FORMATS = {
+    'GPKG': '.gpkg',
+    'DXF': '.dxf',
+}
+
+
+def find_pairs(files_c, files_e):
+    """Match Register C and Register E files by basename
+
+    Args:
+        files_c: List of Register C GML paths
+        files_e: List of Register E GML paths
+
+    Returns:
+        Tuple (pairs, missing_e, missing_c) where pairs is a list of
+        (c_path, e_path, basename) and missing_* list basenames without a match
+    """
+    c_dict = {gml_basename(f): f for f in files_c}
+    e_dict = {gml_basename(f): f for f in files_e}
+
+    pairs = []
+    missing_e = []
+    for basename in c_dict.keys():
+        if basename in e_dict:
+            pairs.append((c_dict[basename], e_dict[basename], basename))
+        else:
+            missing_e.append(basename)
+
+    missing_c = [basename for basename in e_dict.keys() if basename not in c_dict]
+
+    return pairs, missing_e, missing_c
+
+
+def output_path(output_folder, filename, output_format):
+    """Return output file path for a GML pair basename"""
+    base_name = os.path.splitext(filename)[0]
+    return os.path.join(output_folder, f"{base_name}{OUTPUT_FORMATS[output_format]}")
+
+
+def output_files(output_folder, filename, output_formats):
+    """Return dict output format -> output file path for a GML pair basename
+
+    Args:
+        output_formats: One format ('GPKG') or a list of formats
+    """
+    if isinstance(output_formats, str):
+        output_formats = [output_formats]
+    return {fmt: output_path(output_folder, filename, fmt) for fmt in output_formats}
+
+
+def make_transform_context(project_path=None, operation=None):
+    """Build the transform context used for EPSG:4258 -> EPSG:5514
+
+    Args:
+        project_path: Optional QGIS project whose transform context is used
+        operation: Optional PROJ pipeline string forced for EPSG:4258 -> EPSG:5514
+
+    Without arguments the current project context is returned, which inside
+    QGIS holds the custom transformation configured by the user.
+    """
+    project = QgsProject.instance()
+    if project_path:
+        if not project.read(project_path):
+            raise ValueError(f"Could not read project {project_path}")
+
+    context = QgsCoordinateTransformContext(project.transformContext())
+    if operation:
+        context.addCoordinateOperation(
+            QgsCoordinateReferenceSystem(SOURCE_CRS),
+            QgsCoordinateReferenceSystem(TARGET_CRS),
+            operation
+        )
+    return context
+
+
+def transform_definition(transform_context):
+    """Return the PROJ definition of the EPSG:4258 -> EPSG:5514 operation of a context"""
+    source = QgsCoordinateReferenceSystem(SOURCE_CRS)
+    target = QgsCoordinateReferenceSystem(TARGET_CRS)
+    definition = transform_context.calculateCoordinateOperation(source, target)
+    if not definition:
+        # No operation set by the user: the one PROJ picks by default
+        transform = QgsCoordinateTransform(source, target, transform_context)
+        definition = transform.instantiatedCoordinateOperationDetails().proj
+    return definition
+
+
+def warm_up_transform(transform_context):
+    """Transform one point EPSG:4258 -> EPSG:5514, so proj.db and the grids are loaded now
+
+    Called once per worker process, the first pair it converts then does not pay for it.
+    """
+    transform = QgsCoordinateTransform(
+        QgsCoordinateReferenceSystem(SOURCE_CRS),
+        QgsCoordinateReferenceSystem(TARGET_CRS),
+        transform_context
+    )
+    try:
+        # A point in Slovakia, inside the extent of the grids
+        transform.transform(QgsPointXY(19.0, 48.7))
+    except QgsCsException:
+        pass
+
+
+def conversion_settings(transform_context, plugin_dir=PLUGIN_DIR, engine_options=None):
+    """Return the settings that determine the content of output files (for the manifest)
+
+    Args:
+        transform_context: QgsCoordinateTransformContext used for the conversion
+        plugin_dir: Directory containing metadata.txt and the styles folder
+        engine_options: Keyword arguments passed to ConversionEngine
+    """
+    engine_options = engine_options or {}
+    settings = {
+        'plugin_version': plugin_version(plugin_dir),
+        'styles': style_hashes(plugin_dir),
+        'transform': transform_definition(transform_context),
+        'reader': engine_options.get('reader', 'ogr'),
+        'dxf_writer': engine_options.get('dxf_writer', 'qgis'),
+    }
+    if engine_options.get('hilbert_order'):
+        # Only recorded when set, so manifests written before the option stay valid
+        settings['hilbert_order'] = True
+    attribute_indexes = engine_options.get('attribute_indexes')
+    if attribute_indexes is not None and attribute_indexes != ATTRIBUTE_INDEXES:
+        # Likewise only recorded when different from the defaults
+        settings['attribute_indexes'] = {
+            layer_name: list(field_names) for layer_name, field_names in sorted(attribute_indexes.items())
+        }
+    return settings
+
+
+def swap_xy(geom):
+    """Return a copy of geom with X and Y swapped (Z/M and curves preserved)"""
+    wkb = bytearray(geom.asWkb())
+    swap_xy_wkb(wkb)
+    swapped = QgsGeometry()
+    swapped.fromWkb(bytes(wkb))
+    return swapped
+
+
+class ConversionEngine:
+    """Converts KN GML pairs to GPKG or DXF.
+
+    Args:
+        log: Callable(message, level) receiving log lines; QgsMessageLog if None
+        progress: Callable(int) receiving progress 0-100; ignored if None
+        transform_context: QgsCoordinateTransformContext; project context if None
+        plugin_dir: Directory containing the styles folder
+        is_canceled: Callable() returning True when the conversion should stop
+        batch_size: Number of features handed to the GPKG writer at once
+        gfs_cache: GfsCache for GML schema templates; None deletes .gfs files after reading
+        reader: 'ogr' (OGR GML driver) or 'native' (streaming KN reader, see READERS)
+        parse_workers: Worker processes parsing byte ranges of one large GML (native reader only)
+        bulk_write: Write all GPKG layers in one transaction and build spatial indexes at the end
+        dxf_writer: 'qgis' (QgsDxfExport) or 'native' (streaming DxfWriter, see DXF_WRITERS)
+        update_existing: Update an existing GPKG in place (insert/update/delete by gml_id)
+        hilbert_order: Write the features of each layer sorted along a Hilbert curve of their
+            centroids (the whole layer is held in memory until written)
+        attribute_indexes: Dict layer name -> field names indexed in GPKG outputs;
+            ATTRIBUTE_INDEXES if None, {} for none
+        profile: Write a per-stage profiling report (JSON) next to the outputs of each pair
+    """
+
+    def __init__(self, log=None, progress=None, transform_context=None, plugin_dir=PLUGIN_DIR,
+                 is_canceled=None, batch_size=1000, gfs_cache=None, reader='ogr', parse_workers=1,
+                 bulk_write=False, dxf_writer='qgis', update_existing=False, hilbert_order=False,
+                 attribute_indexes=None, profile=False):
+        self._log = log
+        self._progress = progress
+        self._is_canceled = is_canceled
+        self.transform_context = transform_context
+        self.plugin_dir = plugin_dir
+        self.batch_size = batch_size
+        self.gfs_cache = gfs_cache
+        self.reader = reader
+        self.parse_workers = parse_workers
+        self.bulk_write = bulk_write
+        self.dxf_writer = dxf_writer
+        self.update_existing = update_existing
+        self.hilbert_order = hilbert_order
+        self.attribute_indexes = ATTRIBUTE_INDEXES if attribute_indexes is None else attribute_indexes
+        self.profile = profile
+        # Profiler of the pair being converted (NULL_PROFILER when not profiling)
+        self.profiler = NULL_PROFILER
+        # Progress range (start, span) of the layer being converted
+        self._layer_progress = (0, 0)
+        # HashRecorder of the QgsVectorFileWriter GPKG being written (for in-place updates)
+        self._feature_hashes = None
+
+    def log(self, message, level=Qgis.Info):
+        """Send message to the log callback"""
+        if self._log:
+            self._log(message, level)
+        else:
+            QgsMessageLog.logMessage(message, 'knGML2GPKG', level)
+
+    def set_progress(self, value):
+        """Send progress value to the progress callback"""
+        if self._progress:
+            self._progress(value)
+
+    def canceled(self):
+        """Return True if the caller asked to stop the conversion"""
+        return bool(self._is_canceled and self._is_canceled())
+
+    def convert_batch(self, pairs, output_folder, output_format='GPKG'):
+        """Convert a list of GML pairs
+
+        Args:
+            pairs: List of (c_path, e_path, basename) as returned by find_pairs
+            output_folder: Folder for output files
+            output_format: 'GPKG', 'DXF' or a list of formats written in one pass
+
+        Returns:
+            List of (basename, output_file, success); output_file is the file of the first format
+        """
+        results = []
+        total_pairs = len(pairs)
+
+        for idx, (c_path, e_path, filename) in enumerate(pairs):
+            files = output_files(output_folder, filename, output_format)
+
+            # Log progress
+            self.log(f"\n[{idx+1}/{total_pairs}] Processing {filename}...")
+            self.log(f"  C: {os.path.basename(c_path)}")
+            self.log(f"  E: {os.path.basename(e_path)}")
+            self.log(f"  Output: {', '.join(os.path.basename(f) for f in files.values())}")
+
+            # Update progress
+            self.set_progress(int((idx / total_pairs) * 100))
+
+            # Convert
+            success = self.convert_pair(c_path, e_path, files)
+
+            if success:
+                self.log(f"  ✓ SUCCESS")
+            else:
+                self.log(f"  ✗ FAILED", Qgis.Critical)
+
+            results.append((filename, next(iter(files.values())), success))
+
+        return results
+
+    def convert_pair(self, gml_c, gml_e, files):
+        """Convert 2 GML files to one or more output formats in a single pass
+
+        Args:
+            gml_c: Path to Register C GML file
+            gml_e: Path to Register E GML file
+            files: Dict output format -> output file, as returned by output_files
+        """
+        self.profiler = Profiler() if self.profile else NULL_PROFILER
+        if len(files) == 1:
+            output_format, output_file = next(iter(files.items()))
+            success = self.convert_gml_to_gpkg(gml_c, gml_e, output_file, output_format)
+        else:
+            success = self._convert_to_sinks(gml_c, gml_e, files)
+
+        if self.profiler:
+            self._write_profile(gml_c, gml_e, files, success)
+            self.profiler = NULL_PROFILER
+        return success
+
+    def _write_profile(self, gml_c, gml_e, files, success):
+        """Write the profiling report of a pair and log its stage times"""
+        path = report_path(files)
+        report = self.profiler.report(
+            pair=os.path.splitext(os.path.basename(next(iter(files.values()))))[0],
+            inputs={
+                'C': {'path': gml_c, 'size': os.path.getsize(real_path(gml_c))},
+                'E': {'path': gml_e, 'size': os.path.getsize(real_path(gml_e))},
+            },
+            outputs=files,
+            success=success,
+            options={
+                'reader': self.reader,
+                'parse_workers': self.parse_workers,
+                'bulk_write': self.bulk_write,
+                'dxf_writer': self.dxf_writer,
+                'update_existing': self.update_existing,
+                'hilbert_order': self.hilbert_order,
+                'batch_size': self.batch_size,
+                'attribute_indexes': self.attribute_indexes,
+                'profile': self.profile,
+            },
+        )
+        stages = ', '.join(f"{name} {stage['wall_s']:.2f} s" for name, stage in report['stages'].items())
+        self.log(f"  Profile: {report['wall_s']:.2f} s ({stages})")
+        try:
+            write_report(path, report)
+        except OSError as e:
+            self.log(f"  Warning: Could not write profile: {e}", Qgis.Warning)
+
+    def convert_gml_to_gpkg(self, gml_c, gml_e, output_file, output_format='GPKG'):
+        """Convert 2 GML files to GPKG or DXF using QGIS API with custom transformations
+
+        Args:
+            gml_c: Path to Register C GML file
+            gml_e: Path to Register E GML file
+            output_file: Path to output file (.gpkg or .dxf)
+            output_format: 'GPKG' or 'DXF'
+        """
+
+        updating = self.update_existing and os.path.exists(output_file)
+        if output_format == 'GPKG' and not self.bulk_write and not updating:
+            # Direct GPKG export, one QgsVectorFileWriter per layer
+            return self._convert_to_gpkg(gml_c, gml_e, output_file)
+        return self._convert_to_sinks(gml_c, gml_e, {output_format: output_file})
+
+    def convert_to_sink(self, gml_c, gml_e, sink):
+        """Convert 2 GML files into a caller supplied sink
+
+        Args:
+            gml_c: Path to Register C GML file
+            gml_e: Path to Register E GML file
+            sink: Object with create_layer(layer_name, fields) returning a writer
+                with addFeatures()/errorMessage() (see GpkgWriter)
+        """
+        target_crs = QgsCoordinateReferenceSystem(TARGET_CRS)
+        transform_context = self.transform_context or QgsProject.instance().transformContext()
+        return self._write_sources([('C', gml_c), ('E', gml_e)], None, target_crs, transform_context, sink)
+
+    def _convert_to_gpkg(self, gml_c, gml_e, output_gpkg):
+        """Internal method: Convert 2 GML files to 1 GPKG using QGIS API with custom transformations"""
+
+        # Remove existing GPKG if it exists
+        if os.path.exists(output_gpkg):
+            try:
+                os.remove(output_gpkg)
+                self.log("Removed existing output file")
+            except OSError:
+                pass
+
+        target_crs = QgsCoordinateReferenceSystem(TARGET_CRS)
+        # Use project transform context to get accurate custom transformation
+        transform_context = self.transform_context or QgsProject.instance().transformContext()
+
+        # Each GML file is read once for all of its feature classes
+        sources = [('C', gml_c), ('E', gml_e)]
+        # Feature hashes are only kept for files updated in place later
+        self._feature_hashes = HashRecorder() if self.update_existing else None
+        try:
+            if not self._write_sources(sources, output_gpkg, target_crs, transform_context, None):
+                return False
+            hashes = self._feature_hashes.hashes if self._feature_hashes is not None else None
+        finally:
+            self._feature_hashes = None
+
+        # Attribute indexes, styles and feature hashes in one transaction, no layer is opened again
+        styles = self.layer_styles()
+        finished = finish_gpkg(output_gpkg, self.attribute_indexes, styles, hashes, self.profiler)
+        if finished is None:
+            self.log("  ⚠ Could not store attribute indexes, styles and feature hashes", Qgis.Warning)
+        else:
+            self._log_styles(styles)
+
+        return True
+
+    def _convert_to_sinks(self, gml_c, gml_e, files):
+        """Internal method: Convert 2 GML files through one sink per output format
+
+        The GML files are read and transformed once; GPKG goes through the
+        single-transaction GpkgWriter, DXF through styled memory layers
+        (QgsDxfExport) or the streaming DxfWriter.
+        """
+        target_crs = QgsCoordinateReferenceSystem(TARGET_CRS)
+        transform_context = self.transform_context or QgsProject.instance().transformContext()
+
+        sinks = {}
+        for output_format, output_file in files.items():
+            sink = self._open_sink(output_format, output_file, target_crs)
+            if sink is None:
+                self._abort_sinks(sinks, files)
+                return False
+            sinks[output_format] = sink
+
+        sink = next(iter(sinks.values())) if len(sinks) == 1 else FanOutSink(list(sinks.values()))
+        sources = [('C', gml_c), ('E', gml_e)]
+        if not self._write_sources(sources, None, target_crs, transform_context, sink) or self.canceled():
+            self._abort_sinks(sinks, files)
+            return False
+
+        success = True
+        for output_format, sink in sinks.items():
+            if not self._finish_sink(output_format, files[output_format], sink):
+                if not isinstance(sink, DeltaSink):
+                    self._remove_output(files[output_format])
+                success = False
+        return success
+
+    def _open_sink(self, output_format, output_file, target_crs):
+        """Create the sink writing one output file, None on error"""
+        if output_format == 'GPKG' and self.update_existing and os.path.exists(output_file):
+            try:
+                sink = DeltaSink(output_file, [info['target'] for info in KN_LAYERS['C'] + KN_LAYERS['E']],
+                                 self.attribute_indexes)
+                self.log(f"  Updating {os.path.basename(output_file)} in place")
+                return sink
+            except DeltaError as e:
+                self.log(f"  ⚠ Cannot update in place ({e}), converting again", Qgis.Warning)
+
+        if os.path.exists(output_file):
+            try:
+                os.remove(output_file)
+                self.log("Removed existing output file")
+            except OSError:
+                pass
+
+        try:
+            if output_format == 'GPKG':
+                # Feature hashes let a later in-place update skip unchanged features
+                return GpkgWriter(output_file, target_crs, attribute_indexes=self.attribute_indexes,
+                                  feature_hashes=HashRecorder() if self.update_existing else None)
+            if self.dxf_writer == 'native':
+                # Parcels below cadastral units, as in the QgsDxfExport path
+                styles = [
+                    (info['target'], read_dxf_style(os.path.join(self.plugin_dir, 'styles', info['qml'])))
+                    for info in self._dxf_layers()
+                ]
+                return DxfWriter(output_file, styles)
+            return MemoryLayerSink(target_crs)
+        except (GpkgWriterError, OSError, ET.ParseError) as e:
+            self.log(f"ERROR: Could not create {os.path.basename(output_file)}: {e}", Qgis.Critical)
+            return None
+
+    def _finish_sink(self, output_format, output_file, sink):
+        """Complete one output file after all features were written"""
+        if isinstance(sink, DeltaSink):
+            with self.profiler.stage('commit'):
+                counts = sink.close()
+            if counts is None:
+                self.log("ERROR: Could not commit GPKG update", Qgis.Critical)
+                return False
+            for layer_name, (inserted, updated, deleted) in counts.items():
+                self.log(f"  {layer_name}: {inserted} inserted, {updated} updated, {deleted} deleted")
+            return True
+
+        if isinstance(sink, GpkgWriter):
+            styles = self.layer_styles()
+            with self.profiler.stage('style') as counts:
+                sink.add_styles(styles)
+                counts['features'] = len(styles)
+            self.log("  Building indexes...")
+            with self.profiler.stage('index'):
+                committed = sink.close()
+            if not committed:
+                self.log(f"ERROR: Could not write GPKG: {sink.error}", Qgis.Critical)
+                return False
+            self._log_styles(styles)
+            return True
+
+        if isinstance(sink, DxfWriter):
+            try:
+                with self.profiler.stage('dxf_export'):
+                    sink.close()
+            except OSError as e:
+                self.log(f"ERROR: Could not write {os.path.basename(output_file)}: {e}", Qgis.Critical)
+                return False
+            self.log(f"  ✓ DXF export successful")
+            return True
+
+        # Memory layers: style them and hand them to QgsDxfExport, no temporary GPKG
+        try:
+            layers = []
+            for layer_info in self._dxf_layers():
+                layer = sink.layers.get(layer_info['target'])
+                if layer is None:
+                    continue
+                style_path = os.path.join(self.plugin_dir, 'styles', layer_info['qml'])
+                if os.path.exists(style_path):
+                    with self.profiler.stage('style') as counts:
+                        msg, success = layer.loadNamedStyle(style_path)
+                        counts['features'] = 1
+                    if not success:
+                        self.log(f"  Warning: Could not load style: {msg}", Qgis.Warning)
+                layers.append(layer)
+            with self.profiler.stage('dxf_export'):
+                return self._export_layers_to_dxf(layers, output_file)
+        finally:
+            sink.close()
+
+    def _abort_sinks(self, sinks, files):
+        """Drop the sinks of a failed conversion and remove their output files"""
+        for output_format, sink in sinks.items():
+            if isinstance(sink, MemoryLayerSink):
+                sink.close()
+            else:
+                sink.abort()
+            # An existing GPKG updated in place is left as it was
+            if not isinstance(sink, DeltaSink):
+                self._remove_output(files[output_format])
+
+    def _dxf_layers(self):
+        """Return layer definitions in DXF drawing order (parcels below cadastral units)"""
+        order = ['ParcelC', 'ParcelE', 'CadastralUnit']
+        return sorted(KN_LAYERS['C'] + KN_LAYERS['E'], key=lambda info: order.index(info['target']))
+
+    def _write_sources(self, sources, output_gpkg, target_crs, transform_context, sink):
+        """Read the GML files of a pair and write their layers to the output"""
+        total = len(sources)
+        for idx, (register, gml_file) in enumerate(sources):
+            if self.canceled():
+                self.log("Canceled", Qgis.Warning)
+                return False
+
+            layers = KN_LAYERS[register]
+            self._layer_progress = ((idx / total) * 90, 90 / total)
+            self.set_progress(int(self._layer_progress[0]))
+            self.log(f"Converting {', '.join(layer_info['target'] for layer_info in layers)}...")
+
+            with self.profiler.stage('open'):
+                reader = self._open_reader(gml_file, register, layers)
+            if reader is None:
+                return False
+
+            try:
+                result = self.convert_parcele_with_fixes(reader, layers, output_gpkg, target_crs, transform_context,
+                                                         sink)
+            finally:
+                reader.close()
+
+            if isinstance(reader, KnGmlReader) and reader.unknown_properties:
+                self.log(f"  ⚠ Properties not converted by the native reader: "
+                         f"{', '.join(sorted(reader.unknown_properties))}", Qgis.Warning)
+
+            if not result:
+                return False
+
+        return True
+
+    def _remove_output(self, output_file):
+        """Remove an incomplete output file"""
+        try:
+            if os.path.exists(output_file):
+                os.remove(output_file)
+        except OSError as e:
+            self.log(f"  Warning: Could not remove {os.path.basename(output_file)}: {e}", Qgis.Warning)
+
+    def _open_reader(self, gml_file, register, layers):
+        """Open a GML file, using the cached schema template when available"""
+        required = [layer_info['source'] for layer_info in layers]
+        if self.reader == 'native':
+            try:
+                # Chunks are byte ranges of a plain file, archives are read in one stream
+                if self.parse_workers > 1 and not is_virtual(gml_file):
+                    return ChunkedKnGmlReader(gml_file, self.parse_workers, layer_names=required)
+                return KnGmlReader(gml_file, required)
+            except ReaderError as e:
+                self.log(f"ERROR: Could not open {os.path.basename(gml_file)}: {e}", Qgis.Critical)
+                return None
+
+        gfs_file = sibling_gfs(gml_file)
+        gfs_existed = gfs_file is not None and os.path.exists(gfs_file)
+
+        open_options = []
+        generated = False
+        if self.gfs_cache and not gfs_existed:
+            try:
+                open_options = self.gfs_cache.open_options(gml_file, register, required)
+                if not open_options:
+                    # Schema discovered once into the cache, nothing is written next to the input
+                    template = self.gfs_cache.generate(gml_file, register)
+                    if template:
+                        open_options = template_options(template)
+                        generated = True
+                        self.log(f"  Cached schema of {os.path.basename(gml_file)}")
+            except OSError as e:
+                self.log(f"  Warning: Schema cache not available: {e}", Qgis.Warning)
+
+        try:
+            reader = OgrGmlReader(gml_file, open_options)
+            if open_options and not generated and not set(required) <= set(reader.layer_names()):
+                # Template does not match this file, fall back to schema discovery
+                self.log("  ⚠ Cached schema does not match, rescanning", Qgis.Warning)
+                reader.close()
+                self.gfs_cache.invalidate(gml_file, register)
+                open_options = ['WRITE_GFS=NO']
+                reader = OgrGmlReader(gml_file, open_options)
+        except ReaderError as e:
+            self.log(f"ERROR: Could not open {os.path.basename(gml_file)}: {e}", Qgis.Critical)
+            return None
+
+        if open_options and not generated:
+            self.log(f"  Using cached schema for {os.path.basename(gml_file)}")
+        elif gfs_file is not None and not gfs_existed and os.path.exists(gfs_file):
+            # Schema discovered by GDAL without the cache: clean it up
+            self._remove_gfs(gfs_file)
+
+        available = reader.layer_names()
+        unsupported = reader.unsupported_fields([name for name in required if name in available])
+        if unsupported:
+            # Field types the OGR reader does not map are converted by the QGIS provider
+            self.log(f"  Reading {os.path.basename(gml_file)} through the QGIS provider "
+                     f"({', '.join(unsupported)})")
+            reader.close()
+            reader = ProviderGmlReader(gml_file, available, open_options)
+
+        return reader
+
+    def _remove_gfs(self, gfs_file):
+        """Remove a .gfs created by GDAL next to an input file"""
+        try:
+            os.remove(gfs_file)
+            self.log(f"  Removed {os.path.basename(gfs_file)}")
+        except OSError as e:
+            self.log(f"  Warning: Could not remove {os.path.basename(gfs_file)}: {e}", Qgis.Warning)
+
+    def convert_parcele_with_fixes(self, reader, layers, output_gpkg, target_crs, transform_context,
+                                   sink=None):
+        """Convert the feature classes of one GML file in a single pass
+
+        Parcels (C or E) get fixes for corrupt parcels with swapped coordinates.
+
+        Args:
+            reader: OgrGmlReader, ProviderGmlReader or KnGmlReader of the GML file
+            layers: Layer definitions from KN_LAYERS; the first one is streamed
+            output_gpkg: Output GPKG path (not used with a sink)
+            target_crs: Target QgsCoordinateReferenceSystem
+            transform_context: QgsCoordinateTransformContext
+            sink: GpkgWriter, MemoryLayerSink, DxfWriter or FanOutSink receiving all layers;
+                QgsVectorFileWriter per layer if None
+        """
+
+        available = reader.layer_names()
+        outputs = {}
+        for layer_info in layers:
+            if layer_info['source'] not in available:
+                self.log(f"ERROR: Could not load {layer_info['source']}", Qgis.Critical)
+                return False
+
+            # Determine source CRS (some GML files don't have CRS defined)
+            source_crs = reader.crs(layer_info['source'])
+            if not source_crs.isValid():
+                # Default to EPSG:4258 (ETRS89) for Slovak cadastral data
+                source_crs = QgsCoordinateReferenceSystem(SOURCE_CRS)
+                self.log(f"  ⚠ Source CRS not defined, assuming EPSG:4258", Qgis.Warning)
+
+            self.log(f"  {layer_info['target']}: {source_crs.authid()} -> {target_crs.authid()}")
+
+            outputs[layer_info['source']] = {
+                'info': layer_info,
+                'fields': reader.fields(layer_info['source']),
+                'transform': QgsCoordinateTransform(source_crs, target_crs, transform_context),
+                'features': [],
+                'writer': None,
+                'count': 0,
+                'fixed': 0,
+            }
+
+        if sink is not None:
+            # Sinks accept all layers at once, so every class is streamed
+            for output in outputs.values():
+                try:
+                    output['writer'] = sink.create_layer(output['info']['target'], output['fields'])
+                except GpkgWriterError as e:
+                    self.log(f"ERROR: {e}", Qgis.Critical)
+                    return False
+        else:
+            # Only one GPKG writer can be open at a time: the first class (parcels) is
+            # streamed, the others (CadastralZoning, one feature per unit) are written
+            # when the pass is done
+            streamed = outputs[layers[0]['source']]
+            streamed['writer'] = self._open_writer(output_gpkg, streamed, target_crs, transform_context)
+            if streamed['writer'] is None:
+                return False
+
+        progress_start, progress_span = self._layer_progress
+        total_count = 0
+
+        features = self.profiler.profile_iterator('parse', reader.features(outputs.keys()))
+        for source, feature, fraction in features:
+            total_count += 1
+            if total_count % 500 == 0:
+                if self.canceled():
+                    self.log("Canceled", Qgis.Warning)
+                    self._close_writers(outputs)
+                    return False
+                self.set_progress(int(progress_start + progress_span * fraction))
+
+            output = outputs[source]
+            output['features'].append(self._fix_and_transform(feature, output))
+
+            # Write streamed layers in batches so memory stays flat (Hilbert order needs the whole layer)
+            if output['writer'] is not None and not self.hilbert_order and \
+                    len(output['features']) >= self.batch_size:
+                if not self._write_batch(output['writer'], output):
+                    self._close_writers(outputs)
+                    return False
+
+        for output in outputs.values():
+            if self.hilbert_order:
+                # Rows close on the map end up in the same SQLite pages
+                with self.profiler.stage('hilbert') as counts:
+                    output['features'] = hilbert_sort(output['features'])
+                    counts['features'] = len(output['features'])
+            if output['writer'] is None:
+                output['writer'] = self._open_writer(output_gpkg, output, target_crs, transform_context)
+                if output['writer'] is None:
+                    return False
+            success = self._write_batch(output['writer'], output)
+            # Dropping a QgsVectorFileWriter flushes and closes the layer
+            output['writer'] = None
+            if not success:
+                self._close_writers(outputs)
+                return False
+
+        for output in outputs.values():
+            self.log(f"  Loaded {output['count']} {output['info']['target']} features")
+            if output['fixed'] > 0:
+                self.log(f"  ⚠ Fixed {output['fixed']} parcels with swapped coordinates", Qgis.Warning)
+            self.log(f"  ✓ {output['info']['target']} converted")
+
+        return True
+
+    def _fix_and_transform(self, feature, output):
+        """Return a copy of feature with fixed and transformed MultiPolygon geometry"""
+        output['count'] += 1
+        geom = feature.geometry()
+
+        new_feature = QgsFeature(output['fields'])
+        new_feature.setAttributes(feature.attributes())
+
+        if geom.isNull():
+            return new_feature
+
+        profiler = self.profiler
+        if profiler:
+            started = profiler.clock()
+
+        if output['info']['fix']:
+            bbox = geom.boundingBox()
+
+            # Check for swapped coordinates (X > 40 and Y < 40 in EPSG:4258)
+            if bbox.xMinimum() > 40 and bbox.yMaximum() < 40:
+                # Swap X and Y coordinates directly in the WKB buffer
+                output['fixed'] += 1
+                geom = swap_xy(geom)
+
+        if profiler:
+            started = profiler.lap('fix', started)
+
+        # Transform geometry
+        success = geom.transform(output['transform'])
+        if success != 0:
+            self.log(f"  Warning: Transformation failed for feature {output['count']}", Qgis.Warning)
+
+        geom.convertToMultiType()
+        if profiler:
+            profiler.lap('transform', started, vertices=geom.constGet().nCoordinates())
+        new_feature.setGeometry(geom)
+        return new_feature
+
+    def _open_writer(self, output_gpkg, output, target_crs, transform_context):
+        """Open a streaming GPKG writer for an output layer"""
+        save_options = QgsVectorFileWriter.SaveVectorOptions()
+        save_options.driverName = 'GPKG'
+        save_options.fileEncoding = 'UTF-8'
+        save_options.layerName = output['info']['target']
+        save_options.layerOptions = ['SPATIAL_INDEX=YES']
+
+        # Determine file action mode (create new file or add layer to existing)
+        if os.path.exists(output_gpkg):
+            save_options.actionOnExistingFile = QgsVectorFileWriter.CreateOrOverwriteLayer
+        else:
+            save_options.actionOnExistingFile = QgsVectorFileWriter.CreateOrOverwriteFile
+
+        # MultiPolygon to handle both Polygon and MultiPolygon
+        writer = QgsVectorFileWriter.create(
+            output_gpkg,
+            output['fields'],
+            QgsWkbTypes.MultiPolygon,
+            target_crs,
+            transform_context,
+            save_options
+        )
+        if writer.hasError() != QgsVectorFileWriter.NoError:
+            self.log(f"ERROR: {writer.errorMessage()}", Qgis.Critical)
+            return None
+        if self._feature_hashes is not None:
+            return self._feature_hashes.wrap(output['info']['target'], output['fields'], writer)
+        return writer
+
+    def _close_writers(self, outputs):
+        """Drop the writers of all output layers"""
+        for output in outputs.values():
+            output['writer'] = None
+
+    def _write_batch(self, writer, output):
+        """Write and clear the collected features of an output layer"""
+        features = output['features']
+        output['features'] = []
+        with self.profiler.stage('write') as counts:
+            counts['features'] = len(features)
+            written = not features or writer.addFeatures(features)
+        if not written:
+            self.log(f"ERROR: {writer.errorMessage()}", Qgis.Critical)
+            return False
+        return True
+
+    def layer_styles(self):
+        """Return (layer name, QML, SLD) of the bundled styles, parsed once per process"""
+        styles = []
+        for layer_info in KN_LAYERS['C'] + KN_LAYERS['E']:
+            style_path = os.path.join(self.plugin_dir, 'styles', layer_info['qml'])
+            if not os.path.exists(style_path):
+                continue
+            try:
+                qml, sld = layer_style(style_path, layer_info['source'])
+            except StyleError as e:
+                self.log(f"  Warning: Could not load style: {e}", Qgis.Warning)
+                continue
+            styles.append((layer_info['target'], qml, sld))
+        return styles
+
+    def _log_styles(self, styles):
+        for layer_name, _, _ in styles:
+            self.log(f"  ✓ Style saved as default for {layer_name}")
+
+    def _export_layers_to_dxf(self, layers, output_dxf):
+        """Export styled layers to DXF format"""
+
+        self.log("Exporting to DXF format...")
+
+        for layer in layers:
+            self.log(f"  {layer.name()} ({layer.featureCount()} features)")
+
+        if not layers:
+            self.log("ERROR: No valid layers to export", Qgis.Critical)
+            return False
+
+        # DXF export options
+        dxf_export = QgsDxfExport()
+        dxf_export.setDestinationCrs(QgsCoordinateReferenceSystem(TARGET_CRS))
+        dxf_export.setSymbologyExport(QgsDxfExport.SymbologyExport.FeatureSymbology)
+        # Set scale to 500 (1:500) to ensure labels are visible (labels visible from 1:1 to 1:1000)
+        dxf_export.setSymbologyScale(500.0)
+        # Use simple TEXT entities instead of MTEXT, and hairline width (0) for polylines
+        dxf_export.setFlags(QgsDxfExport.FlagNoMText | QgsDxfExport.FlagHairlineWidthExport)
+
+        # Add layers to export
+        dxf_layers = []
+        for layer in layers:
+            dxf_layers.append(QgsDxfExport.DxfLayer(layer))
+        dxf_export.addLayers(dxf_layers)
+
+        # Write DXF file using QFile
+        dxf_file = QFile(output_dxf)
+        if not dxf_file.open(QIODevice.WriteOnly):
+            self.log(f"ERROR: Could not open {output_dxf} for writing", Qgis.Critical)
+            return False
+
+        result = dxf_export.writeToFile(dxf_file, "UTF-8")
+        dxf_file.close()
+
+        if result == QgsDxfExport.ExportResult.Success:
+            self.log(f"  ✓ DXF export successful")
+            return True
+        else:
+            error_messages = {
+                QgsDxfExport.ExportResult.InvalidDeviceError: "Invalid device error",
+                QgsDxfExport.ExportResult.DeviceNotWritableError: "Device not writable",
+                QgsDxfExport.ExportResult.EmptyExtentError: "Empty extent error"
+            }
+            error_msg = error_messages.get(result, f"Unknown error ({result})")
+            self.log(f"ERROR: DXF export failed: {error_msg}", Qgis.Critical)
+            return False
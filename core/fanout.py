@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""Fan-out of one converted feature stream to several output sinks.
+
+With more than one output format the GML files are read, fixed and
+transformed once and every batch of features is handed to each sink
+(GpkgWriter, MemoryLayerSink, DxfWriter).
+"""
+
+
+class FanOutSink:
+    """Sink forwarding every layer to several sinks
+
+    Args:
+        sinks: List of sinks with create_layer(layer_name, fields)
+    """
+
+    def __init__(self, sinks):
+        self.sinks = sinks
+
+    def create_layer(self, layer_name, fields):
+        """Create the layer in every sink
+
+        Returns:
+            FanOutLayer with the addFeatures()/errorMessage() interface of QgsVectorFileWriter
+        """
+        return FanOutLayer([sink.create_layer(layer_name, fields) for sink in self.sinks])
+
+
+class FanOutLayer:
+    """Layer writing the same features to the layers of several sinks"""
+
+    def __init__(self, layers):
+        self.layers = layers
+        self._error = ''
+
+    def addFeatures(self, features):
+        """Write features to every layer, return False on the first error"""
+        for layer in self.layers:
+            if not layer.addFeatures(features):
+                self._error = layer.errorMessage()
+                return False
+        return True
+
+    def errorMessage(self):
+        """Return the last write error"""
+        return self._error
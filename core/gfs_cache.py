@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+"""Persistent cache of GML driver schema files (.gfs).
+
+Without a .gfs the OGR GML driver pre-scans the whole file to discover its
+feature classes before reading it. KN files of the same schema version always
+have the same classes, so the schema is discovered once into a cache folder
+(outside the input folders) and passed to later runs through the
+GFS_TEMPLATE open option. GDAL writes a .gfs next to the file it opens, so
+the template is generated from a scratch folder inside the cache; read-only
+input folders and ZIP members get cached templates as well. Templates are
+keyed by the schema declared in the root element of the GML and by register
+(C or E).
+"""
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+import xml.etree.ElementTree as ET
+
+from osgeo import gdal
+
+from .vsi import VSIGZIP, VsiFile, is_virtual, real_path
+
+
+# Bytes read from the start of a GML file to find its root element
+_HEAD_SIZE = 64 * 1024
+
+# Block size used to copy a ZIP member into the scratch folder
+_COPY_BLOCK = 1024 * 1024
+
+
+_ROOT_TAG = re.compile(rb'<(?![?!])[^>]*?>', re.S)
+_SCHEMA_LOCATION = re.compile(rb'schemaLocation\s*=\s*"([^"]*)"')
+_NAMESPACES = re.compile(rb'xmlns(?::\w+)?\s*=\s*"([^"]*)"')
+_FEATURE_CLASS = re.compile(rb'<(?:[\w.-]+:)?(CadastralParcel|CadastralZoning)[\s>]')
+
+
+def default_cache_dir():
+    """Return the per-user cache folder for .gfs templates"""
+    if os.name == 'nt':
+        base = os.environ.get('LOCALAPPDATA', os.path.expanduser('~'))
+    else:
+        base = os.environ.get('XDG_CACHE_HOME', os.path.join(os.path.expanduser('~'), '.cache'))
+    return os.path.join(base, 'kngml2gpkg', 'gfs')
+
+
+def sibling_gfs(gml_path):
+    """Return the .gfs path GDAL uses next to a GML file
+
+    For a /vsigzip/ path GDAL writes the .gfs next to the .gz file
+    (800001.gml.gz -> 800001.gml.gfs); it cannot write one into a ZIP archive,
+    so None is returned for /vsizip/ paths.
+    """
+    if is_virtual(gml_path):
+        if not gml_path.startswith(VSIGZIP):
+            return None
+        gml_path = real_path(gml_path)
+    return os.path.splitext(gml_path)[0] + '.gfs'
+
+
+def read_head(gml_path):
+    """Return the first bytes of a (possibly zipped or gzipped) GML file"""
+    with VsiFile(gml_path) as f:
+        return f.read(_HEAD_SIZE)
+
+
+def schema_key(head, register):
+    """Return cache key for a GML file head
+
+    The key is derived from the schema location and namespaces of the root
+    element, i.e. it changes when the cadastral office changes the KN schema.
+    """
+    match = _ROOT_TAG.search(head)
+    root = match.group(0) if match else b''
+    schema_location = _SCHEMA_LOCATION.search(root)
+    parts = [schema_location.group(1) if schema_location else b'']
+    parts.extend(sorted(_NAMESPACES.findall(root)))
+    digest = hashlib.sha1(b'\n'.join(parts)).hexdigest()[:16]
+    return f"{register}-{digest}"
+
+
+def template_options(template):
+    """Return GML driver open options reading a file with a .gfs template
+
+    With a template GDAL reads the file in a single pass and does not write
+    a .gfs next to the input.
+    """
+    return [f"GFS_TEMPLATE={template}", 'WRITE_GFS=NO']
+
+
+def _scratch_source(gml_path, scratch_dir):
+    """Make a GML file available inside a scratch folder, return the path GDAL opens
+
+    Plain and gzipped files are symlinked (copied where symlinks are not
+    available), a ZIP member is copied out of its archive.
+    """
+    if is_virtual(gml_path) and not gml_path.startswith(VSIGZIP):
+        target = os.path.join(scratch_dir, 'source.gml')
+        with VsiFile(gml_path) as source, open(target, 'wb') as f:
+            shutil.copyfileobj(source, f, _COPY_BLOCK)
+        return target
+
+    gzipped = gml_path.startswith(VSIGZIP)
+    source = real_path(gml_path)
+    target = os.path.join(scratch_dir, 'source.gml.gz' if gzipped else 'source.gml')
+    try:
+        os.symlink(os.path.abspath(source), target)
+    except (OSError, NotImplementedError):
+        shutil.copyfile(source, target)
+    return f"{VSIGZIP}{target}" if gzipped else target
+
+
+def template_classes(gfs_path):
+    """Return feature class names defined in a .gfs file"""
+    tree = ET.parse(gfs_path)
+    # Only the class names, PropertyDefn/Name holds the field names
+    return {element.text for element in tree.getroot().iterfind('GMLFeatureClass/Name') if element.text}
+
+
+class GfsCache:
+    """Schema cache folder holding one .gfs template per KN schema version
+
+    Args:
+        cache_dir: Cache folder (default: default_cache_dir())
+    """
+
+    def __init__(self, cache_dir=None):
+        self.cache_dir = cache_dir or default_cache_dir()
+
+    def template_path(self, gml_path, register, head=None):
+        """Return cache path of the template for a GML file
+
+        Args:
+            head: First bytes of the file if already read (see read_head)
+        """
+        key = schema_key(read_head(gml_path) if head is None else head, register)
+        return os.path.join(self.cache_dir, f"{key}.gfs")
+
+    def template_for(self, gml_path, register, required_classes):
+        """Return a valid cached template for a GML file, or None
+
+        A template is valid if it defines the required classes and every
+        feature class seen at the start of the file. Invalid templates are
+        removed from the cache.
+        """
+        head = read_head(gml_path)
+        path = self.template_path(gml_path, register, head)
+        if not os.path.exists(path):
+            return None
+
+        try:
+            classes = template_classes(path)
+        except (OSError, ET.ParseError):
+            classes = set()
+
+        seen = {name.decode() for name in _FEATURE_CLASS.findall(head)}
+        if not set(required_classes) <= classes or not seen <= classes:
+            self.invalidate(gml_path, register)
+            return None
+
+        return path
+
+    def open_options(self, gml_path, register, required_classes):
+        """Return GML driver open options for a GML file ([] without a valid template)"""
+        template = self.template_for(gml_path, register, required_classes)
+        if template:
+            return template_options(template)
+        return []
+
+    def generate(self, gml_path, register):
+        """Let GDAL discover the schema of a GML file and store it as template
+
+        The file is opened with WRITE_GFS=YES from a scratch folder inside the
+        cache, so the .gfs is written there and the input folder (or archive)
+        is never touched.
+
+        Returns:
+            Cache path of the template, or None if GDAL did not write one
+        """
+        path = self.template_path(gml_path, register)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        scratch_dir = tempfile.mkdtemp(prefix='scratch-', dir=self.cache_dir)
+        try:
+            scratch = _scratch_source(gml_path, scratch_dir)
+            try:
+                dataset = gdal.OpenEx(scratch, gdal.OF_VECTOR | gdal.OF_READONLY,
+                                      allowed_drivers=['GML'], open_options=['WRITE_GFS=YES'])
+            except RuntimeError:
+                return None
+            if dataset is None:
+                return None
+            # The .gfs is complete once the dataset is closed
+            dataset = None
+
+            gfs_file = sibling_gfs(scratch)
+            if not os.path.exists(gfs_file):
+                return None
+            # Same folder, so parallel workers never see a partial template
+            os.replace(gfs_file, path)
+            return path
+        finally:
+            shutil.rmtree(scratch_dir, ignore_errors=True)
+
+    def invalidate(self, gml_path, register):
+        """Remove the cached template of a GML file"""
+        path = self.template_path(gml_path, register)
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,500 @@
+# -*- coding: utf-8 -*-
+"""Bulk GeoPackage writer.
+
+QgsVectorFileWriter reopens the GeoPackage for every layer, updates the R-tree
+through triggers on every insert and commits many small transactions.
+GpkgWriter keeps one OGR dataset open for all layers of an output file,
+inserts every feature in a single transaction with tuned SQLite pragmas and
+builds the spatial index of each layer once at the end. CreateSpatialIndex
+bulk loads the R-tree and registers the gpkg_rtree_index extension and its
+triggers, so the file is the same as one written with SPATIAL_INDEX=YES.
+"""
+import time
+
+from osgeo import gdal, ogr, osr
+
+from qgis.PyQt.QtCore import QVariant, QDate, QTime, QDateTime, Qt
+
+from .profiling import NULL_PROFILER
+
+
+# SQLite pragmas of the bulk write; page_size must be set before the first table exists.
+# The journal stays in memory so a failed write can still be rolled back.
+PRAGMAS = (
+    'page_size=16384',
+    'journal_mode=MEMORY',
+    'synchronous=OFF',
+    'cache_size=-262144',
+    'temp_store=MEMORY',
+)
+
+# Attribute indexes of each output layer, created in bulk once the rows are loaded.
+# Fields missing in a layer are skipped (unit_code only exists in the national mosaic).
+ATTRIBUTE_INDEXES = {
+    'ParcelC': ('label', 'nationalCadastralReference', 'gml_id', 'localId', 'unit_code'),
+    'ParcelE': ('label', 'nationalCadastralReference', 'gml_id', 'localId', 'unit_code'),
+    'CadastralUnit': ('label', 'nationalCadastalZoningReference', 'gml_id', 'localId', 'unit_code'),
+}
+
+# Table holding the QGIS layer styles
+LAYER_STYLES = 'layer_styles'
+
+# Table holding the geometry+attribute hash of every feature by layer and key (gml_id,
+# localId as fallback), used by in-place updates. Not registered in gpkg_contents, so
+# it is not offered as a layer.
+FEATURE_HASHES = 'kn_delta_hashes'
+
+# Rows per INSERT/DELETE statement on the hash table
+_HASH_BATCH = 500
+
+# Fields of the layer_styles table as created by the QGIS OGR provider: (name, type, width)
+_LAYER_STYLES_FIELDS = (
+    ('f_table_catalog', ogr.OFTString, 256),
+    ('f_table_schema', ogr.OFTString, 256),
+    ('f_table_name', ogr.OFTString, 256),
+    ('f_geometry_column', ogr.OFTString, 256),
+    ('styleName', ogr.OFTString, 30),
+    ('styleQML', ogr.OFTString, 0),
+    ('styleSLD', ogr.OFTString, 0),
+    ('useAsDefault', ogr.OFTInteger, 0),
+    ('description', ogr.OFTString, 0),
+    ('owner', ogr.OFTString, 30),
+    ('ui', ogr.OFTString, 30),
+    ('update_time', ogr.OFTDateTime, 0),
+)
+
+# QVariant type -> OGR field type
+_OGR_TYPES = {
+    QVariant.Bool: ogr.OFTInteger,
+    QVariant.Int: ogr.OFTInteger,
+    QVariant.LongLong: ogr.OFTInteger64,
+    QVariant.Double: ogr.OFTReal,
+    QVariant.Date: ogr.OFTDate,
+    QVariant.Time: ogr.OFTTime,
+    QVariant.DateTime: ogr.OFTDateTime,
+    QVariant.StringList: ogr.OFTStringList,
+}
+
+# QVariant type of list items -> OGR list field type
+_OGR_LIST_TYPES = {
+    QVariant.Int: ogr.OFTIntegerList,
+    QVariant.LongLong: ogr.OFTInteger64List,
+    QVariant.Double: ogr.OFTRealList,
+}
+
+
+class GpkgWriterError(Exception):
+    """Raised when the GeoPackage cannot be created"""
+
+
+class GpkgWriter:
+    """Writes all layers of one GeoPackage in a single transaction
+
+    Args:
+        path: Output GPKG path (must not exist)
+        crs: QgsCoordinateReferenceSystem of all layers
+        pragmas: SQLite pragmas applied when the file is created
+        attribute_indexes: Dict layer name -> indexed field names (see ATTRIBUTE_INDEXES)
+        feature_hashes: Optional recorder whose wrap(layer_name, fields, layer) returns the
+            writer used for a layer and whose hashes (dict layer name -> [(key, hash)]) are
+            stored in FEATURE_HASHES (see delta.HashRecorder)
+    """
+
+    def __init__(self, path, crs, pragmas=PRAGMAS, attribute_indexes=None, feature_hashes=None):
+        self.path = path
+        self.srs = _spatial_reference(crs)
+        self.attribute_indexes = attribute_indexes or {}
+        self.feature_hashes = feature_hashes
+        # Reason of the last failed close()
+        self.error = ''
+        self._layers = {}
+
+        driver = ogr.GetDriverByName('GPKG')
+        gdal.SetThreadLocalConfigOption('OGR_SQLITE_PRAGMA', ','.join(pragmas))
+        try:
+            self.dataset = driver.CreateDataSource(path)
+        finally:
+            gdal.SetThreadLocalConfigOption('OGR_SQLITE_PRAGMA', None)
+        if self.dataset is None:
+            raise GpkgWriterError(gdal.GetLastErrorMsg() or f"Could not create {path}")
+
+        if self.dataset.StartTransaction() != ogr.OGRERR_NONE:
+            raise GpkgWriterError(f"Could not start transaction on {path}")
+
+    def create_layer(self, layer_name, fields):
+        """Create a MultiPolygon layer without spatial index
+
+        Returns:
+            GpkgLayer with the addFeatures()/errorMessage() interface of QgsVectorFileWriter
+        """
+        ogr_layer = self.dataset.CreateLayer(
+            layer_name,
+            self.srs,
+            ogr.wkbMultiPolygon,
+            options=['SPATIAL_INDEX=NO', 'FID=fid', 'GEOMETRY_NAME=geom']
+        )
+        if ogr_layer is None:
+            raise GpkgWriterError(gdal.GetLastErrorMsg() or f"Could not create layer {layer_name}")
+
+        for field in fields:
+            ogr_layer.CreateField(field_definition(field))
+
+        layer = GpkgLayer(ogr_layer)
+        self._layers[layer_name] = layer
+        if self.feature_hashes is not None:
+            return self.feature_hashes.wrap(layer_name, fields, layer)
+        return layer
+
+    def add_styles(self, styles):
+        """Store default layer styles inside the open transaction
+
+        Args:
+            styles: List of (layer name, QML, SLD)
+        """
+        write_layer_styles(self.dataset, styles)
+
+    def remove_duplicates(self, layer_name, key_field):
+        """Delete all but the first row of each key value (inside the open transaction)
+
+        Returns:
+            Number of deleted rows
+        """
+        before = self._count(layer_name)
+        table, key = quote_identifier(layer_name), quote_identifier(key_field)
+        self.dataset.ExecuteSQL(
+            f'DELETE FROM {table} WHERE {key} IS NOT NULL AND fid NOT IN '
+            f'(SELECT MIN(fid) FROM {table} WHERE {key} IS NOT NULL GROUP BY {key})'
+        )
+        return before - self._count(layer_name)
+
+    def _count(self, layer_name):
+        result = self.dataset.ExecuteSQL(f'SELECT COUNT(*) FROM {quote_identifier(layer_name)}')
+        count = result.GetNextFeature().GetField(0)
+        self.dataset.ReleaseResultSet(result)
+        return count
+
+    def close(self):
+        """Build the attribute indexes, commit all layers and build their spatial indexes
+
+        Returns:
+            True on success; False if the commit or a spatial index failed (see error)
+        """
+        # Indexing the loaded table is faster than updating the index on every insert
+        create_attribute_indexes(self.dataset, self.attribute_indexes)
+        if self.feature_hashes is not None:
+            write_feature_hashes(self.dataset, self.feature_hashes.hashes)
+        if self.dataset.CommitTransaction() != ogr.OGRERR_NONE:
+            self.error = gdal.GetLastErrorMsg() or 'Could not commit the transaction'
+            self.dataset = None
+            return False
+
+        success = True
+        for layer_name in self._layers:
+            if not self._create_spatial_index(layer_name):
+                self.error = (f"Could not build the spatial index of {layer_name}: "
+                              f"{gdal.GetLastErrorMsg() or 'CreateSpatialIndex failed'}")
+                success = False
+                break
+
+        self.dataset = None
+        self._layers = {}
+        return success
+
+    def _create_spatial_index(self, layer_name):
+        """Bulk load the R-tree of a layer, return True if it was created"""
+        gdal.ErrorReset()
+        try:
+            result = self.dataset.ExecuteSQL(f"SELECT CreateSpatialIndex({quote_literal(layer_name)}, 'geom')")
+        except RuntimeError:
+            return False
+        if result is None:
+            return False
+        feature = result.GetNextFeature()
+        created = feature is not None and bool(feature.GetField(0))
+        self.dataset.ReleaseResultSet(result)
+        return created and gdal.GetLastErrorType() < gdal.CE_Failure
+
+    def abort(self):
+        """Roll back the transaction and close the file"""
+        if self.dataset is not None:
+            self.dataset.RollbackTransaction()
+            self.dataset = None
+        self._layers = {}
+
+
+class GpkgLayer:
+    """One layer of a GpkgWriter"""
+
+    def __init__(self, ogr_layer):
+        self.ogr_layer = ogr_layer
+        self.layer_defn = ogr_layer.GetLayerDefn()
+        self._error = ''
+
+    def addFeatures(self, features):
+        """Insert QgsFeatures, return False on error"""
+        for feature in features:
+            ogr_feature = to_ogr_feature(feature, self.layer_defn)
+            if self.ogr_layer.CreateFeature(ogr_feature) != ogr.OGRERR_NONE:
+                self._error = gdal.GetLastErrorMsg() or 'Could not write feature'
+                return False
+        return True
+
+    def add_rows(self, rows):
+        """Insert plain rows, return False on error
+
+        Args:
+            rows: Iterable of (attribute values in field order, WKB bytes or None);
+                values are None, str, int or float (dates as ISO strings)
+        """
+        for values, wkb in rows:
+            ogr_feature = ogr.Feature(self.layer_defn)
+            for index, value in enumerate(values):
+                _set_field(ogr_feature, index, value)
+            if wkb is not None:
+                ogr_feature.SetGeometryDirectly(ogr.CreateGeometryFromWkb(wkb))
+            if self.ogr_layer.CreateFeature(ogr_feature) != ogr.OGRERR_NONE:
+                self._error = gdal.GetLastErrorMsg() or 'Could not write feature'
+                return False
+        return True
+
+    def errorMessage(self):
+        """Return the last write error"""
+        return self._error
+
+
+def field_definition(field):
+    """Build an OGR FieldDefn from a QgsField"""
+    if field.type() == QVariant.List:
+        field_type = _OGR_LIST_TYPES.get(field.subType(), ogr.OFTStringList)
+    else:
+        field_type = _OGR_TYPES.get(field.type(), ogr.OFTString)
+    field_defn = ogr.FieldDefn(field.name(), field_type)
+    if field.type() == QVariant.Bool:
+        field_defn.SetSubType(ogr.OFSTBoolean)
+    if field.length() > 0 and field.type() == QVariant.String:
+        field_defn.SetWidth(field.length())
+    return field_defn
+
+
+def quote_identifier(name):
+    """Return a table or column name quoted for SQLite"""
+    return '"' + name.replace('"', '""') + '"'
+
+
+def quote_literal(value):
+    """Return a string value quoted as SQLite literal"""
+    return "'" + value.replace("'", "''") + "'"
+
+
+def _spatial_reference(crs):
+    """Build an OGR SpatialReference from a QgsCoordinateReferenceSystem"""
+    srs = osr.SpatialReference()
+    authid = crs.authid()
+    if authid.startswith('EPSG:'):
+        srs.ImportFromEPSG(int(authid.split(':')[1]))
+    else:
+        srs.ImportFromWkt(crs.toWkt())
+    return srs
+
+
+def create_attribute_indexes(dataset, indexes):
+    """Create attribute indexes on the layers of a GPKG dataset
+
+    Args:
+        dataset: OGR dataset open for update
+        indexes: Dict layer name -> field names; missing layers and fields are skipped
+
+    Returns:
+        Number of indexes created
+    """
+    created = 0
+    for layer_name, field_names in indexes.items():
+        ogr_layer = dataset.GetLayerByName(layer_name)
+        if ogr_layer is None:
+            continue
+        layer_defn = ogr_layer.GetLayerDefn()
+        for field_name in field_names:
+            if layer_defn.GetFieldIndex(field_name) < 0:
+                continue
+            dataset.ExecuteSQL(
+                f'CREATE INDEX IF NOT EXISTS {quote_identifier(f"idx_{layer_name}_{field_name}")} '
+                f'ON {quote_identifier(layer_name)} ({quote_identifier(field_name)})'
+            )
+            created += 1
+    return created
+
+
+def write_layer_styles(dataset, styles):
+    """Insert default styles into the layer_styles table, creating the table if needed
+
+    Args:
+        dataset: OGR dataset open for update
+        styles: List of (layer name, QML, SLD); previous default styles of these layers
+            stop being default
+    """
+    table = dataset.GetLayerByName(LAYER_STYLES)
+    if table is None:
+        table = dataset.CreateLayer(LAYER_STYLES, None, ogr.wkbNone, options=['FID=id'])
+        for name, field_type, width in _LAYER_STYLES_FIELDS:
+            field_defn = ogr.FieldDefn(name, field_type)
+            if width:
+                field_defn.SetWidth(width)
+            if name == 'useAsDefault':
+                field_defn.SetSubType(ogr.OFSTBoolean)
+            table.CreateField(field_defn)
+
+    now = time.gmtime()
+    for layer_name, qml, sld in styles:
+        dataset.ExecuteSQL(f"UPDATE {quote_identifier(LAYER_STYLES)} SET useAsDefault = 0 "
+                           f"WHERE f_table_name = {quote_literal(layer_name)}")
+        ogr_feature = ogr.Feature(table.GetLayerDefn())
+        ogr_feature.SetField('f_table_catalog', '')
+        ogr_feature.SetField('f_table_schema', '')
+        ogr_feature.SetField('f_table_name', layer_name)
+        ogr_feature.SetField('f_geometry_column', 'geom')
+        ogr_feature.SetField('styleName', layer_name)
+        ogr_feature.SetField('styleQML', qml)
+        ogr_feature.SetField('styleSLD', sld)
+        ogr_feature.SetField('useAsDefault', 1)
+        ogr_feature.SetField('description', '')
+        ogr_feature.SetField('owner', '')
+        ogr_feature.SetField('ui', '')
+        ogr_feature.SetField('update_time', now.tm_year, now.tm_mon, now.tm_mday,
+                             now.tm_hour, now.tm_min, now.tm_sec, 100)
+        table.CreateFeature(ogr_feature)
+
+
+def write_feature_hashes(dataset, hashes):
+    """Insert or replace rows of the FEATURE_HASHES table, creating it if needed
+
+    Args:
+        dataset: OGR dataset open for update
+        hashes: Dict layer name -> iterable of (key, hash)
+    """
+    dataset.ExecuteSQL(
+        f'CREATE TABLE IF NOT EXISTS {quote_identifier(FEATURE_HASHES)} ('
+        'layer TEXT NOT NULL, gml_id TEXT NOT NULL, hash TEXT NOT NULL, PRIMARY KEY (layer, gml_id))'
+    )
+    for layer_name, rows in hashes.items():
+        rows = list(rows)
+        for start in range(0, len(rows), _HASH_BATCH):
+            values = ', '.join(
+                f"({quote_literal(layer_name)}, {quote_literal(key)}, {quote_literal(digest)})"
+                for key, digest in rows[start:start + _HASH_BATCH]
+            )
+            dataset.ExecuteSQL(
+                f'INSERT OR REPLACE INTO {quote_identifier(FEATURE_HASHES)} (layer, gml_id, hash) VALUES {values}'
+            )
+
+
+def delete_feature_hashes(dataset, layer_name, keys):
+    """Delete the FEATURE_HASHES rows of keys of a layer"""
+    keys = list(keys)
+    for start in range(0, len(keys), _HASH_BATCH):
+        values = ', '.join(quote_literal(key) for key in keys[start:start + _HASH_BATCH])
+        dataset.ExecuteSQL(
+            f'DELETE FROM {quote_identifier(FEATURE_HASHES)} '
+            f'WHERE layer = {quote_literal(layer_name)} AND gml_id IN ({values})'
+        )
+
+
+def read_feature_hashes(dataset, layer_name):
+    """Return dict key -> hash of a layer from FEATURE_HASHES ({} if the file has none)"""
+    result = dataset.ExecuteSQL(
+        f"SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = {quote_literal(FEATURE_HASHES)}"
+    )
+    exists = result.GetNextFeature().GetField(0) > 0
+    dataset.ReleaseResultSet(result)
+    if not exists:
+        return {}
+
+    hashes = {}
+    result = dataset.ExecuteSQL(
+        f'SELECT gml_id, hash FROM {quote_identifier(FEATURE_HASHES)} WHERE layer = {quote_literal(layer_name)}'
+    )
+    for row in result:
+        hashes[row.GetField(0)] = row.GetField(1)
+    dataset.ReleaseResultSet(result)
+    return hashes
+
+
+def finish_gpkg(path, indexes, styles, hashes=None, profiler=NULL_PROFILER):
+    """Create attribute indexes, default styles and feature hashes in an existing GPKG in one transaction
+
+    Args:
+        path: GPKG path
+        indexes: Dict layer name -> indexed field names
+        styles: List of (layer name, QML, SLD)
+        hashes: Optional dict layer name -> [(key, hash)] stored in FEATURE_HASHES
+        profiler: Profiler timing the style inserts as stage 'style', the rest as 'index'
+
+    Returns:
+        Number of indexes created, None if the file could not be updated
+    """
+    with profiler.stage('index'):
+        try:
+            dataset = gdal.OpenEx(path, gdal.OF_VECTOR | gdal.OF_UPDATE, allowed_drivers=['GPKG'])
+        except RuntimeError:
+            return None
+        if dataset is None or dataset.StartTransaction() != ogr.OGRERR_NONE:
+            return None
+        created = create_attribute_indexes(dataset, indexes)
+    with profiler.stage('style') as counts:
+        write_layer_styles(dataset, styles)
+        counts['features'] = len(styles)
+    with profiler.stage('index'):
+        if hashes:
+            write_feature_hashes(dataset, hashes)
+        if dataset.CommitTransaction() != ogr.OGRERR_NONE:
+            return None
+    return created
+
+
+def to_ogr_feature(feature, layer_defn, field_indexes=None):
+    """Build an OGR feature from a QgsFeature
+
+    Args:
+        feature: QgsFeature
+        layer_defn: OGR layer definition
+        field_indexes: OGR field index of each QgsFeature attribute (None: same order)
+    """
+    ogr_feature = ogr.Feature(layer_defn)
+    for index, value in enumerate(feature.attributes()):
+        ogr_index = index if field_indexes is None else field_indexes[index]
+        if ogr_index >= 0:
+            _set_field(ogr_feature, ogr_index, value)
+
+    geom = feature.geometry()
+    if not geom.isNull():
+        ogr_feature.SetGeometryDirectly(ogr.CreateGeometryFromWkb(bytes(geom.asWkb())))
+    return ogr_feature
+
+
+def _set_field(ogr_feature, index, value):
+    """Set an OGR field from a QgsFeature attribute value"""
+    if value is None or isinstance(value, QVariant) or (hasattr(value, 'isNull') and value.isNull()):
+        ogr_feature.SetFieldNull(index)
+    elif isinstance(value, QDateTime):
+        date, time = value.date(), value.time()
+        tz_flag = 100 if value.timeSpec() == Qt.UTC else 0
+        ogr_feature.SetField(index, date.year(), date.month(), date.day(),
+                             time.hour(), time.minute(), time.second() + time.msec() / 1000, tz_flag)
+    elif isinstance(value, QDate):
+        ogr_feature.SetField(index, value.year(), value.month(), value.day(), 0, 0, 0, 0)
+    elif isinstance(value, QTime):
+        ogr_feature.SetField(index, 0, 0, 0, value.hour(), value.minute(),
+                             value.second() + value.msec() / 1000, 0)
+    elif isinstance(value, bool):
+        ogr_feature.SetField(index, int(value))
+    elif isinstance(value, (list, tuple)):
+        field_type = ogr_feature.GetFieldType(index)
+        if field_type == ogr.OFTIntegerList:
+            ogr_feature.SetFieldIntegerList(index, [int(v) for v in value])
+        elif field_type == ogr.OFTInteger64List:
+            ogr_feature.SetFieldInteger64List(index, [int(v) for v in value])
+        elif field_type == ogr.OFTRealList:
+            ogr_feature.SetFieldDoubleList(index, [float(v) for v in value])
+        else:
+            ogr_feature.SetFieldStringList(index, [str(v) for v in value])
+    else:
+        ogr_feature.SetField(index, value)
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+"""Headless QGIS bootstrap for running the engine outside the desktop application."""
+import os
+
+
+def start_qgis(prefix_path=None):
+    """Start a headless QgsApplication and return it
+
+    Args:
+        prefix_path: QGIS install prefix; QGIS_PREFIX_PATH is used if None
+    """
+    # No display is needed, use the offscreen Qt platform unless told otherwise
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+    from qgis.core import QgsApplication
+
+    prefix_path = prefix_path or os.environ.get('QGIS_PREFIX_PATH')
+    if prefix_path:
+        QgsApplication.setPrefixPath(prefix_path, True)
+
+    app = QgsApplication([], False)
+    app.initQgis()
+    return app
+
+
+def stop_qgis(app):
+    """Shut down a QgsApplication started by start_qgis"""
+    if app is not None:
+        app.exitQgis()
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""Hilbert curve ordering of features.
+
+Rows inserted in Hilbert order of their centroids end up in SQLite pages
+together with their spatial neighbours, so a viewport query in QGIS reads
+fewer pages than with the file order of the GML.
+"""
+
+
+# Bits per axis of the Hilbert grid (65536 x 65536 cells)
+HILBERT_ORDER = 16
+
+
+def hilbert_index(x, y, order=HILBERT_ORDER):
+    """Return the distance along the Hilbert curve of grid cell (x, y)
+
+    Args:
+        x, y: Integer cell coordinates in [0, 2**order)
+        order: Bits per axis
+    """
+    n = 1 << order
+    d = 0
+    s = n >> 1
+    while s > 0:
+        rx = 1 if x & s else 0
+        ry = 1 if y & s else 0
+        d += s * s * ((3 * rx) ^ ry)
+        # Rotate the quadrant so the curve stays continuous
+        if ry == 0:
+            if rx == 1:
+                x = n - 1 - x
+                y = n - 1 - y
+            x, y = y, x
+        s >>= 1
+    return d
+
+
+def hilbert_order(points, order=HILBERT_ORDER):
+    """Return indexes of points sorted along the Hilbert curve of their extent
+
+    Args:
+        points: List of (x, y) tuples, None for features without geometry (sorted last)
+        order: Bits per axis
+
+    Returns:
+        List of indexes into points
+    """
+    valid = [p for p in points if p is not None]
+    if not valid:
+        return list(range(len(points)))
+
+    xmin = min(p[0] for p in valid)
+    ymin = min(p[1] for p in valid)
+    width = max(p[0] for p in valid) - xmin
+    height = max(p[1] for p in valid) - ymin
+    # Same scale on both axes keeps the cells square
+    scale = ((1 << order) - 1) / (max(width, height) or 1.0)
+
+    keys = []
+    for i, point in enumerate(points):
+        if point is None:
+            keys.append((1, 0, i))
+        else:
+            cell_x = int((point[0] - xmin) * scale)
+            cell_y = int((point[1] - ymin) * scale)
+            keys.append((0, hilbert_index(cell_x, cell_y, order), i))
+    keys.sort()
+    return [key[2] for key in keys]
+
+
+def hilbert_sort(features, order=HILBERT_ORDER):
+    """Return QgsFeatures sorted by the Hilbert index of their bounding box centres"""
+    points = []
+    for feature in features:
+        geom = feature.geometry()
+        if geom.isNull():
+            points.append(None)
+        else:
+            center = geom.boundingBox().center()
+            points.append((center.x(), center.y()))
+    return [features[i] for i in hilbert_order(points, order)]
@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+"""Hot folder daemon converting C/E pairs as their files arrive.
+
+HotFolder watches the Register C and E inbox folders (core/watcher.py). A
+.gml, .gml.gz or .zip file is ready once its size and modification time have
+not changed for the settle time, so files still being downloaded or copied
+are never read. Ready files are paired by GML name like find_pairs(); a
+complete pair is queued on a pool of warm worker processes
+(core/parallel.py) that keep their headless QGIS and transform context
+between jobs. The conversion manifest in the output folder skips pairs whose
+inputs and settings did not change, so restarting the daemon or downloading
+an unchanged unit again converts nothing. A worker crash (in GDAL or QGIS)
+breaks the pool; it is replaced and the pairs it was converting are queued
+again, a pair that crashed its workers twice only once its files change.
+"""
+import os
+import time
+from concurrent.futures.process import BrokenProcessPool
+
+from qgis.core import Qgis
+
+from .engine import output_files
+from .parallel import log_result, pair_result, start_pool, submit_pair
+from .vsi import expand_inputs, gml_basename
+from .watcher import make_watcher
+
+
+# Seconds a file must stay unchanged before it is treated as completely written
+DEFAULT_SETTLE = 5.0
+
+# Longest wait for folder events, bounds the delay of settle checks and stop()
+_WAIT = 1.0
+
+_INPUT_SUFFIXES = ('.gml', '.gml.gz', '.zip')
+
+# Broken pools a pair may be part of before it is failed until its files change
+_MAX_CRASHES = 2
+
+
+class HotFolder:
+    """Watches the C and E folders and converts complete pairs in warm worker processes
+
+    Args:
+        c_dir: Register C inbox folder
+        e_dir: Register E inbox folder
+        output_folder: Folder for output files
+        output_formats: List of output formats written in one pass
+        manifest: Manifest of the output folder
+        settings: Conversion settings recorded in the manifest
+        log: Callable(message, level)
+        workers: Number of warm worker processes
+        settle: Seconds a file must stay unchanged before it is converted
+        polling: Poll the folders instead of using inotify
+        poll_interval: Seconds between folder listings when polling
+        **pool_options: prefix_path, project_path, operation, plugin_dir and
+            engine_options for the workers (see start_pool)
+    """
+
+    def __init__(self, c_dir, e_dir, output_folder, output_formats, manifest, settings, log, workers=1,
+                 settle=DEFAULT_SETTLE, polling=False, poll_interval=2.0, **pool_options):
+        self.folders = {'C': c_dir, 'E': e_dir}
+        self.output_folder = output_folder
+        self.output_formats = output_formats
+        self.manifest = manifest
+        self.settings = settings
+        self.log = log
+        self.workers = workers
+        self.settle = settle
+        self.polling = polling
+        self.poll_interval = poll_interval
+        self.pool_options = pool_options
+
+        self.converted = 0
+        self.failed = 0
+        self._pool = None
+        self._stopped = False
+        # path -> (register, (size, mtime_ns), time the file was last seen changing)
+        self._pending = {}
+        # register -> GML name -> GML path of files completely written
+        self._ready = {'C': {}, 'E': {}}
+        # GML name -> (future, manifest record, output files) of queued pairs
+        self._running = {}
+        # Pairs whose inputs changed while they were converted
+        self._again = set()
+        # GML name -> number of broken pools the pair was running in
+        self._crashes = {}
+
+    def stop(self):
+        """Ask run() to return after the running conversions (safe in signal handlers)"""
+        self._stopped = True
+
+    def run(self):
+        """Watch the folders and convert pairs until stop() or Ctrl+C
+
+        Returns:
+            Tuple (pairs converted, pairs failed)
+        """
+        watcher, fallback_reason = make_watcher(self.folders.values(), self.polling, self.poll_interval)
+        if fallback_reason:
+            self.log(f"⚠ inotify not available ({fallback_reason}), polling the folders", Qgis.Warning)
+        self.log(f"Watching {self.folders['C']} and {self.folders['E']} ({watcher.name}), "
+                 f"{self.workers} worker processes")
+
+        # Files already in the inbox are handled like new ones; the manifest skips converted pairs
+        for register, folder in self.folders.items():
+            for name in sorted(os.listdir(folder)):
+                self._touch(register, os.path.join(folder, name))
+
+        self._pool = start_pool(self.workers, **self.pool_options)
+        try:
+            while not self._stopped:
+                for path in watcher.changes(_WAIT):
+                    register = self._register_of(path)
+                    if register:
+                        self._touch(register, path)
+                self._settle()
+                self._collect()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            watcher.close()
+            if self._running:
+                self.log(f"Stopping, waiting for {len(self._running)} running conversions")
+            self._again.clear()
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._collect(restart=False)
+            self._pool = None
+
+        self.log(f"STOPPED: {self.converted} successful, {self.failed} failed")
+        return self.converted, self.failed
+
+    def _register_of(self, path):
+        """Return the register ('C' or 'E') of a path in one of the folders"""
+        folder = os.path.dirname(path)
+        for register, register_folder in self.folders.items():
+            if os.path.normcase(os.path.abspath(register_folder)) == os.path.normcase(os.path.abspath(folder)):
+                return register
+        return None
+
+    def _touch(self, register, path):
+        """Record a new or changed input file; it becomes ready after the settle time"""
+        if not path.lower().endswith(_INPUT_SUFFIXES):
+            return
+        try:
+            stat = os.stat(path)
+        except OSError:
+            # Removed (or renamed) before it settled
+            self._pending.pop(path, None)
+            return
+        key = (stat.st_size, stat.st_mtime_ns)
+        previous = self._pending.get(path)
+        if previous is None or previous[1] != key:
+            self._pending[path] = (register, key, time.monotonic())
+
+    def _settle(self):
+        """Move files unchanged for the settle time to the ready files"""
+        now = time.monotonic()
+        for path, (register, key, since) in list(self._pending.items()):
+            if now - since < self.settle:
+                continue
+            try:
+                stat = os.stat(path)
+            except OSError:
+                del self._pending[path]
+                continue
+            if (stat.st_size, stat.st_mtime_ns) != key:
+                self._pending[path] = (register, (stat.st_size, stat.st_mtime_ns), now)
+                continue
+            del self._pending[path]
+            self._add_ready(register, path)
+
+    def _add_ready(self, register, path):
+        """Register the GML files of a completely written input and queue complete pairs"""
+        gml_paths, unreadable = expand_inputs([path])
+        for archive in unreadable:
+            self.log(f"⚠ Could not read {os.path.basename(archive)}", Qgis.Warning)
+        for gml_path in gml_paths:
+            filename = gml_basename(gml_path)
+            self._ready[register][filename] = gml_path
+            # New input, a pair failed after crashes is tried again
+            self._crashes.pop(filename, None)
+            self._queue(filename)
+
+    def _queue(self, filename):
+        """Submit a pair to the workers if both files are ready and the pair changed"""
+        c_path = self._ready['C'].get(filename)
+        e_path = self._ready['E'].get(filename)
+        if not c_path or not e_path:
+            return
+        if filename in self._running:
+            # Convert again with the new file when the running conversion is done
+            self._again.add(filename)
+            return
+
+        files = output_files(self.output_folder, filename, self.output_formats)
+        try:
+            record = self.manifest.pair_record(c_path, e_path, filename, self.settings, files)
+        except OSError as e:
+            self.log(f"⚠ Could not read {filename}: {e}", Qgis.Warning)
+            return
+        if self.manifest.is_unchanged(filename, record, files):
+            self.log(f"Skipping {filename}: unchanged since last conversion")
+            return
+
+        self.log(f"Queued {filename}")
+        # Missing input hashes are computed by the worker
+        try:
+            future = submit_pair(self._pool, c_path, e_path, filename, files, record)
+        except BrokenProcessPool:
+            self._restart_pool()
+            future = submit_pair(self._pool, c_path, e_path, filename, files, record)
+        self._running[filename] = (future, record, files)
+
+    def _collect(self, restart=True):
+        """Log finished pairs and record successful ones in the manifest
+
+        Args:
+            restart: Replace a pool broken by a crashed worker and queue its pairs again
+        """
+        broken = False
+        for filename, (future, record, files) in list(self._running.items()):
+            if not future.done():
+                continue
+            if future.cancelled():
+                del self._running[filename]
+                self.log(f"{filename}: not converted (stopped)")
+                continue
+            if restart and isinstance(future.exception(), BrokenProcessPool):
+                # Left in _running, _restart_pool() queues it again
+                broken = True
+                continue
+            del self._running[filename]
+
+            result = pair_result(future)
+            log_result(result, self.log, f"\n{filename}")
+            if result['success']:
+                self.converted += 1
+                self.manifest.update(filename, result.get('record') or record, files)
+                try:
+                    self.manifest.save()
+                except OSError as e:
+                    self.log(f"⚠ Could not write manifest: {e}", Qgis.Warning)
+            else:
+                self.failed += 1
+            self._crashes.pop(filename, None)
+
+            if filename in self._again:
+                self._again.discard(filename)
+                self._queue(filename)
+
+        if broken:
+            self._restart_pool()
+
+    def _restart_pool(self):
+        """Replace a pool broken by a crashed worker and queue its pairs again
+
+        Any of the running pairs may have crashed the worker, so each of them is
+        queued again; one that was running in _MAX_CRASHES broken pools fails.
+        """
+        self.log(f"⚠ A worker process died, restarting {self.workers} worker processes", Qgis.Warning)
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        self._pool = start_pool(self.workers, **self.pool_options)
+
+        crashed = list(self._running)
+        self._running.clear()
+        for filename in crashed:
+            self._crashes[filename] = self._crashes.get(filename, 0) + 1
+            if self._crashes[filename] >= _MAX_CRASHES and filename not in self._again:
+                self.failed += 1
+                self.log(f"ERROR: {filename}: worker crashed {self._crashes[filename]} times, "
+                         f"not converted until its files change", Qgis.Critical)
+                continue
+            self._again.discard(filename)
+            self._queue(filename)
@@ -0,0 +1,432 @@
+# -*- coding: utf-8 -*-
+"""Native streaming reader for KN GML files (INSPIRE CadastralParcel schema).
+
+KN files always follow the same INSPIRE CadastralParcel/CadastralZoning
+schema, so instead of the generic OGR GML driver (schema discovery, per
+feature OGR objects) this reader memory-maps the file, walks featureMember
+elements with incremental XML parsing and decodes posList coordinates
+straight into NumPy arrays. Each feature becomes a compact KnRecord
+(attribute tuple + ring arrays) which is turned into a QgsFeature only when
+requested, so KnGmlReader can be used wherever OgrGmlReader is.
+"""
+import mmap
+import re
+import struct
+import xml.etree.ElementTree as ET
+
+from qgis.core import (
+    QgsCoordinateReferenceSystem,
+    QgsFeature,
+    QgsField,
+    QgsFields,
+    QgsGeometry,
+)
+from qgis.PyQt.QtCore import QVariant, QDateTime, Qt
+
+from .readers import ReaderError
+from .vsi import VsiFile, is_virtual
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+# Output schema of each feature class: (field name, QVariant type, type name)
+KN_SCHEMA = {
+    'CadastralParcel': [
+        ('gml_id', QVariant.String, 'string'),
+        ('areaValue', QVariant.Double, 'double'),
+        ('areaValue_uom', QVariant.String, 'string'),
+        ('beginLifespanVersion', QVariant.DateTime, 'datetime'),
+        ('endLifespanVersion', QVariant.DateTime, 'datetime'),
+        ('localId', QVariant.String, 'string'),
+        ('namespace', QVariant.String, 'string'),
+        ('label', QVariant.String, 'string'),
+        ('nationalCadastralReference', QVariant.String, 'string'),
+        ('validFrom', QVariant.DateTime, 'datetime'),
+        ('validTo', QVariant.DateTime, 'datetime'),
+    ],
+    'CadastralZoning': [
+        ('gml_id', QVariant.String, 'string'),
+        ('beginLifespanVersion', QVariant.DateTime, 'datetime'),
+        ('endLifespanVersion', QVariant.DateTime, 'datetime'),
+        ('estimatedAccuracy', QVariant.Double, 'double'),
+        ('estimatedAccuracy_uom', QVariant.String, 'string'),
+        ('localId', QVariant.String, 'string'),
+        ('namespace', QVariant.String, 'string'),
+        ('label', QVariant.String, 'string'),
+        ('LocalisedCharacterString', QVariant.String, 'string'),
+        ('nationalCadastalZoningReference', QVariant.String, 'string'),
+        ('language', QVariant.String, 'string'),
+        ('sourceOfName', QVariant.String, 'string'),
+        ('pronunciation', QVariant.String, 'string'),
+        ('text', QVariant.String, 'string'),
+        ('script', QVariant.String, 'string'),
+        ('validFrom', QVariant.DateTime, 'datetime'),
+        ('validTo', QVariant.DateTime, 'datetime'),
+    ],
+}
+
+# Field name -> position in KN_SCHEMA, per feature class
+_SCHEMA_INDEX = {
+    layer: {name: i for i, (name, _, _) in enumerate(schema)}
+    for layer, schema in KN_SCHEMA.items()
+}
+
+# Property elements not converted to attributes
+_SKIPPED_PROPERTIES = {'geometry', 'referencePoint'}
+
+# Elements wrapping one feature
+_MEMBER_ELEMENTS = {'featureMember', 'featureMembers', 'member'}
+
+# Bytes read from the start of the file to find the CRS
+_HEAD_SIZE = 64 * 1024
+_SRS_NAME = re.compile(rb'srsName\s*=\s*"([^"]*)"')
+_EPSG_CODE = re.compile(r'EPSG(?::[\d.]*)?:+(\d+)$|/EPSG/[\d.]+/(\d+)$')
+
+# Geographic CRS whose URN/URL form uses latitude/longitude axis order
+_LAT_LON_CODES = {'4258', '4326'}
+
+
+def _local(tag):
+    """Return local name of a {namespace}tag"""
+    return tag.rsplit('}', 1)[-1]
+
+
+def parse_srs_name(srs_name):
+    """Return (EPSG code or None, True if coordinates are in lat/lon order)
+
+    Like the OGR GML driver, URN and URL style names of geographic CRS are
+    read as latitude/longitude and swapped to X/Y.
+    """
+    match = _EPSG_CODE.search(srs_name or '')
+    if not match:
+        return None, False
+    code = match.group(1) or match.group(2)
+    url_style = srs_name.startswith('urn:') or srs_name.startswith('http')
+    return code, url_style and code in _LAT_LON_CODES
+
+
+class KnRecord:
+    """Compact feature record
+
+    Attributes:
+        layer: Feature class name (CadastralParcel, CadastralZoning)
+        values: Attribute values (strings or None) in KN_SCHEMA order
+        polygons: List of polygons, each a list of (n, 2) float64 ring arrays
+    """
+
+    __slots__ = ('layer', 'values', 'polygons')
+
+    def __init__(self, layer, values, polygons):
+        self.layer = layer
+        self.values = values
+        self.polygons = polygons
+
+    def wkb(self):
+        """Return MultiPolygon WKB (little endian) of the record, or None"""
+        if not self.polygons:
+            return None
+        parts = [struct.pack('<BII', 1, 6, len(self.polygons))]
+        for rings in self.polygons:
+            parts.append(struct.pack('<BII', 1, 3, len(rings)))
+            for ring in rings:
+                parts.append(struct.pack('<I', len(ring)))
+                parts.append(numpy.ascontiguousarray(ring, dtype='<f8').tobytes())
+        return b''.join(parts)
+
+
+def parse_feature(element, swap_axes, unknown=None):
+    """Convert a CadastralParcel/CadastralZoning element to a KnRecord
+
+    Args:
+        unknown: Optional set receiving 'layer.property' of text properties not in KN_SCHEMA
+    """
+    layer = _local(element.tag)
+    index = _SCHEMA_INDEX[layer]
+    values = [None] * len(index)
+    polygons = []
+
+    for key, value in element.attrib.items():
+        if _local(key) == 'id':
+            values[index['gml_id']] = value
+
+    for prop in element:
+        prop_name = _local(prop.tag)
+        if prop_name == 'geometry':
+            polygons = parse_polygons(prop, swap_axes)
+            continue
+        if prop_name in _SKIPPED_PROPERTIES:
+            continue
+
+        # Leaf elements of a property become attributes named after the leaf
+        for leaf in prop.iter():
+            name = _local(leaf.tag)
+            if leaf.text and leaf.text.strip():
+                if name in index:
+                    if values[index[name]] is None:
+                        values[index[name]] = leaf.text.strip()
+                elif unknown is not None and len(leaf) == 0:
+                    unknown.add(f"{layer}.{name}")
+            uom = leaf.get('uom')
+            if uom is not None and f"{name}_uom" in index:
+                values[index[f"{name}_uom"]] = uom
+
+    return KnRecord(layer, tuple(values), polygons)
+
+
+def parse_polygons(geometry_element, swap_axes):
+    """Return list of polygons (lists of ring arrays) of a geometry property"""
+    polygons = []
+    for element in geometry_element.iter():
+        if _local(element.tag) not in ('Polygon', 'PolygonPatch'):
+            continue
+        rings = []
+        for boundary in element:
+            if _local(boundary.tag) not in ('exterior', 'interior', 'outerBoundaryIs', 'innerBoundaryIs'):
+                continue
+            for ring in boundary.iter():
+                if _local(ring.tag) == 'LinearRing':
+                    coords = parse_ring(ring, swap_axes)
+                    if coords is not None:
+                        rings.append(coords)
+        if rings:
+            polygons.append(rings)
+    return polygons
+
+
+def parse_ring(ring_element, swap_axes):
+    """Decode posList/pos/coordinates of a LinearRing into an (n, 2) array"""
+    for child in ring_element:
+        name = _local(child.tag)
+        if name == 'posList':
+            dimension = int(child.get('srsDimension', child.get('dimension', 2)))
+            coords = numpy.array(child.text.split(), dtype=numpy.float64).reshape(-1, dimension)[:, :2]
+            break
+        if name == 'pos':
+            coords = numpy.array(
+                [p.text.split()[:2] for p in ring_element if _local(p.tag) == 'pos'],
+                dtype=numpy.float64
+            )
+            break
+        if name == 'coordinates':
+            coords = numpy.array(
+                [c.split(',')[:2] for c in child.text.split()],
+                dtype=numpy.float64
+            )
+            break
+    else:
+        return None
+
+    if swap_axes:
+        coords = coords[:, ::-1]
+    return numpy.ascontiguousarray(coords)
+
+
+class KnGmlReader:
+    """Streaming reader for KN GML files with the same interface as OgrGmlReader
+
+    Args:
+        path: GML file path; /vsizip/ and /vsigzip/ paths are streamed instead of memory-mapped
+        layer_names: Feature classes the caller reads (all of KN_SCHEMA if None); only these
+            are looked for in the file
+    """
+
+    def __init__(self, path, layer_names=None):
+        if numpy is None:
+            raise ReaderError("The native KN reader requires NumPy")
+        self.path = path
+        self._file = None
+        self._map = None
+        try:
+            if is_virtual(path):
+                with VsiFile(path) as stream:
+                    head = stream.read(_HEAD_SIZE)
+            else:
+                self._file = open(path, 'rb')
+                self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+                head = self._map[:_HEAD_SIZE]
+        except (OSError, ValueError) as e:
+            raise ReaderError(str(e))
+
+        self._fields = {}
+        # Text properties of the file that are not in KN_SCHEMA (not converted)
+        self.unknown_properties = set()
+        srs_name = _SRS_NAME.search(head)
+        self.srs_name = srs_name.group(1).decode() if srs_name else None
+        self.epsg, self.swap_axes = parse_srs_name(self.srs_name)
+        wanted = [name for name in KN_SCHEMA if layer_names is None or name in layer_names]
+        try:
+            self._layers = self._find_layers(head, wanted)
+        except OSError as e:
+            raise ReaderError(str(e))
+
+    def _find_layers(self, head, names):
+        """Return the feature classes of names with at least one element in the file
+
+        CadastralZoning usually follows all parcels in Register C, so classes
+        not seen in the file head are searched from the end of the file
+        (archive members are scanned as a stream, which stops at the first
+        element of the last missing class).
+        """
+        found = [name for name in names if _has_element(head, name)]
+        missing = [name for name in names if name not in found]
+        if not missing:
+            return found
+        if self._map is not None:
+            found += [name for name in missing if _has_element(self._map, name)]
+        else:
+            found += _scan_elements(self.path, missing)
+        return [name for name in names if name in found]
+
+    def close(self):
+        """Unmap and close the file"""
+        if self._map is not None:
+            self._map.close()
+            self._file.close()
+            self._map = None
+            self._file = None
+
+    def layer_names(self):
+        """Return the requested feature classes found in the file"""
+        return list(self._layers)
+
+    def fields(self, layer_name):
+        """Return QgsFields of a feature class"""
+        if layer_name not in self._fields:
+            fields = QgsFields()
+            for name, variant_type, type_name in KN_SCHEMA[layer_name]:
+                fields.append(QgsField(name, variant_type, type_name))
+            self._fields[layer_name] = fields
+        return self._fields[layer_name]
+
+    def crs(self, layer_name):
+        """Return CRS declared by srsName (invalid CRS if not defined)"""
+        if self.epsg is None:
+            return QgsCoordinateReferenceSystem()
+        return QgsCoordinateReferenceSystem(f"EPSG:{self.epsg}")
+
+    def records(self, layer_names):
+        """Read the file once and yield KnRecord of the requested classes
+
+        Yields:
+            Tuple (KnRecord, fraction of the file read 0-1)
+        """
+        if self._map is None:
+            # Archive member: decompressed while parsing
+            with VsiFile(self.path) as stream:
+                for record in iter_records(stream, layer_names, self.swap_axes, self.unknown_properties):
+                    yield record, stream.fraction()
+            return
+
+        self._map.seek(0)
+        size = max(len(self._map), 1)
+        for record in iter_records(self._map, layer_names, self.swap_axes, self.unknown_properties):
+            yield record, self._map.tell() / size
+
+    def features(self, layer_names):
+        """Read the file once and yield features of the requested classes
+
+        Yields:
+            Tuple (layer_name, QgsFeature, fraction of the file read 0-1)
+        """
+        for layer_name in layer_names:
+            self.fields(layer_name)
+
+        for record, fraction in self.records(layer_names):
+            yield record.layer, record_to_feature(record, self._fields[record.layer]), fraction
+
+
+def iter_records(source, layer_names, swap_axes, unknown=None):
+    """Parse a file-like GML source and yield KnRecord of the requested classes
+
+    Args:
+        unknown: Optional set receiving 'layer.property' of text properties not in KN_SCHEMA
+    """
+    wanted = set(layer_names)
+    root = None
+    member = None
+    depth = 0
+    member_depth = None
+
+    for event, element in ET.iterparse(source, events=('start', 'end')):
+        if event == 'start':
+            depth += 1
+            if root is None:
+                root = element
+            elif member_depth is None and _local(element.tag) in _MEMBER_ELEMENTS:
+                member = element
+                member_depth = depth
+            continue
+
+        depth -= 1
+        if member_depth is not None and depth == member_depth:
+            # End of a feature element directly inside a member
+            if _local(element.tag) in wanted:
+                yield parse_feature(element, swap_axes, unknown)
+            element.clear()
+            # A featureMembers wrapper holds all features: drop each one as it completes
+            member.remove(element)
+        elif member_depth is not None and depth == member_depth - 1:
+            # End of the member: drop parsed elements to keep memory flat
+            member = None
+            member_depth = None
+            root.clear()
+
+
+def _has_element(data, name):
+    """Return True if bytes or an mmap hold a start or end tag of an element
+
+    Searched from the end, where CadastralZoning follows the parcels.
+    """
+    needle = name.encode()
+    end = len(data)
+    while True:
+        position = data.rfind(needle, 0, end)
+        if position < 0:
+            return False
+        before = data[position - 1:position]
+        after = data[position + len(needle):position + len(needle) + 1]
+        if before in (b'<', b':', b'/') and after in (b' ', b'\t', b'\r', b'\n', b'/', b'>'):
+            return True
+        end = position + len(needle) - 1
+
+
+def _scan_elements(path, names, block_size=_HEAD_SIZE * 16):
+    """Return the names of elements found in a streamed (archive) file"""
+    found = set()
+    overlap = max(len(name) for name in names) + 2
+    tail = b''
+    with VsiFile(path) as stream:
+        while len(found) < len(names):
+            block = stream.read(block_size)
+            if not block:
+                break
+            data = tail + block
+            found.update(name for name in names if name not in found and _has_element(data, name))
+            tail = data[-overlap:]
+    return list(found)
+
+
+def record_to_feature(record, fields):
+    """Build a QgsFeature from a KnRecord"""
+    feature = QgsFeature(fields)
+    attributes = []
+    for (name, variant_type, _), value in zip(KN_SCHEMA[record.layer], record.values):
+        if value is None:
+            attributes.append(None)
+        elif variant_type == QVariant.Double:
+            attributes.append(float(value))
+        elif variant_type == QVariant.DateTime:
+            attributes.append(QDateTime.fromString(value, Qt.ISODate))
+        else:
+            attributes.append(value)
+    feature.setAttributes(attributes)
+
+    wkb = record.wkb()
+    if wkb is not None:
+        geom = QgsGeometry()
+        geom.fromWkb(wkb)
+        feature.setGeometry(geom)
+    return feature
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""Buffered, rate-limited log output for the dialog and the QGIS message log.
+
+Every log line used to go to QgsMessageLog and QTextEdit.append() at once;
+in large batches the widget relayout and message log signals cost more than
+the lines are worth. BufferedLog collects the lines and hands them to the
+display and the message log in one block per timer tick (10 per second by
+default). Lines waiting for display are kept in a ring buffer, so a flood of
+messages cannot grow memory; the log file receives every line unfiltered.
+"""
+import time
+from collections import deque
+
+from qgis.core import Qgis, QgsMessageLog
+from qgis.PyQt.QtCore import QObject, QTimer
+
+
+# Log file written in the output folder of a batch
+LOG_FILE_NAME = 'kngml2gpkg.log'
+
+# Message level -> name in the log file
+LEVEL_NAMES = {
+    Qgis.Info: 'INFO',
+    Qgis.Success: 'OK',
+    Qgis.Warning: 'WARNING',
+    Qgis.Critical: 'ERROR',
+}
+
+# Message level -> severity used by the level filter (Success is informational)
+_SEVERITY = {
+    Qgis.Info: 0,
+    Qgis.Success: 0,
+    Qgis.Warning: 1,
+    Qgis.Critical: 2,
+}
+
+
+class BufferedLog(QObject):
+    """Batches log lines and flushes them at a fixed rate
+
+    Args:
+        display: Callable(list of lines) showing lines in the UI; None for message log only
+        tag: QgsMessageLog tag
+        interval: Flush interval in milliseconds
+        max_lines: Capacity of the ring buffer of lines waiting for display
+        min_level: Lowest message level shown in the UI and the message log
+        parent: Parent QObject
+    """
+
+    def __init__(self, display=None, tag='knGML2GPKG', interval=100, max_lines=5000,
+                 min_level=Qgis.Info, parent=None):
+        super().__init__(parent)
+        self.display = display
+        self.tag = tag
+        self.min_level = min_level
+        self._pending = deque(maxlen=max_lines)
+        self._dropped = 0
+        self._file = None
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(interval)
+        self._timer.timeout.connect(self.flush)
+
+    def open_file(self, path):
+        """Write all following lines to a log file (appended), return False on error"""
+        self.close_file()
+        try:
+            self._file = open(path, 'a', encoding='utf-8')
+        except OSError:
+            return False
+        self._file.write(f"\n--- {time.strftime('%Y-%m-%d %H:%M:%S')} ---\n")
+        return True
+
+    def close_file(self):
+        """Flush and close the log file"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def write(self, message, level=Qgis.Info):
+        """Queue a log line"""
+        if self._file is not None:
+            self._file.write(f"{time.strftime('%H:%M:%S')} {LEVEL_NAMES.get(level, 'INFO'):7} {message}\n")
+
+        if _SEVERITY.get(level, 0) < _SEVERITY.get(self.min_level, 0):
+            return
+        if len(self._pending) == self._pending.maxlen:
+            self._dropped += 1
+        self._pending.append((message, level))
+        if not self._timer.isActive():
+            self._timer.start()
+
+    def flush(self):
+        """Hand all queued lines to the display and the message log"""
+        self._timer.stop()
+        if self._file is not None:
+            self._file.flush()
+        if not self._pending:
+            return
+
+        pending = list(self._pending)
+        self._pending.clear()
+        if self._dropped:
+            pending.insert(0, (f"... {self._dropped} lines not shown (see log file)", Qgis.Warning))
+            self._dropped = 0
+
+        # One message log entry per run of lines with the same level
+        block = []
+        block_level = pending[0][1]
+        for message, level in pending:
+            if level != block_level:
+                QgsMessageLog.logMessage('\n'.join(block), self.tag, block_level)
+                block = []
+                block_level = level
+            block.append(message)
+        QgsMessageLog.logMessage('\n'.join(block), self.tag, block_level)
+
+        if self.display is not None:
+            self.display([message for message, _ in pending])
+
+    def close(self):
+        """Flush the queued lines and close the log file"""
+        self.flush()
+        self.close_file()
@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+"""Conversion manifest used to skip unchanged GML pairs.
+
+The manifest is a JSON file in the output folder. For every converted pair it
+records a content hash of the C and E input files and the settings that
+determine the output (plugin version, style hashes, transformation, reader).
+A later batch converts a pair again only if one of these changed or one of
+its output files is missing. Input hashes are reused while size and
+modification time of a file are unchanged, so checking an unchanged folder
+does not read the GML files. Planning only hashes an input whose hash can
+prove the pair unchanged (same size, new modification time); all other
+hashes are computed by complete_record() where the pair is converted.
+"""
+import configparser
+import glob
+import hashlib
+import json
+import os
+
+from .vsi import real_path, split_virtual, zip_member_info
+
+
+MANIFEST_NAME = 'kngml2gpkg_manifest.json'
+MANIFEST_VERSION = 1
+
+_CHUNK_SIZE = 1024 * 1024
+
+
+def file_hash(path):
+    """Return the BLAKE2b content hash (hex) of a file"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def input_hash(path):
+    """Return the content hash of a GML input
+
+    A member of a ZIP archive is identified by its CRC-32 and size from the
+    archive directory, so unchanged members of a re-downloaded archive are not
+    converted again. A .gml.gz is hashed as stored (compressed).
+    """
+    if split_virtual(path)[0] == 'zip':
+        info = zip_member_info(path)
+        return f"zip-crc32-{info.CRC:08x}-{info.file_size}"
+    return file_hash(real_path(path))
+
+
+def complete_record(record, c_path, e_path):
+    """Compute the input hashes missing in a pair_record() entry
+
+    Called by the task or worker process converting the pair, so hashing
+    does not hold up the planning of a batch. An input that cannot be read
+    keeps hash None.
+
+    Returns:
+        The completed record
+    """
+    for role, path in (('C', c_path), ('E', e_path)):
+        if record['inputs'][role]['hash'] is None:
+            try:
+                record['inputs'][role]['hash'] = input_hash(path)
+            except OSError:
+                pass
+    return record
+
+
+def plugin_version(plugin_dir):
+    """Return the plugin version from metadata.txt ('' if not available)"""
+    parser = configparser.ConfigParser(interpolation=None)
+    try:
+        parser.read(os.path.join(plugin_dir, 'metadata.txt'), encoding='utf-8')
+        return parser.get('general', 'version', fallback='')
+    except configparser.Error:
+        return ''
+
+
+def style_hashes(plugin_dir):
+    """Return dict QML file name -> content hash of the bundled styles"""
+    return {
+        os.path.basename(path): file_hash(path)
+        for path in sorted(glob.glob(os.path.join(plugin_dir, 'styles', '*.qml')))
+    }
+
+
+class Manifest:
+    """Manifest of the pairs converted into one output folder
+
+    Args:
+        output_folder: Folder holding the outputs and the manifest file
+    """
+
+    def __init__(self, output_folder):
+        self.path = os.path.join(output_folder, MANIFEST_NAME)
+        self.pairs = {}
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == MANIFEST_VERSION:
+                self.pairs = data.get('pairs', {})
+        except (OSError, ValueError):
+            pass
+
+    def _input_record(self, path, previous, candidate):
+        """Return {size, mtime_ns, hash} of an input
+
+        The previous hash is reused if the file did not change. A file that
+        changed is only hashed if candidate (the pair may still be unchanged)
+        and its content can be the same: same size, or a ZIP member (hashed
+        from the archive directory); otherwise hash is None.
+        """
+        stat = os.stat(real_path(path))
+        if previous and previous.get('size') == stat.st_size and previous.get('mtime_ns') == stat.st_mtime_ns:
+            return previous
+        record = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'hash': None}
+        if candidate and previous and (previous.get('size') == stat.st_size or split_virtual(path)[0] == 'zip'):
+            record['hash'] = input_hash(path)
+        return record
+
+    def pair_record(self, c_path, e_path, filename, settings, files=None):
+        """Return the manifest entry describing a pair converted with settings
+
+        Args:
+            files: Dict output format -> output file of the pair; without it the
+                entry is built from file stats only (the pair is converted anyway)
+        """
+        previous = self.pairs.get(filename, {})
+        candidate = files is not None and previous.get('settings') == settings and \
+            self._outputs_present(previous, files)
+        previous_inputs = previous.get('inputs', {})
+        return {
+            'inputs': {
+                'C': self._input_record(c_path, previous_inputs.get('C'), candidate),
+                'E': self._input_record(e_path, previous_inputs.get('E'), candidate),
+            },
+            'settings': settings,
+        }
+
+    @staticmethod
+    def _outputs_present(previous, files):
+        return all(
+            os.path.basename(path) in previous.get('outputs', []) and os.path.exists(path)
+            for path in files.values()
+        )
+
+    def is_unchanged(self, filename, record, files):
+        """Return True if the pair was converted from the same inputs and settings
+
+        Args:
+            filename: Pair basename
+            record: Entry returned by pair_record
+            files: Dict output format -> output file of the pair
+        """
+        previous = self.pairs.get(filename)
+        if not previous:
+            return False
+        same_inputs = all(
+            record['inputs'][role]['hash'] is not None and
+            previous['inputs'].get(role, {}).get('hash') == record['inputs'][role]['hash']
+            for role in ('C', 'E')
+        )
+        return same_inputs and previous.get('settings') == record['settings'] and \
+            self._outputs_present(previous, files)
+
+    def plan(self, pairs, files_for, settings):
+        """Split pairs into pairs to convert and unchanged pairs
+
+        Args:
+            pairs: List of (c_path, e_path, basename)
+            files_for: Callable(basename) returning dict output format -> output file
+            settings: Conversion settings (JSON serializable dict)
+
+        Returns:
+            Tuple (pairs to convert, unchanged basenames, dict basename -> record)
+        """
+        todo = []
+        unchanged = []
+        records = {}
+        for c_path, e_path, filename in pairs:
+            files = files_for(filename)
+            record = self.pair_record(c_path, e_path, filename, settings, files)
+            records[filename] = record
+            if self.is_unchanged(filename, record, files):
+                unchanged.append(filename)
+            else:
+                todo.append((c_path, e_path, filename))
+        return todo, unchanged, records
+
+    def update(self, filename, record, files):
+        """Store the entry of a successfully converted pair
+
+        Inputs without hash (see complete_record) are stored as they are and
+        never match a later run.
+        """
+        previous_outputs = set()
+        if self.pairs.get(filename, {}).get('inputs') == record['inputs'] and \
+                self.pairs[filename].get('settings') == record['settings']:
+            # Same conversion written to another format: keep the formats written before
+            previous_outputs = set(self.pairs[filename].get('outputs', []))
+        entry = dict(record)
+        entry['outputs'] = sorted(previous_outputs | {os.path.basename(path) for path in files.values()})
+        self.pairs[filename] = entry
+
+    def save(self):
+        """Write the manifest (atomically, a crash leaves the previous one)"""
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': MANIFEST_VERSION, 'pairs': self.pairs}, f, indent=1, sort_keys=True)
+        os.replace(temp_path, self.path)
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""In-memory output layers.
+
+Used for DXF output: the converted layers are kept in QGIS memory layers,
+styled and handed to QgsDxfExport directly, so nothing is written to disk
+except the DXF itself. The interface matches GpkgWriter (create_layer, and
+layers with addFeatures()/errorMessage()), so the engine fills both the same
+way.
+"""
+from qgis.core import QgsVectorLayer
+
+
+class MemoryLayerSink:
+    """Collects output layers as QGIS memory layers
+
+    Args:
+        crs: QgsCoordinateReferenceSystem of all layers
+    """
+
+    def __init__(self, crs):
+        self.crs = crs
+        self.layers = {}
+
+    def create_layer(self, layer_name, fields):
+        """Create an empty MultiPolygon memory layer
+
+        Returns:
+            MemoryLayer with the addFeatures()/errorMessage() interface of QgsVectorFileWriter
+        """
+        layer = QgsVectorLayer(f"MultiPolygon?crs={self.crs.authid()}", layer_name, 'memory')
+        layer.dataProvider().addAttributes(fields.toList())
+        layer.updateFields()
+        self.layers[layer_name] = layer
+        return MemoryLayer(layer)
+
+    def close(self):
+        """Release all layers"""
+        self.layers = {}
+
+
+class MemoryLayer:
+    """Writer into one memory layer of a MemoryLayerSink"""
+
+    def __init__(self, layer):
+        self.layer = layer
+        self.provider = layer.dataProvider()
+
+    def addFeatures(self, features):
+        """Append features, return False on error"""
+        success, _ = self.provider.addFeatures(features)
+        return success
+
+    def errorMessage(self):
+        """Return the last provider error"""
+        return self.provider.lastError()
@@ -0,0 +1,318 @@
+# -*- coding: utf-8 -*-
+"""National mosaic: all cadastral units merged into one GeoPackage.
+
+Worker processes convert one GML pair each (read, fix, transform) and return
+the features of the unit as plain rows (attribute values + WKB). The parent
+process is the only writer: it appends the rows of every finished unit to the
+national ParcelC/ParcelE/CadastralUnit layers of a single GpkgWriter
+transaction, with an extra unit_code column. Parcels lying on unit borders
+appear in the files of both units; after the last unit the duplicates are
+removed by gml_id, then the attribute indexes (including unit_code) and one
+spatial index per layer are built; the layer styles are stored in the same
+transaction.
+"""
+import multiprocessing
+import os
+import re
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from qgis.core import QgsField, QgsFields, QgsCoordinateReferenceSystem, Qgis
+from qgis.PyQt.QtCore import QVariant, QDate, QDateTime, QTime, Qt
+
+from .gpkg_writer import ATTRIBUTE_INDEXES, GpkgWriter, GpkgWriterError
+from .parallel import init_worker, worker_engine
+
+
+# Column holding the cadastral unit code of each feature
+UNIT_CODE_FIELD = 'unit_code'
+
+# Field used to drop parcels present in two neighbouring units
+DEDUPLICATE_FIELD = 'gml_id'
+
+_UNIT_CODE = re.compile(r'\d{6}')
+
+def unit_code(filename):
+    """Return the cadastral unit code of a pair basename (6 digit KU code, or the file stem)"""
+    stem = os.path.splitext(os.path.basename(filename))[0]
+    match = _UNIT_CODE.search(stem)
+    return match.group(0) if match else stem
+
+
+def _plain(value):
+    """Convert an attribute value to a picklable plain value"""
+    if value is None or (hasattr(value, 'isNull') and value.isNull()):
+        return None
+    if isinstance(value, (QDateTime, QDate, QTime)):
+        return value.toString(Qt.ISODateWithMs)
+    return value
+
+
+class RowSink:
+    """Sink collecting converted features as plain rows"""
+
+    def __init__(self):
+        self.layers = {}
+
+    def create_layer(self, layer_name, fields):
+        """Return a RowLayer with the addFeatures()/errorMessage() interface of QgsVectorFileWriter"""
+        layer = RowLayer(fields)
+        self.layers[layer_name] = layer
+        return layer
+
+
+class RowLayer:
+    """Rows and field definitions of one layer of a RowSink"""
+
+    def __init__(self, fields):
+        self.fields = [
+            (field.name(), int(field.type()), field.typeName(), field.length(), int(field.subType()))
+            for field in fields
+        ]
+        self.rows = []
+
+    def addFeatures(self, features):
+        """Append features as (values, WKB) rows"""
+        for feature in features:
+            geom = feature.geometry()
+            wkb = None if geom.isNull() else bytes(geom.asWkb())
+            self.rows.append((tuple(_plain(value) for value in feature.attributes()), wkb))
+        return True
+
+    def errorMessage(self):
+        return ''
+
+
+def collect_pair(engine, c_path, e_path):
+    """Convert a pair into plain rows
+
+    Returns:
+        Dict layer name -> {'fields': [(name, type, type name, length, list item type)],
+        'rows': [(values, wkb)]},
+        None if the conversion failed
+    """
+    sink = RowSink()
+    if not engine.convert_to_sink(c_path, e_path, sink):
+        return None
+    return {name: {'fields': layer.fields, 'rows': layer.rows} for name, layer in sink.layers.items()}
+
+
+def _collect_unit(engine, c_path, e_path, filename, messages):
+    """Convert one pair into rows, return a result dict; a failure is logged to messages"""
+    start = time.perf_counter()
+    try:
+        layers = collect_pair(engine, c_path, e_path)
+    except Exception as e:
+        messages.append((f"ERROR: {e}", int(Qgis.Critical)))
+        layers = None
+
+    return {
+        'filename': filename,
+        'layers': layers,
+        'seconds': time.perf_counter() - start,
+        'log': messages,
+    }
+
+
+def _collect_in_worker(c_path, e_path, filename):
+    """Convert one pair inside a worker, return a picklable result dict"""
+    messages = []
+
+    def log(message, level=Qgis.Info):
+        messages.append((message, int(level)))
+
+    return _collect_unit(worker_engine(log), c_path, e_path, filename, messages)
+
+
+class MosaicWriter:
+    """Appends the rows of converted units to the national layers
+
+    Args:
+        output_gpkg: Output GPKG path (replaced if it exists)
+        log: Callable(message, level)
+        attribute_indexes: Dict layer name -> indexed field names
+    """
+
+    def __init__(self, output_gpkg, log, attribute_indexes=None):
+        from .engine import TARGET_CRS
+        if os.path.exists(output_gpkg):
+            os.remove(output_gpkg)
+        self.output_gpkg = output_gpkg
+        self.log = log
+        self.writer = GpkgWriter(output_gpkg, QgsCoordinateReferenceSystem(TARGET_CRS),
+                                 attribute_indexes=attribute_indexes)
+        self.layers = {}
+        self.field_names = {}
+
+    def _layer(self, layer_name, field_specs):
+        """Return the national layer, created from the fields of the first unit"""
+        if layer_name not in self.layers:
+            fields = QgsFields()
+            for name, variant_type, type_name, length, sub_type in field_specs:
+                fields.append(QgsField(name, QVariant.Type(variant_type), type_name, length, 0, '',
+                                       QVariant.Type(sub_type)))
+            fields.append(QgsField(UNIT_CODE_FIELD, QVariant.String, 'string'))
+            self.layers[layer_name] = self.writer.create_layer(layer_name, fields)
+            self.field_names[layer_name] = [spec[0] for spec in field_specs]
+        return self.layers[layer_name]
+
+    def add_unit(self, filename, layers):
+        """Append all layers of one unit, return False on error"""
+        code = unit_code(filename)
+        for layer_name, data in layers.items():
+            layer = self._layer(layer_name, data['fields'])
+            names = [spec[0] for spec in data['fields']]
+            if names == self.field_names[layer_name]:
+                rows = ((values + (code,), wkb) for values, wkb in data['rows'])
+            else:
+                # Schema of this unit differs (OGR schema discovery): map values by field name
+                positions = [names.index(name) if name in names else None for name in self.field_names[layer_name]]
+                rows = (
+                    (tuple(None if p is None else values[p] for p in positions) + (code,), wkb)
+                    for values, wkb in data['rows']
+                )
+            if not layer.add_rows(rows):
+                self.log(f"ERROR: {layer.errorMessage()}", Qgis.Critical)
+                return False
+        return True
+
+    def finish(self, styles=()):
+        """Remove border duplicates, store the styles, commit and build the indexes
+
+        Args:
+            styles: List of (layer name, QML, SLD)
+        """
+        self.writer.add_styles([style for style in styles if style[0] in self.layers])
+        for layer_name in self.layers:
+            if DEDUPLICATE_FIELD in self.field_names[layer_name]:
+                removed = self.writer.remove_duplicates(layer_name, DEDUPLICATE_FIELD)
+                if removed:
+                    self.log(f"  {layer_name}: removed {removed} features duplicated across unit borders")
+        self.log("Building indexes...")
+        return self.writer.close()
+
+    def abort(self):
+        """Drop the incomplete mosaic"""
+        self.writer.abort()
+        if os.path.exists(self.output_gpkg):
+            os.remove(self.output_gpkg)
+
+
+def build_mosaic(pairs, output_gpkg, workers=1, log=None, progress=None, prefix_path=None,
+                 project_path=None, operation=None, plugin_dir=None, engine_options=None,
+                 transform_context=None):
+    """Convert all pairs into one national GPKG
+
+    Args:
+        pairs: List of (c_path, e_path, basename) as returned by find_pairs
+        output_gpkg: Output GPKG path
+        workers: Number of worker processes (1 converts in this process)
+        log: Callable(message, level) receiving log lines
+        progress: Callable(int) receiving progress 0-100
+        prefix_path: QGIS install prefix for the workers
+        project_path: QGIS project whose transform context the workers use
+        operation: PROJ pipeline forced for EPSG:4258 -> EPSG:5514
+        plugin_dir: Directory containing the styles folder
+        engine_options: Extra keyword arguments for ConversionEngine
+        transform_context: Transform context for in-process conversion (workers == 1)
+
+    Returns:
+        Tuple (number of units merged, number of units failed); (0, len(pairs)) if the
+        mosaic could not be written
+    """
+    from .engine import PLUGIN_DIR, ConversionEngine
+
+    def emit(message, level=Qgis.Info):
+        if log:
+            log(message, level)
+
+    engine_options = engine_options or {}
+    plugin_dir = plugin_dir or PLUGIN_DIR
+    total_pairs = len(pairs)
+
+    try:
+        attribute_indexes = engine_options.get('attribute_indexes')
+        mosaic = MosaicWriter(output_gpkg, emit,
+                              ATTRIBUTE_INDEXES if attribute_indexes is None else attribute_indexes)
+    except (GpkgWriterError, OSError) as e:
+        emit(f"ERROR: {e}", Qgis.Critical)
+        return 0, total_pairs
+
+    merged = 0
+    failed = 0
+
+    def add_result(done, result):
+        nonlocal merged, failed
+        emit(f"\n[{done}/{total_pairs}] {result['filename']} ({result['seconds']:.1f} s)")
+        for message, level in result['log']:
+            emit(message, Qgis.MessageLevel(level))
+        if result['layers'] is None:
+            emit("  ✗ FAILED", Qgis.Critical)
+            failed += 1
+            return True
+        if not mosaic.add_unit(result['filename'], result['layers']):
+            return False
+        emit(f"  ✓ Merged unit {unit_code(result['filename'])}")
+        merged += 1
+        if progress:
+            progress(int((done / total_pairs) * 95))
+        return True
+
+    try:
+        if workers == 1:
+            engine = ConversionEngine(
+                log=emit,
+                transform_context=transform_context,
+                plugin_dir=plugin_dir,
+                **engine_options
+            )
+            for done, (c_path, e_path, filename) in enumerate(pairs, 1):
+                # The engine logs directly, only a failure is left in the result log
+                result = _collect_unit(engine, c_path, e_path, filename, [])
+                if not add_result(done, result):
+                    mosaic.abort()
+                    return 0, total_pairs
+        else:
+            workers = min(workers or os.cpu_count() or 1, total_pairs) or 1
+            emit(f"Starting {workers} worker processes")
+            context = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=context,
+                initializer=init_worker,
+                initargs=(prefix_path, project_path, operation, plugin_dir, engine_options)
+            ) as pool:
+                remaining = deque(pairs)
+                pending = deque()
+                done = 0
+                while remaining or pending:
+                    # Bounded number of units in flight, so finished units do not pile up in memory
+                    while remaining and len(pending) < workers * 2:
+                        c_path, e_path, filename = remaining.popleft()
+                        pending.append((filename, pool.submit(_collect_in_worker, c_path, e_path, filename)))
+                    filename, future = pending.popleft()
+                    done += 1
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        # Worker process died (crash in QGIS/GDAL) or result could not be returned
+                        result = {'filename': filename, 'layers': None, 'seconds': 0.0,
+                                  'log': [(f"ERROR: Worker failed: {e}", int(Qgis.Critical))]}
+                    if not add_result(done, result):
+                        pool.shutdown(wait=True, cancel_futures=True)
+                        mosaic.abort()
+                        return 0, total_pairs
+
+        emit("\nRemoving duplicates...")
+        if not mosaic.finish(ConversionEngine(log=emit, plugin_dir=plugin_dir).layer_styles()):
+            emit(f"ERROR: Could not commit mosaic: {mosaic.writer.error}", Qgis.Critical)
+            mosaic.abort()
+            return 0, total_pairs
+    except BaseException:
+        mosaic.abort()
+        raise
+
+    if progress:
+        progress(100)
+    return merged, failed
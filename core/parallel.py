@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+"""Parallel batch conversion with one headless QGIS per worker process.
+
+Every GML pair is independent (own output file, own .gfs cleanup), so pairs
+are distributed over a process pool. Each worker starts QGIS once in its
+initializer and converts as many pairs as it is given. Log lines are collected
+in the worker and returned with the result, so the parent prints the log of a
+pair in one block when the pair is done.
+"""
+import atexit
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from .headless import start_qgis, stop_qgis
+
+
+# Per-process state of a worker, set by init_worker
+_worker = {}
+
+
+def init_worker(prefix_path, project_path, operation, plugin_dir, engine_options):
+    """Start QGIS and build and warm up the transform context in a worker process
+
+    Initializer of the pools of start_pool() and of the national mosaic.
+    """
+    app = start_qgis(prefix_path)
+    atexit.register(stop_qgis, app)
+
+    from .engine import make_transform_context, warm_up_transform
+    _worker['app'] = app
+    _worker['transform_context'] = make_transform_context(project_path, operation)
+    warm_up_transform(_worker['transform_context'])
+    _worker['plugin_dir'] = plugin_dir
+    _worker['engine_options'] = engine_options
+
+
+def worker_engine(log):
+    """Return a ConversionEngine using the state of this worker process"""
+    from .engine import ConversionEngine
+
+    return ConversionEngine(
+        log=log,
+        transform_context=_worker['transform_context'],
+        plugin_dir=_worker['plugin_dir'],
+        **_worker['engine_options']
+    )
+
+
+def _convert_pair(c_path, e_path, filename, files, record=None):
+    """Convert one pair inside a worker, return a picklable result dict
+
+    A manifest record is completed with the input hashes in the worker and
+    returned as 'record'.
+    """
+    from qgis.core import Qgis
+    from .manifest import complete_record
+
+    messages = []
+
+    def log(message, level=Qgis.Info):
+        messages.append((message, int(level)))
+
+    engine = worker_engine(log)
+
+    start = time.perf_counter()
+    if record is not None:
+        complete_record(record, c_path, e_path)
+    try:
+        success = engine.convert_pair(c_path, e_path, files)
+    except Exception as e:
+        log(f"ERROR: {e}", Qgis.Critical)
+        success = False
+
+    return {
+        'filename': filename,
+        'files': files,
+        'record': record,
+        'success': success,
+        'seconds': time.perf_counter() - start,
+        'pid': os.getpid(),
+        'log': messages,
+    }
+
+
+def start_pool(workers, prefix_path=None, project_path=None, operation=None, plugin_dir=None,
+               engine_options=None):
+    """Return a process pool of warm workers converting pairs with submit_pair()
+
+    Every worker starts its headless QGIS and transform context once and keeps
+    them for all pairs it converts.
+    """
+    from .engine import PLUGIN_DIR
+
+    # spawn gives every worker a clean interpreter with its own QGIS/GDAL state
+    context = multiprocessing.get_context('spawn')
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=context,
+        initializer=init_worker,
+        initargs=(prefix_path, project_path, operation, plugin_dir or PLUGIN_DIR, engine_options or {})
+    )
+
+
+def warm_up(pool, workers):
+    """Start all workers of a pool from start_pool() now, return their process ids
+
+    Raises:
+        BrokenProcessPool: A worker could not start QGIS
+    """
+    # Workers are spawned on demand; submitting one task per worker before waiting starts all of them
+    futures = [pool.submit(os.getpid) for _ in range(workers)]
+    return {future.result() for future in futures}
+
+
+def submit_pair(pool, c_path, e_path, filename, files, record=None):
+    """Submit one pair to a pool from start_pool(), return its future
+
+    Args:
+        record: Manifest record of the pair, returned completed as result['record']
+    """
+    return pool.submit(_convert_pair, c_path, e_path, filename, files, record)
+
+
+def pair_result(future):
+    """Return the result dict of a finished submit_pair() future"""
+    from qgis.core import Qgis
+    try:
+        return future.result()
+    except Exception as e:
+        # Worker process died (crash in QGIS/GDAL) or result could not be returned
+        return {
+            'success': False,
+            'seconds': 0.0,
+            'pid': None,
+            'log': [(f"ERROR: Worker failed: {e}", int(Qgis.Critical))],
+        }
+
+
+def log_result(result, emit, header):
+    """Emit the header line, the collected log and the outcome of a pair result"""
+    from qgis.core import Qgis
+
+    emit(f"{header} (worker {result['pid']}, {result['seconds']:.1f} s)")
+    for message, level in result['log']:
+        emit(message, Qgis.MessageLevel(level))
+
+    if result['success']:
+        emit(f"  ✓ SUCCESS")
+    else:
+        emit(f"  ✗ FAILED", Qgis.Critical)
+
+
+def convert_parallel(pairs, output_folder, output_format='GPKG', workers=None, log=None, progress=None,
+                     prefix_path=None, project_path=None, operation=None, plugin_dir=None,
+                     engine_options=None, records=None):
+    """Convert GML pairs in a pool of worker processes
+
+    Args:
+        pairs: List of (c_path, e_path, basename) as returned by find_pairs
+        output_folder: Folder for output files
+        output_format: 'GPKG', 'DXF' or a list of formats written in one pass
+        workers: Number of worker processes (default: CPU count)
+        log: Callable(message, level) receiving log lines in the parent
+        progress: Callable(int) receiving progress 0-100 in the parent
+        prefix_path: QGIS install prefix for the workers
+        project_path: QGIS project whose transform context the workers use
+        operation: PROJ pipeline forced for EPSG:4258 -> EPSG:5514
+        plugin_dir: Directory containing the styles folder
+        engine_options: Extra keyword arguments for ConversionEngine in the workers
+        records: Dict basename -> manifest record; the workers compute the missing input
+            hashes and the completed records replace the entries
+
+    Returns:
+        List of (basename, output_file, success) in the order of pairs; output_file is the
+        file of the first format
+    """
+    from qgis.core import Qgis
+    from .engine import output_files
+
+    workers = workers or os.cpu_count() or 1
+    workers = min(workers, len(pairs)) or 1
+    total_pairs = len(pairs)
+
+    def emit(message, level=Qgis.Info):
+        if log:
+            log(message, level)
+
+    emit(f"Starting {workers} worker processes")
+
+    results = {}
+    with start_pool(workers, prefix_path, project_path, operation, plugin_dir, engine_options) as pool:
+        futures = {}
+        for c_path, e_path, filename in pairs:
+            files = output_files(output_folder, filename, output_format)
+            record = records.get(filename) if records is not None else None
+            future = submit_pair(pool, c_path, e_path, filename, files, record)
+            futures[future] = (filename, next(iter(files.values())))
+
+        for done, future in enumerate(as_completed(futures), 1):
+            filename, output_file = futures[future]
+            result = pair_result(future)
+            log_result(result, emit, f"\n[{done}/{total_pairs}] {filename}")
+
+            results[filename] = (filename, output_file, result['success'])
+            if records is not None and result.get('record') is not None:
+                records[filename] = result['record']
+
+            if progress:
+                progress(int((done / total_pairs) * 100))
+
+    return [results[filename] for _, _, filename in pairs]
@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+"""Per-stage profiling of pair conversions.
+
+A Profiler accumulates wall time, CPU time (of the converting thread, so
+pairs converted in parallel QgsTasks do not count each other), feature and
+vertex counts per conversion stage. ConversionEngine writes one JSON report
+per pair next to its outputs; write_summary() aggregates the reports of a
+batch. When profiling is off the engine uses NULL_PROFILER, which is falsy
+so per-feature timing is skipped entirely.
+"""
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+
+# Batch summary written in the output folder
+SUMMARY_NAME = 'kngml2gpkg_profile.json'
+
+# Suffix of the per-pair report, replacing the output file extension
+REPORT_SUFFIX = '.profile.json'
+
+
+def report_path(files):
+    """Return the report path of a pair from its output files (dict format -> path)"""
+    return os.path.splitext(next(iter(files.values())))[0] + REPORT_SUFFIX
+
+
+def peak_rss_mb():
+    """Return the peak resident set size of this process in MB (None if unknown)"""
+    try:
+        import resource
+    except ImportError:
+        return _peak_working_set_mb()
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, kilobytes elsewhere
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def _peak_working_set_mb():
+    """Return the peak working set on Windows (None on failure)"""
+    try:
+        import ctypes
+        from ctypes import wintypes
+
+        class ProcessMemoryCounters(ctypes.Structure):
+            _fields_ = [
+                ('cb', wintypes.DWORD),
+                ('PageFaultCount', wintypes.DWORD),
+                ('PeakWorkingSetSize', ctypes.c_size_t),
+                ('WorkingSetSize', ctypes.c_size_t),
+                ('QuotaPeakPagedPoolUsage', ctypes.c_size_t),
+                ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t),
+                ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                ('PagefileUsage', ctypes.c_size_t),
+                ('PeakPagefileUsage', ctypes.c_size_t),
+            ]
+
+        counters = ProcessMemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if not ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+            return None
+        return round(counters.PeakWorkingSetSize / (1024 * 1024), 1)
+    except (AttributeError, OSError):
+        return None
+
+
+def _new_stage():
+    return {'wall_s': 0.0, 'cpu_s': 0.0, 'calls': 0, 'features': 0, 'vertices': 0}
+
+
+class Profiler:
+    """Accumulates timings and counts per stage of one pair conversion"""
+
+    def __init__(self):
+        self.stages = {}
+        self._started = self.clock()
+
+    @staticmethod
+    def clock():
+        """Return the current (wall, thread CPU) time"""
+        return time.perf_counter(), time.thread_time()
+
+    def lap(self, name, started, features=1, vertices=0):
+        """Add the time since started to a stage, return the current clock
+
+        Used in per-feature loops where a context manager would cost too much.
+        """
+        now = self.clock()
+        stage = self.stages.setdefault(name, _new_stage())
+        stage['wall_s'] += now[0] - started[0]
+        stage['cpu_s'] += now[1] - started[1]
+        stage['calls'] += 1
+        stage['features'] += features
+        stage['vertices'] += vertices
+        return now
+
+    @contextmanager
+    def stage(self, name):
+        """Time a block; the yielded dict takes 'features' and 'vertices' counts"""
+        started = self.clock()
+        counts = {'features': 0, 'vertices': 0}
+        try:
+            yield counts
+        finally:
+            self.lap(name, started, counts['features'], counts['vertices'])
+
+    def profile_iterator(self, name, iterator):
+        """Yield the items of iterator, timing each next() call as stage name"""
+        iterator = iter(iterator)
+        while True:
+            started = self.clock()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            self.lap(name, started)
+            yield item
+
+    def report(self, **info):
+        """Return the report dict of the conversion, with info (pair, inputs, ...) merged in"""
+        wall, cpu = self.clock()
+        stages = {}
+        for name, stage in self.stages.items():
+            stage = dict(stage, wall_s=round(stage['wall_s'], 4), cpu_s=round(stage['cpu_s'], 4))
+            if stage['features'] and stage['wall_s'] > 0:
+                stage['features_per_s'] = round(stage['features'] / stage['wall_s'], 1)
+            stages[name] = stage
+        report = dict(info)
+        report.update({
+            'wall_s': round(wall - self._started[0], 4),
+            'cpu_s': round(cpu - self._started[1], 4),
+            'peak_rss_mb': peak_rss_mb(),
+            'stages': stages,
+        })
+        return report
+
+
+class NullProfiler:
+    """Profiler interface doing nothing (profiling switched off)"""
+
+    def __bool__(self):
+        return False
+
+    @contextmanager
+    def stage(self, name):
+        yield {'features': 0, 'vertices': 0}
+
+    def profile_iterator(self, name, iterator):
+        return iterator
+
+
+NULL_PROFILER = NullProfiler()
+
+
+def write_report(path, report):
+    """Write a JSON report"""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=1)
+
+
+def write_summary(report_paths, summary_path):
+    """Aggregate per-pair reports into a batch summary
+
+    Args:
+        report_paths: Paths of per-pair reports (missing ones are skipped)
+        summary_path: Output JSON path
+
+    Returns:
+        Summary dict
+    """
+    reports = []
+    for path in report_paths:
+        try:
+            with open(path, encoding='utf-8') as f:
+                reports.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+
+    stages = {}
+    for report in reports:
+        for name, stage in report['stages'].items():
+            total = stages.setdefault(name, _new_stage())
+            for key in total:
+                total[key] += stage[key]
+    for stage in stages.values():
+        stage['wall_s'] = round(stage['wall_s'], 4)
+        stage['cpu_s'] = round(stage['cpu_s'], 4)
+        if stage['features'] and stage['wall_s'] > 0:
+            stage['features_per_s'] = round(stage['features'] / stage['wall_s'], 1)
+
+    peaks = [report['peak_rss_mb'] for report in reports if report.get('peak_rss_mb') is not None]
+    slowest = sorted(reports, key=lambda report: report['wall_s'], reverse=True)[:10]
+    summary = {
+        'pairs': len(reports),
+        'failed': sum(1 for report in reports if not report.get('success')),
+        'wall_s': round(sum(report['wall_s'] for report in reports), 4),
+        'cpu_s': round(sum(report['cpu_s'] for report in reports), 4),
+        'peak_rss_mb': max(peaks) if peaks else None,
+        'stages': stages,
+        'slowest': [{'pair': report.get('pair'), 'wall_s': report['wall_s']} for report in slowest],
+    }
+    write_report(summary_path, summary)
+    return summary
@@ -0,0 +1,268 @@
+# -*- coding: utf-8 -*-
+"""Readers producing QgsFeature streams from KN GML files.
+
+OgrGmlReader opens a GML file once with the OGR GML driver and reads it
+sequentially at dataset level, so every feature class of the file
+(CadastralParcel and CadastralZoning in Register C) comes out of a single
+pass over the file instead of one scan per layer.
+
+Files with OGR field types OgrGmlReader does not map are read through the
+QGIS ogr provider instead (ProviderGmlReader), one scan per feature class,
+so their values are converted exactly as before.
+"""
+from osgeo import gdal, ogr
+
+from qgis.core import (
+    QgsCoordinateReferenceSystem,
+    QgsFeature,
+    QgsField,
+    QgsFields,
+    QgsGeometry,
+    QgsVectorLayer,
+)
+from qgis.PyQt.QtCore import QVariant, QDate, QTime, QDateTime
+
+
+# OGR field type -> (QVariant type, type name, QVariant type of list items),
+# as the QGIS ogr provider maps them
+_FIELD_TYPES = {
+    ogr.OFTInteger: (QVariant.Int, 'integer', QVariant.Invalid),
+    ogr.OFTInteger64: (QVariant.LongLong, 'int8', QVariant.Invalid),
+    ogr.OFTReal: (QVariant.Double, 'double', QVariant.Invalid),
+    ogr.OFTString: (QVariant.String, 'string', QVariant.Invalid),
+    ogr.OFTDate: (QVariant.Date, 'date', QVariant.Invalid),
+    ogr.OFTTime: (QVariant.Time, 'time', QVariant.Invalid),
+    ogr.OFTDateTime: (QVariant.DateTime, 'datetime', QVariant.Invalid),
+    ogr.OFTStringList: (QVariant.StringList, 'stringlist', QVariant.String),
+    ogr.OFTIntegerList: (QVariant.List, 'integerlist', QVariant.Int),
+    ogr.OFTInteger64List: (QVariant.List, 'integer64list', QVariant.LongLong),
+    ogr.OFTRealList: (QVariant.List, 'doublelist', QVariant.Double),
+}
+
+# Integer fields with the boolean subtype
+_BOOLEAN_TYPE = (QVariant.Bool, 'boolean', QVariant.Invalid)
+
+
+class ReaderError(Exception):
+    """Raised when a GML file cannot be opened"""
+
+
+class OgrGmlReader:
+    """Single-pass reader of all feature classes of a GML file
+
+    Args:
+        path: GML file path
+        open_options: List of GML driver open options ('KEY=VALUE')
+    """
+
+    def __init__(self, path, open_options=None):
+        self.path = path
+        try:
+            self.dataset = gdal.OpenEx(
+                path,
+                gdal.OF_VECTOR | gdal.OF_READONLY,
+                allowed_drivers=['GML'],
+                open_options=open_options or []
+            )
+        except RuntimeError as e:
+            raise ReaderError(str(e))
+        if self.dataset is None:
+            raise ReaderError(gdal.GetLastErrorMsg() or f"Could not open {path}")
+
+        self._fields = {}
+        self._converters = {}
+
+    def close(self):
+        """Close the OGR dataset"""
+        self.dataset = None
+
+    def layer_names(self):
+        """Return feature class names found in the file"""
+        return [
+            self.dataset.GetLayer(i).GetName()
+            for i in range(self.dataset.GetLayerCount())
+        ]
+
+    def unsupported_fields(self, layer_names):
+        """Return names of fields whose OGR type this reader does not map
+
+        A file with such fields has to be read with ProviderGmlReader.
+        """
+        unsupported = []
+        for layer_name in layer_names:
+            layer_defn = self.dataset.GetLayerByName(layer_name).GetLayerDefn()
+            for i in range(layer_defn.GetFieldCount()):
+                field_defn = layer_defn.GetFieldDefn(i)
+                if _field_type(field_defn) is None:
+                    unsupported.append(f"{layer_name}.{field_defn.GetName()} "
+                                       f"({ogr.GetFieldTypeName(field_defn.GetType())})")
+        return unsupported
+
+    def fields(self, layer_name):
+        """Return QgsFields of a feature class
+
+        Raises:
+            ReaderError: if a field type is not mapped (see unsupported_fields)
+        """
+        if layer_name not in self._fields:
+            layer_defn = self.dataset.GetLayerByName(layer_name).GetLayerDefn()
+            fields = QgsFields()
+            converters = []
+            for i in range(layer_defn.GetFieldCount()):
+                field_defn = layer_defn.GetFieldDefn(i)
+                field_type = _field_type(field_defn)
+                if field_type is None:
+                    raise ReaderError(f"Unsupported type of field {field_defn.GetName()}")
+                variant_type, type_name, sub_type = field_type
+                fields.append(QgsField(field_defn.GetName(), variant_type, type_name, field_defn.GetWidth(),
+                                       field_defn.GetPrecision(), '', sub_type))
+                converters.append(_value_converter(field_defn.GetType(), variant_type))
+            self._fields[layer_name] = fields
+            self._converters[layer_name] = converters
+        return self._fields[layer_name]
+
+    def crs(self, layer_name):
+        """Return CRS of a feature class (invalid CRS if not defined)"""
+        srs = self.dataset.GetLayerByName(layer_name).GetSpatialRef()
+        if srs is None:
+            return QgsCoordinateReferenceSystem()
+        if srs.GetAuthorityName(None) == 'EPSG':
+            return QgsCoordinateReferenceSystem(f"EPSG:{srs.GetAuthorityCode(None)}")
+        return QgsCoordinateReferenceSystem.fromWkt(srs.ExportToWkt())
+
+    def features(self, layer_names):
+        """Read the file once and yield features of the requested classes
+
+        Yields:
+            Tuple (layer_name, QgsFeature, fraction of the file read 0-1)
+        """
+        wanted = set(layer_names)
+        for layer_name in wanted:
+            self.fields(layer_name)
+
+        self.dataset.ResetReading()
+        while True:
+            ogr_feature, ogr_layer, fraction = self.dataset.GetNextFeature(include_layer=True, include_pct=True)
+            if ogr_feature is None:
+                break
+
+            layer_name = ogr_layer.GetName()
+            if layer_name not in wanted:
+                continue
+
+            feature = QgsFeature(self._fields[layer_name])
+            feature.setAttributes([
+                convert(ogr_feature, i) for i, convert in enumerate(self._converters[layer_name])
+            ])
+
+            ogr_geometry = ogr_feature.GetGeometryRef()
+            if ogr_geometry is not None:
+                geom = QgsGeometry()
+                geom.fromWkb(bytes(ogr_geometry.ExportToIsoWkb()))
+                feature.setGeometry(geom)
+
+            yield layer_name, feature, fraction
+
+
+class ProviderGmlReader:
+    """Reader of GML feature classes through the QGIS ogr provider
+
+    Same interface as OgrGmlReader, but every feature class is a
+    QgsVectorLayer read in its own pass.
+
+    Args:
+        path: GML file path
+        layer_names: Feature class names of the file (OgrGmlReader.layer_names())
+        open_options: List of GML driver open options ('KEY=VALUE')
+    """
+
+    def __init__(self, path, layer_names, open_options=None):
+        self.path = path
+        self._layer_names = list(layer_names)
+        self._options = ''.join(f"|option:{option}" for option in open_options or [])
+        self._layers = {}
+
+    def close(self):
+        """Drop the provider layers"""
+        self._layers = {}
+
+    def layer_names(self):
+        """Return feature class names found in the file"""
+        return list(self._layer_names)
+
+    def _layer(self, layer_name):
+        if layer_name not in self._layers:
+            layer = QgsVectorLayer(f"{self.path}|layername={layer_name}{self._options}", layer_name, 'ogr')
+            if not layer.isValid():
+                raise ReaderError(f"Could not load {layer_name} from {self.path}")
+            self._layers[layer_name] = layer
+        return self._layers[layer_name]
+
+    def fields(self, layer_name):
+        """Return QgsFields of a feature class"""
+        return self._layer(layer_name).fields()
+
+    def crs(self, layer_name):
+        """Return CRS of a feature class (invalid CRS if not defined)"""
+        return self._layer(layer_name).crs()
+
+    def features(self, layer_names):
+        """Read the requested classes one after another
+
+        Yields:
+            Tuple (layer_name, QgsFeature, fraction of all requested classes read 0-1)
+        """
+        layer_names = list(layer_names)
+        for idx, layer_name in enumerate(layer_names):
+            layer = self._layer(layer_name)
+            total = max(layer.featureCount(), 1)
+            for count, feature in enumerate(layer.getFeatures()):
+                yield layer_name, feature, (idx + min(count / total, 1)) / len(layer_names)
+
+
+def _field_type(field_defn):
+    """Return (QVariant type, type name, list item type) of an OGR field, None if not mapped"""
+    if field_defn.GetSubType() == ogr.OFSTBoolean:
+        return _BOOLEAN_TYPE
+    return _FIELD_TYPES.get(field_defn.GetType())
+
+
+def _value_converter(ogr_type, variant_type):
+    """Return function(ogr_feature, index) reading a field as Python value"""
+
+    def null_or(read):
+        def convert(ogr_feature, index):
+            if not ogr_feature.IsFieldSetAndNotNull(index):
+                return None
+            return read(ogr_feature, index)
+        return convert
+
+    if variant_type == QVariant.Bool:
+        return null_or(lambda f, i: bool(f.GetFieldAsInteger(i)))
+    if ogr_type == ogr.OFTInteger:
+        return null_or(lambda f, i: f.GetFieldAsInteger(i))
+    if ogr_type == ogr.OFTInteger64:
+        return null_or(lambda f, i: f.GetFieldAsInteger64(i))
+    if ogr_type == ogr.OFTReal:
+        return null_or(lambda f, i: f.GetFieldAsDouble(i))
+    if ogr_type == ogr.OFTDate:
+        return null_or(lambda f, i: QDate(*f.GetFieldAsDateTime(i)[:3]))
+    if ogr_type == ogr.OFTTime:
+        return null_or(lambda f, i: _time(*f.GetFieldAsDateTime(i)[3:6]))
+    if ogr_type == ogr.OFTDateTime:
+        return null_or(lambda f, i: QDateTime(QDate(*f.GetFieldAsDateTime(i)[:3]),
+                                              _time(*f.GetFieldAsDateTime(i)[3:6])))
+    if ogr_type == ogr.OFTStringList:
+        return null_or(lambda f, i: list(f.GetFieldAsStringList(i)))
+    if ogr_type == ogr.OFTIntegerList:
+        return null_or(lambda f, i: list(f.GetFieldAsIntegerList(i)))
+    if ogr_type == ogr.OFTInteger64List:
+        return null_or(lambda f, i: list(f.GetFieldAsInteger64List(i)))
+    if ogr_type == ogr.OFTRealList:
+        return null_or(lambda f, i: list(f.GetFieldAsDoubleList(i)))
+    return null_or(lambda f, i: f.GetFieldAsString(i))
+
+
+def _time(hour, minute, second):
+    """Build QTime from OGR time parts (seconds are float)"""
+    return QTime(hour, minute, int(second), min(int(round((second % 1) * 1000)), 999))
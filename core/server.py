@@ -0,0 +1,473 @@
+# -*- coding: utf-8 -*-
+"""Warm conversion server with a local HTTP job API.
+
+The server starts a pool of worker processes (core/parallel.py) once: each
+worker bootstraps headless QGIS, builds the transform context and loads
+proj.db and the EPSG:4258 -> EPSG:5514 grids before the first job, so a job
+only pays for reading and writing its pair. Jobs are submitted as JSON over
+HTTP on a loopback address or a Unix socket:
+
+    POST /jobs        {"c": C path, "e": E path, "output": folder,
+                       "formats": ["GPKG"], "name": "800001.gml", "wait": false}
+    GET  /jobs/<id>   status, timings, log and profile of a job
+    GET  /jobs        all jobs kept (the last MAX_FINISHED_JOBS finished ones)
+    GET  /health      workers, queue length and counters
+
+With "wait": true the POST returns when the job is finished. The API has no
+authentication and converts any path the server user can read and write;
+listen on loopback or on a Unix socket with restricted permissions only.
+"""
+import errno
+import json
+import os
+import re
+import socket
+import socketserver
+import stat
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from qgis.core import Qgis
+
+from .engine import OUTPUT_FORMATS, output_files
+from .log_sink import LEVEL_NAMES
+from .parallel import pair_result, start_pool, submit_pair, warm_up
+from .profiling import report_path
+from .vsi import gml_basename, real_path
+
+
+# Finished jobs kept for status queries (oldest are dropped first)
+MAX_FINISHED_JOBS = 1000
+
+# Largest accepted request body
+_MAX_BODY = 64 * 1024
+
+_JOB_PATH = re.compile(r'^/jobs/([0-9a-f]+)$')
+
+
+class JobError(Exception):
+    """Invalid job request"""
+    pass
+
+
+class JobQueue:
+    """Conversion jobs run by a pool of warm workers
+
+    Args:
+        pool: Pool from start_pool()
+        workers: Number of workers of the pool
+        formats: Output formats of jobs that do not name any
+        profile: Add the profiling report of the engine to finished jobs
+        log: Callable(message, level)
+        pool_options: Options of start_pool() used to replace a pool broken by a
+            crashed worker
+    """
+
+    def __init__(self, pool, workers, formats, profile=False, log=None, pool_options=None):
+        self.pool = pool
+        self.workers = workers
+        self.formats = formats
+        self.profile = profile
+        self.log = log or (lambda message, level=Qgis.Info: None)
+        self.pool_options = pool_options or {}
+        self.started = time.time()
+        self.counts = {'submitted': 0, 'done': 0, 'failed': 0, 'restarts': 0}
+        # Error of a crashed worker while the pool is broken, None when the workers are fine
+        self.broken = None
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()
+        self._futures = {}
+        self._finished = {}
+
+    def submit(self, spec):
+        """Validate a job request and queue its pair
+
+        Args:
+            spec: Dict with c, e, output and optional formats and name
+
+        Returns:
+            Job id
+
+        Raises:
+            JobError: The request is invalid
+        """
+        if not isinstance(spec, dict):
+            raise JobError("Job must be a JSON object")
+        c_path, e_path, output_folder = spec.get('c'), spec.get('e'), spec.get('output')
+        if not all(isinstance(value, str) and value for value in (c_path, e_path, output_folder)):
+            raise JobError("Job needs 'c', 'e' and 'output' paths")
+        for path in (c_path, e_path):
+            if not os.path.isfile(real_path(path)):
+                raise JobError(f"Input not found: {path}")
+
+        formats = spec.get('formats') or self.formats
+        if isinstance(formats, str):
+            formats = [formats]
+        formats = list(dict.fromkeys(str(fmt).upper() for fmt in formats))
+        unknown = [fmt for fmt in formats if fmt not in OUTPUT_FORMATS]
+        if unknown:
+            raise JobError(f"Unknown output format: {', '.join(unknown)}")
+
+        filename = spec.get('name') or gml_basename(c_path)
+        try:
+            os.makedirs(output_folder, exist_ok=True)
+        except OSError as e:
+            raise JobError(f"Could not create output folder: {e}")
+        files = output_files(output_folder, filename, formats)
+
+        job_id = uuid.uuid4().hex[:12]
+        job = {
+            'id': job_id,
+            'status': 'queued',
+            'name': filename,
+            'inputs': {'C': c_path, 'E': e_path},
+            'outputs': files,
+            'submitted': time.time(),
+        }
+        with self._lock:
+            # Two jobs writing the same file at once would corrupt it
+            busy = {path for job_id in self._futures for path in self._jobs[job_id]['outputs'].values()}
+            if busy & set(files.values()):
+                raise JobError(f"Output of {filename} is being written by another job")
+            try:
+                future = self._submit(c_path, e_path, filename, files)
+            except (RuntimeError, BrokenProcessPool) as e:
+                raise JobError(f"Workers not available: {e}")
+            pool = self.pool
+            self._jobs[job_id] = job
+            self._finished[job_id] = threading.Event()
+            self._futures[job_id] = future
+            self.counts['submitted'] += 1
+        future.add_done_callback(lambda done: self._finish(job_id, done, pool))
+        return job_id
+
+    def _submit(self, c_path, e_path, filename, files):
+        """Submit a pair, replacing a pool broken by a crashed worker first (lock held)"""
+        if self.broken is None:
+            try:
+                return submit_pair(self.pool, c_path, e_path, filename, files)
+            except BrokenProcessPool as e:
+                self.broken = str(e) or 'worker process died'
+        self._restart_pool()
+        return submit_pair(self.pool, c_path, e_path, filename, files)
+
+    def _restart_pool(self):
+        """Replace the broken pool by new warm workers (lock held)
+
+        Raises:
+            BrokenProcessPool: The new workers could not start QGIS, the pool stays broken
+        """
+        self.log(f"⚠ Workers broken ({self.broken}), starting {self.workers} new worker processes",
+                 Qgis.Warning)
+        self.pool.shutdown(wait=False, cancel_futures=True)
+        self.pool = start_pool(self.workers, **self.pool_options)
+        pids = warm_up(self.pool, self.workers)
+        self.broken = None
+        self.counts['restarts'] += 1
+        self.log(f"  ✓ {len(pids)} workers ready")
+
+    def _finish(self, job_id, future, pool):
+        """Store the result of a finished job (runs in the pool's management thread)"""
+        if not future.cancelled() and isinstance(future.exception(), BrokenProcessPool):
+            # A worker died; the pool is replaced on the next submit
+            with self._lock:
+                if pool is self.pool and self.broken is None:
+                    self.broken = str(future.exception()) or 'worker process died'
+                    self.log(f"⚠ Worker process died ({self.broken}), workers are restarted "
+                             f"with the next job", Qgis.Warning)
+        result = pair_result(future)
+        finished = time.time()
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job.update({
+                'status': 'done' if result['success'] else 'failed',
+                'worker': result['pid'],
+                'seconds': round(result['seconds'], 4),
+                'queue_s': round(max(0.0, finished - job['submitted'] - result['seconds']), 4),
+                'log': [[LEVEL_NAMES.get(Qgis.MessageLevel(level), 'INFO'), message]
+                        for message, level in result['log']],
+                'finished': finished,
+            })
+            self.counts['done' if result['success'] else 'failed'] += 1
+            del self._futures[job_id]
+            self._prune()
+        if self.profile:
+            self._add_profile(job_id)
+        event = self._finished.get(job_id)
+        if event is not None:
+            event.set()
+
+    def _add_profile(self, job_id):
+        """Add the engine profiling report of a finished job"""
+        with self._lock:
+            if job_id not in self._jobs:
+                return
+            files = self._jobs[job_id]['outputs']
+        try:
+            with open(report_path(files), encoding='utf-8') as f:
+                report = json.load(f)
+        except (OSError, ValueError):
+            return
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id]['profile'] = report
+
+    def _prune(self):
+        """Drop the oldest finished jobs above MAX_FINISHED_JOBS (lock held)"""
+        finished = [job_id for job_id, job in self._jobs.items() if 'finished' in job]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self._jobs[job_id]
+            self._finished.pop(job_id, None)
+
+    def status(self, job_id):
+        """Return a copy of a job, or None if it is not known"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            job = dict(job)
+            future = self._futures.get(job_id)
+        if future is not None and future.running():
+            job['status'] = 'running'
+        return job
+
+    def wait(self, job_id, timeout=None):
+        """Wait until a job is finished, return its status"""
+        event = self._finished.get(job_id)
+        if event is not None:
+            event.wait(timeout)
+        return self.status(job_id)
+
+    def jobs(self):
+        """Return all jobs kept"""
+        with self._lock:
+            job_ids = list(self._jobs)
+        return [job for job in (self.status(job_id) for job_id in job_ids) if job]
+
+    def health(self):
+        """Return workers, queue length and counters
+
+        'worker_error' is the error of a crashed worker while the pool is broken
+        (it is replaced on the next job), None when the workers are fine.
+        """
+        with self._lock:
+            pending = list(self._futures.values())
+            broken = self.broken
+        running = sum(1 for future in pending if future.running())
+        return dict(
+            self.counts,
+            workers=self.workers,
+            worker_error=broken,
+            running=running,
+            queued=len(pending) - running,
+            uptime_s=round(time.time() - self.started, 1),
+        )
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """JSON job API of the server"""
+
+    server_version = 'kngml2gpkg'
+
+    def do_GET(self):
+        queue = self.server.queue
+        match = _JOB_PATH.match(self.path)
+        if self.path == '/health':
+            self._send(200, queue.health())
+        elif self.path == '/jobs':
+            self._send(200, {'jobs': queue.jobs()})
+        elif match:
+            job = queue.status(match.group(1))
+            if job is None:
+                self._send(404, {'error': 'Unknown job'})
+            else:
+                self._send(200, job)
+        else:
+            self._send(404, {'error': 'Not found'})
+
+    def do_POST(self):
+        if self.path != '/jobs':
+            self._send(404, {'error': 'Not found'})
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            if length > _MAX_BODY:
+                raise JobError("Request too large")
+            spec = json.loads(self.rfile.read(length) or b'{}')
+            timeout = spec.get('timeout') if isinstance(spec, dict) else None
+            timeout = None if timeout is None else float(timeout)
+            job_id = self.server.queue.submit(spec)
+        except (JobError, ValueError, TypeError) as e:
+            self._send(400, {'error': str(e)})
+            return
+
+        job = self.server.queue.status(job_id)
+        self.server.log(f"Job {job_id}: {job['name']}")
+        if spec.get('wait'):
+            self._send(200, self.server.queue.wait(job_id, timeout))
+        else:
+            self._send(202, self.server.queue.status(job_id))
+
+    def _send(self, code, body):
+        data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def address_string(self):
+        # Unix socket clients have no address
+        return self.client_address[0] if self.client_address else 'unix'
+
+    def log_message(self, format, *args):
+        # Requests are not logged, jobs are logged by do_POST
+        pass
+
+
+if hasattr(socketserver, 'UnixStreamServer'):
+    class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        """HTTP server on a Unix socket, readable and writable by the owner and group only"""
+
+        daemon_threads = True
+        _bound = False
+
+        def server_bind(self):
+            self._remove_stale_socket()
+            # Created with mode 0660 directly, never reachable by other users
+            umask = os.umask(0o117)
+            try:
+                super().server_bind()
+            finally:
+                os.umask(umask)
+            self._bound = True
+
+        def _remove_stale_socket(self):
+            """Remove a socket left over by a server that did not stop cleanly
+
+            Raises:
+                OSError: The path is not a socket, or a server is listening on it
+            """
+            try:
+                mode = os.lstat(self.server_address).st_mode
+            except FileNotFoundError:
+                return
+            if not stat.S_ISSOCK(mode):
+                raise OSError(errno.EEXIST, "File exists and is not a socket", self.server_address)
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.server_address)
+            except (ConnectionRefusedError, FileNotFoundError):
+                os.remove(self.server_address)
+                return
+            finally:
+                probe.close()
+            raise OSError(errno.EADDRINUSE, "A server is listening on the socket", self.server_address)
+
+        def server_close(self):
+            super().server_close()
+            # Not bound: the path belongs to someone else (another server, a mistyped file)
+            if not self._bound:
+                return
+            try:
+                os.remove(self.server_address)
+            except OSError:
+                pass
+else:
+    _UnixHTTPServer = None
+
+
+def make_server(address, queue, log):
+    """Create the HTTP server of a job queue
+
+    Args:
+        address: 'HOST:PORT', or the path of a Unix socket
+        queue: JobQueue
+        log: Callable(message, level)
+
+    Raises:
+        OSError: The address cannot be bound
+        ValueError: The address is invalid
+    """
+    if os.sep in address or address.endswith('.sock'):
+        if _UnixHTTPServer is None:
+            raise ValueError("Unix sockets are not available on this platform, use HOST:PORT")
+        server = _UnixHTTPServer(address, _Handler)
+    else:
+        host, _, port = address.rpartition(':')
+        server = ThreadingHTTPServer((host or '127.0.0.1', int(port)), _Handler)
+        server.daemon_threads = True
+        if host not in ('', '127.0.0.1', 'localhost'):
+            log(f"⚠ Listening on {host}: the job API has no authentication", Qgis.Warning)
+    server.queue = queue
+    server.log = log
+    return server
+
+
+def run_server(address, workers, log, formats=('GPKG',), profile=False, **pool_options):
+    """Start the warm workers and serve jobs until Ctrl+C or stop_server()
+
+    Args:
+        address: 'HOST:PORT' or Unix socket path
+        workers: Number of worker processes
+        log: Callable(message, level)
+        formats: Output formats of jobs that do not name any
+        profile: Add the engine profiling report to finished jobs (needs
+            'profile' in the engine options)
+        **pool_options: prefix_path, project_path, operation, plugin_dir and
+            engine_options for the workers (see start_pool)
+
+    Returns:
+        Exit code (0 on clean shutdown, 1 if the server could not start)
+    """
+    log(f"Starting {workers} worker processes")
+    start = time.perf_counter()
+    pool = start_pool(workers, **pool_options)
+    try:
+        pids = warm_up(pool, workers)
+    except BrokenProcessPool as e:
+        log(f"ERROR: Workers could not start QGIS: {e}", Qgis.Critical)
+        pool.shutdown(wait=False, cancel_futures=True)
+        return 1
+    log(f"  ✓ {len(pids)} workers ready in {time.perf_counter() - start:.1f} s")
+
+    queue = JobQueue(pool, workers, list(formats), profile, log, pool_options)
+    try:
+        server = make_server(address, queue, log)
+    except (OSError, ValueError) as e:
+        log(f"ERROR: Could not listen on {address}: {e}", Qgis.Critical)
+        queue.pool.shutdown(wait=False, cancel_futures=True)
+        return 1
+
+    _servers.append(server)
+    log(f"Listening on {address}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        _servers.remove(server)
+        server.server_close()
+        log("Stopping, waiting for running jobs")
+        # The pool of the queue, replaced if a worker crashed
+        queue.pool.shutdown(wait=True, cancel_futures=True)
+    counts = queue.health()
+    log(f"STOPPED: {counts['done']} successful, {counts['failed']} failed")
+    return 0
+
+
+# Servers running in this process, stopped by stop_server()
+_servers = []
+
+
+def stop_server():
+    """Stop the running servers (safe in signal handlers)"""
+    for server in list(_servers):
+        # shutdown() waits for serve_forever(), which may run in the calling thread
+        threading.Thread(target=server.shutdown, daemon=True).start()
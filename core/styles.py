@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""Layer styles cached as ready-to-insert layer_styles rows.
+
+Storing a default style with loadNamedStyle()/saveStyleToDatabase() opens
+every written layer again, parses its QML and writes through a second
+connection. The bundled QML files are instead loaded once per process into
+a memory layer with the KN schema and exported as QML and SLD, the same
+documents saveStyleToDatabase() would store. The GPKG writers insert these
+rows into layer_styles together with the features.
+"""
+import os
+
+from qgis.core import QgsField, QgsVectorLayer
+from qgis.PyQt.QtXml import QDomDocument
+
+from .kn_reader import KN_SCHEMA
+
+
+class StyleError(Exception):
+    """Raised when a QML style cannot be loaded"""
+
+
+# (style path, mtime, feature class) -> (QML, SLD)
+_cache = {}
+
+
+def layer_style(style_path, source):
+    """Return (QML, SLD) documents of a QML style, parsed once per process
+
+    Args:
+        style_path: Path to the QML file
+        source: Feature class (KN_SCHEMA key) whose fields the style refers to
+    """
+    key = (style_path, os.stat(style_path).st_mtime_ns, source)
+    if key not in _cache:
+        # Field configuration in the QML only survives on a layer that has the fields
+        layer = QgsVectorLayer('MultiPolygon?crs=EPSG:5514', source, 'memory')
+        layer.dataProvider().addAttributes(
+            [QgsField(name, variant_type, type_name) for name, variant_type, type_name in KN_SCHEMA[source]]
+        )
+        layer.updateFields()
+
+        msg, success = layer.loadNamedStyle(style_path)
+        if not success:
+            raise StyleError(msg)
+
+        qml_document = QDomDocument()
+        layer.exportNamedStyle(qml_document)
+        sld_document = QDomDocument()
+        layer.exportSldStyle(sld_document)
+        _cache[key] = (qml_document.toString(), sld_document.toString())
+    return _cache[key]
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""Background conversion with the QGIS task manager.
+
+ConvertPairTask runs the engine for one GML pair in a task manager thread.
+BatchConversion starts a task per pair, keeps at most max_parallel of them
+running, aggregates their progress and reports when the whole batch is done.
+"""
+import os
+
+from qgis.core import QgsApplication, QgsTask, Qgis
+from qgis.PyQt.QtCore import QObject, pyqtSignal
+
+from .engine import ConversionEngine, output_files
+from .manifest import complete_record
+
+
+class ConvertPairTask(QgsTask):
+    """Converts one GML pair in a background thread"""
+
+    # Log line (message, level) emitted from the task thread
+    logMessage = pyqtSignal(str, int)
+
+    def __init__(self, c_path, e_path, filename, files, transform_context, plugin_dir, engine_options=None,
+                 record=None):
+        super().__init__(f"knGML2GPKG: {filename}", QgsTask.CanCancel)
+        self.c_path = c_path
+        self.e_path = e_path
+        self.filename = filename
+        # Output format -> output file, all written in one pass
+        self.files = files
+        self.output_file = next(iter(files.values()))
+        # Captured on the main thread, QgsProject must not be touched from run()
+        self.transform_context = transform_context
+        self.plugin_dir = plugin_dir
+        # Extra keyword arguments for ConversionEngine
+        self.engine_options = engine_options or {}
+        # Manifest record of the pair, its input hashes are computed in run()
+        self.record = record
+        self.success = False
+
+    def _log(self, message, level=Qgis.Info):
+        self.logMessage.emit(message, int(level))
+
+    def run(self):
+        """Convert the pair (called in a task manager thread)"""
+        self._log(f"\nProcessing {self.filename}...")
+        self._log(f"  C: {os.path.basename(self.c_path)}")
+        self._log(f"  E: {os.path.basename(self.e_path)}")
+        self._log(f"  Output: {', '.join(os.path.basename(f) for f in self.files.values())}")
+
+        if self.record is not None:
+            complete_record(self.record, self.c_path, self.e_path)
+
+        engine = ConversionEngine(
+            log=self._log,
+            progress=self.setProgress,
+            transform_context=self.transform_context,
+            plugin_dir=self.plugin_dir,
+            is_canceled=self.isCanceled,
+            **self.engine_options
+        )
+        try:
+            self.success = engine.convert_pair(self.c_path, self.e_path, self.files)
+        except Exception as e:
+            self._log(f"ERROR: {e}", Qgis.Critical)
+            self.success = False
+
+        if self.success:
+            self._log(f"  ✓ {self.filename} SUCCESS")
+        else:
+            self._log(f"  ✗ {self.filename} FAILED", Qgis.Critical)
+
+        return self.success and not self.isCanceled()
+
+
+class BatchConversion(QObject):
+    """Runs a batch of ConvertPairTask with limited parallelism
+
+    Signals:
+        logMessage(str, int): log line of any task
+        progressChanged(int): overall progress 0-100
+        finished(list): list of (basename, output_file, success) in pair order,
+            output_file being the file of the first format
+    """
+
+    logMessage = pyqtSignal(str, int)
+    progressChanged = pyqtSignal(int)
+    finished = pyqtSignal(list)
+
+    def __init__(self, pairs, output_folder, output_format, transform_context, plugin_dir,
+                 max_parallel=1, engine_options=None, records=None, parent=None):
+        super().__init__(parent)
+        records = records or {}
+        self.tasks = [
+            ConvertPairTask(
+                c_path, e_path, filename,
+                output_files(output_folder, filename, output_format),
+                transform_context, plugin_dir, engine_options, records.get(filename)
+            )
+            for c_path, e_path, filename in pairs
+        ]
+        self.max_parallel = max(1, max_parallel)
+        self._pending = list(self.tasks)
+        self._running = []
+        self._done = []
+        self._canceled = False
+
+    def start(self):
+        """Start the first max_parallel tasks"""
+        self._start_next()
+
+    def cancel(self):
+        """Cancel running tasks and drop the ones not started yet"""
+        self._canceled = True
+        for task in self._pending:
+            self._done.append(task)
+        self._pending = []
+        for task in self._running:
+            task.cancel()
+        self.logMessage.emit("Canceling...", int(Qgis.Warning))
+        self._check_finished()
+
+    def is_running(self):
+        """Return True while tasks are running or waiting"""
+        return bool(self._running or self._pending)
+
+    def _start_next(self):
+        while self._pending and len(self._running) < self.max_parallel:
+            task = self._pending.pop(0)
+            task.logMessage.connect(self.logMessage)
+            task.progressChanged.connect(self._update_progress)
+            task.taskCompleted.connect(lambda task=task: self._task_done(task))
+            task.taskTerminated.connect(lambda task=task: self._task_done(task))
+            self._running.append(task)
+            QgsApplication.taskManager().addTask(task)
+
+    def _task_done(self, task):
+        if task in self._running:
+            self._running.remove(task)
+            self._done.append(task)
+        self._update_progress()
+        if not self._canceled:
+            self._start_next()
+        self._check_finished()
+
+    def _update_progress(self, *args):
+        total = sum(100.0 if task in self._done else task.progress() for task in self.tasks)
+        self.progressChanged.emit(int(total / len(self.tasks)))
+
+    def _check_finished(self):
+        if self._running or self._pending:
+            return
+        self.finished.emit([(task.filename, task.output_file, task.success) for task in self.tasks])
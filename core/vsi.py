@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""Zipped and gzipped KN inputs read through GDAL virtual file systems.
+
+The cadastral portal delivers KN data as ZIP archives. Instead of unpacking
+them, every GML member of a selected .zip becomes a /vsizip/ path and every
+.gml.gz a /vsigzip/ path, which the OGR GML driver streams directly. The
+native reader and the schema cache read the same paths through VsiFile, a
+Python stream over the archive member. Pairing uses gml_basename(), so
+800001.gml inside C.zip pairs with 800001.gml.gz or 800001.gml in the E input.
+"""
+import gzip
+import os
+import zipfile
+
+
+VSIZIP = '/vsizip/'
+VSIGZIP = '/vsigzip/'
+
+# Input file extensions the file pickers offer
+INPUT_PATTERNS = ('*.gml', '*.gml.gz', '*.zip')
+
+
+def is_virtual(path):
+    """Return True for /vsizip/ and /vsigzip/ paths"""
+    return path.startswith(VSIZIP) or path.startswith(VSIGZIP)
+
+
+def split_virtual(path):
+    """Split a path into (kind, file on disk, archive member)
+
+    kind is 'zip', 'gzip' or 'file'; member is None unless kind is 'zip'.
+    """
+    if path.startswith(VSIGZIP):
+        return 'gzip', path[len(VSIGZIP):], None
+    if path.startswith(VSIZIP):
+        rest = path[len(VSIZIP):]
+        index = rest.lower().find('.zip/')
+        if index < 0:
+            return 'zip', rest, ''
+        end = index + len('.zip')
+        return 'zip', rest[:end], rest[end + 1:]
+    return 'file', path, None
+
+
+def real_path(path):
+    """Return the file on disk holding a (virtual) path"""
+    return split_virtual(path)[1]
+
+
+def gml_basename(path):
+    """Return the GML file name of a (virtual) path, used to pair C and E files"""
+    name = os.path.basename(path)
+    if name.lower().endswith('.gz'):
+        name = name[:-len('.gz')]
+    return name
+
+
+def expand_inputs(paths):
+    """Turn selected .gml, .gml.gz and .zip files into GML paths
+
+    Args:
+        paths: Selected files
+
+    Returns:
+        Tuple (GML paths, archives that could not be read); every .gml member of
+        a ZIP archive becomes a /vsizip/ path, .gz files become /vsigzip/ paths
+    """
+    gml_paths = []
+    unreadable = []
+    for path in paths:
+        lower = path.lower()
+        if lower.endswith('.zip'):
+            try:
+                with zipfile.ZipFile(path) as archive:
+                    members = [name for name in archive.namelist() if name.lower().endswith('.gml')]
+            except (OSError, zipfile.BadZipFile):
+                unreadable.append(path)
+                continue
+            gml_paths.extend(f"{VSIZIP}{path}/{name}" for name in sorted(members))
+        elif lower.endswith('.gz'):
+            gml_paths.append(f"{VSIGZIP}{path}")
+        else:
+            gml_paths.append(path)
+    return gml_paths, unreadable
+
+
+def list_inputs(folder):
+    """Return the GML paths of all .gml, .gml.gz and .zip files in a folder"""
+    names = sorted(
+        name for name in os.listdir(folder)
+        if name.lower().endswith(('.gml', '.gml.gz', '.zip'))
+    )
+    return expand_inputs([os.path.join(folder, name) for name in names])[0]
+
+
+def zip_member_info(path):
+    """Return the ZipInfo of a /vsizip/ path"""
+    _, archive_path, member = split_virtual(path)
+    with zipfile.ZipFile(archive_path) as archive:
+        return archive.getinfo(member)
+
+
+class VsiFile:
+    """Binary read stream of a plain, /vsigzip/ or /vsizip/ path
+
+    Args:
+        path: File path, possibly virtual
+    """
+
+    def __init__(self, path):
+        kind, file_path, member = split_virtual(path)
+        self._raw = open(file_path, 'rb')
+        self._archive = None
+        try:
+            if kind == 'gzip':
+                self._size = os.fstat(self._raw.fileno()).st_size
+                self._stream = gzip.GzipFile(fileobj=self._raw)
+            elif kind == 'zip':
+                self._archive = zipfile.ZipFile(self._raw)
+                info = self._archive.getinfo(member)
+                self._size = info.file_size
+                self._stream = self._archive.open(info)
+            else:
+                self._size = os.fstat(self._raw.fileno()).st_size
+                self._stream = self._raw
+        except OSError:
+            self._raw.close()
+            raise
+        except (KeyError, zipfile.BadZipFile) as e:
+            self._raw.close()
+            raise OSError(f"Could not read {path}: {e}")
+        self._kind = kind
+
+    def read(self, size=-1):
+        return self._stream.read(size)
+
+    def fraction(self):
+        """Return the share of the input read so far (0-1)"""
+        # gzip: compressed bytes consumed; zip member and plain file: bytes read
+        position = self._raw.tell() if self._kind == 'gzip' else self._stream.tell()
+        return min(position / max(self._size, 1), 1.0)
+
+    def close(self):
+        """Close the stream and the underlying file"""
+        if self._stream is not self._raw:
+            self._stream.close()
+        if self._archive is not None:
+            self._archive.close()
+        self._raw.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
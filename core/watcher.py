@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""Folder watchers reporting files written into the hot folders.
+
+On Linux InotifyWatcher asks the kernel (inotify, through ctypes) for files
+closed after writing or moved into the folders, so an idle daemon does not
+touch the disk. Elsewhere, when inotify is not available (or its watch limit
+is reached) and on network shares, where inotify does not see writes of other
+machines, PollingWatcher compares folder listings instead. Both only report
+candidate paths; HotFolder decides when a file is completely written.
+"""
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+
+
+# inotify event masks (linux/inotify.h)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_Q_OVERFLOW = 0x00004000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+# struct inotify_event without the name: wd, mask, cookie, len
+_EVENT = struct.Struct('iIII')
+
+_READ_SIZE = 64 * 1024
+
+
+def _scan(folders):
+    """Return {path: (size, mtime_ns)} of the files in folders"""
+    stats = {}
+    for folder in folders:
+        try:
+            entries = list(os.scandir(folder))
+        except OSError:
+            continue
+        for entry in entries:
+            try:
+                if entry.is_file():
+                    stat = entry.stat()
+                    stats[entry.path] = (stat.st_size, stat.st_mtime_ns)
+            except OSError:
+                continue
+    return stats
+
+
+def _load_libc():
+    """Return libc with the inotify functions, or None if not available"""
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        libc.inotify_init1
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+class InotifyWatcher:
+    """Reports files closed after writing or moved into folders (Linux inotify)
+
+    Args:
+        folders: Folders to watch (not recursive)
+
+    Raises:
+        OSError: inotify is not available or a folder cannot be watched
+    """
+
+    name = 'inotify'
+
+    def __init__(self, folders):
+        libc = _load_libc()
+        if libc is None:
+            raise OSError("inotify is not available on this platform")
+
+        self._folders = list(folders)
+        self._fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+
+        self._watches = {}
+        for folder in self._folders:
+            wd = libc.inotify_add_watch(self._fd, os.fsencode(folder), IN_CLOSE_WRITE | IN_MOVED_TO)
+            if wd < 0:
+                error = ctypes.get_errno()
+                os.close(self._fd)
+                raise OSError(error, os.strerror(error), folder)
+            self._watches[wd] = folder
+
+    def changes(self, timeout):
+        """Wait up to timeout seconds, return the set of paths written since the last call"""
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return set()
+
+        paths = set()
+        while True:
+            try:
+                data = os.read(self._fd, _READ_SIZE)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = _EVENT.unpack_from(data, offset)
+                name = data[offset + _EVENT.size:offset + _EVENT.size + length].rstrip(b'\0')
+                offset += _EVENT.size + length
+                if mask & IN_Q_OVERFLOW:
+                    # Events were lost, report every file
+                    paths.update(_scan(self._folders))
+                elif wd in self._watches and name:
+                    paths.add(os.path.join(self._watches[wd], os.fsdecode(name)))
+        return paths
+
+    def close(self):
+        """Stop watching"""
+        os.close(self._fd)
+
+
+class PollingWatcher:
+    """Reports new or changed files by comparing folder listings (any platform)
+
+    Args:
+        folders: Folders to watch (not recursive)
+        interval: Seconds between listings
+    """
+
+    name = 'polling'
+
+    def __init__(self, folders, interval=2.0):
+        self._folders = list(folders)
+        self.interval = interval
+        self._stats = {}
+        self._last_scan = None
+
+    def changes(self, timeout):
+        """Wait up to timeout seconds, return the set of paths new or changed since the last listing"""
+        if self._last_scan is not None:
+            time.sleep(max(0.0, min(timeout, self._last_scan + self.interval - time.monotonic())))
+            if time.monotonic() - self._last_scan < self.interval:
+                return set()
+        self._last_scan = time.monotonic()
+
+        stats = _scan(self._folders)
+        paths = {path for path, stat in stats.items() if self._stats.get(path) != stat}
+        self._stats = stats
+        return paths
+
+    def close(self):
+        """Stop watching"""
+        self._stats = {}
+
+
+def make_watcher(folders, polling=False, interval=2.0):
+    """Return an InotifyWatcher, or a PollingWatcher if polling is requested or inotify fails
+
+    Returns:
+        Tuple (watcher, reason inotify is not used or None)
+    """
+    if not polling:
+        try:
+            return InotifyWatcher(folders), None
+        except OSError as e:
+            return PollingWatcher(folders, interval), str(e)
+    return PollingWatcher(folders, interval), None
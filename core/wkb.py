@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""In-place X/Y swap on WKB buffers.
+
+Used to fix KN parcels delivered with swapped lat/lon. Instead of rebuilding
+geometries point by point, the WKB is walked once to find its coordinate
+arrays and every array is swapped as a whole (NumPy view when available).
+
+Handles ISO WKB (Z/M as +1000/+2000/+3000), QGIS 2.5D / EWKB flags, and all
+simple, multi and curved geometry types, so Z/M values and curves survive.
+"""
+import struct
+import sys
+from array import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+# Geometry types whose body is a single point
+_POINT_TYPES = {1}
+# Geometry types whose body is a point array
+_CURVE_TYPES = {2, 8}
+# Geometry types whose body is an array of rings (point arrays)
+_RING_TYPES = {3, 17}
+# Geometry types whose body is a list of nested WKB geometries
+_COLLECTION_TYPES = {4, 5, 6, 7, 9, 10, 11, 12, 15, 16}
+
+_EWKB_Z = 0x80000000
+_EWKB_M = 0x40000000
+_EWKB_SRID = 0x20000000
+
+
+def _read_type(buf, offset):
+    """Read byte order and geometry type at offset
+
+    Returns:
+        Tuple (byte_order, base_type, dimension, offset after the header)
+    """
+    byte_order = '<' if buf[offset] == 1 else '>'
+    (wkb_type,) = struct.unpack_from(byte_order + 'I', buf, offset + 1)
+    offset += 5
+
+    has_z = bool(wkb_type & _EWKB_Z)
+    has_m = bool(wkb_type & _EWKB_M)
+    if wkb_type & _EWKB_SRID:
+        offset += 4
+    wkb_type &= 0x0FFFFFFF
+
+    base_type = wkb_type % 1000
+    iso_dims = wkb_type // 1000
+    has_z = has_z or iso_dims in (1, 3)
+    has_m = has_m or iso_dims in (2, 3)
+
+    return byte_order, base_type, 2 + has_z + has_m, offset
+
+
+def coordinate_arrays(buf, offset=0, runs=None):
+    """Find the coordinate arrays of a WKB geometry
+
+    Args:
+        buf: WKB bytes
+        offset: Offset of the geometry in buf
+        runs: List the arrays are appended to (created if None)
+
+    Returns:
+        Tuple (runs, end offset) where runs is a list of
+        (byte_order, offset, point_count, dimension)
+    """
+    if runs is None:
+        runs = []
+
+    byte_order, base_type, dim, offset = _read_type(buf, offset)
+    uint32 = byte_order + 'I'
+
+    if base_type in _POINT_TYPES:
+        runs.append((byte_order, offset, 1, dim))
+        offset += 8 * dim
+    elif base_type in _CURVE_TYPES:
+        (count,) = struct.unpack_from(uint32, buf, offset)
+        runs.append((byte_order, offset + 4, count, dim))
+        offset += 4 + 8 * dim * count
+    elif base_type in _RING_TYPES:
+        (rings,) = struct.unpack_from(uint32, buf, offset)
+        offset += 4
+        for _ in range(rings):
+            (count,) = struct.unpack_from(uint32, buf, offset)
+            runs.append((byte_order, offset + 4, count, dim))
+            offset += 4 + 8 * dim * count
+    elif base_type in _COLLECTION_TYPES:
+        (parts,) = struct.unpack_from(uint32, buf, offset)
+        offset += 4
+        for _ in range(parts):
+            runs, offset = coordinate_arrays(buf, offset, runs)
+    else:
+        raise ValueError(f"Unsupported WKB geometry type {base_type}")
+
+    return runs, offset
+
+
+def _swap_run_numpy(buf, byte_order, offset, count, dim):
+    coords = numpy.frombuffer(buf, dtype=byte_order + 'f8', count=count * dim, offset=offset)
+    coords = coords.reshape(count, dim)
+    coords[:, [0, 1]] = coords[:, [1, 0]]
+
+
+def _swap_run_array(buf, byte_order, offset, count, dim):
+    end = offset + 8 * count * dim
+    coords = array('d', bytes(buf[offset:end]))
+    native = (byte_order == '<') == (sys.byteorder == 'little')
+    if not native:
+        coords.byteswap()
+    coords[0::dim], coords[1::dim] = coords[1::dim], coords[0::dim]
+    if not native:
+        coords.byteswap()
+    buf[offset:end] = coords.tobytes()
+
+
+def swap_xy_wkb(buf):
+    """Swap X and Y of every vertex of a WKB geometry in place
+
+    Args:
+        buf: Writable WKB buffer (bytearray)
+
+    Returns:
+        Number of swapped vertices
+    """
+    runs, _ = coordinate_arrays(buf)
+    swap_run = _swap_run_numpy if numpy is not None else _swap_run_array
+
+    vertices = 0
+    for byte_order, offset, count, dim in runs:
+        if count:
+            swap_run(buf, byte_order, offset, count, dim)
+            vertices += count
+    return vertices
@@ -0,0 +1,6 @@
+# -*- coding: utf-8 -*-
+"""Make the plugin's core package importable without QGIS (python -m pytest from the plugin folder)"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
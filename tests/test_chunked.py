@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""Tests of the member index of the chunked GML parser (core/chunked.py)"""
+import mmap
+import xml.etree.ElementTree as ET
+
+import pytest
+
+pytest.importorskip('qgis.core')
+
+from core.chunked import MemberIndex, index_members, parse_range
+
+
+GML_NS = 'http://www.opengis.net/gml/3.2'
+CP_NS = 'http://inspire.ec.europa.eu/schemas/cp/4.0'
+
+_HEADER = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    f'<gml:FeatureCollection xmlns:gml="{GML_NS}" xmlns:cp="{CP_NS}" gml:id="fc">\n'
+)
+_FOOTER = '</gml:FeatureCollection>\n'
+
+
+def parcel(number):
+    return (
+        f'<cp:CadastralParcel gml:id="CP.{number}">'
+        f'<cp:label>{number}</cp:label>'
+        '<cp:geometry><gml:MultiSurface gml:id="MS.{0}" srsName="urn:ogc:def:crs:EPSG::4258">'
+        '<gml:surfaceMember><gml:Polygon gml:id="P.{0}"><gml:exterior><gml:LinearRing>'
+        '<gml:posList>48.1 17.1 48.2 17.1 48.2 17.2 48.1 17.1</gml:posList>'
+        '</gml:LinearRing></gml:exterior></gml:Polygon></gml:surfaceMember>'
+        '</gml:MultiSurface></cp:geometry>'
+        '</cp:CadastralParcel>'
+    ).replace('{0}', str(number))
+
+
+def feature_member_gml(count):
+    members = ''.join(f'<gml:featureMember>\n{parcel(n)}\n</gml:featureMember>\n' for n in range(count))
+    return (_HEADER + members + _FOOTER).encode()
+
+
+def feature_members_gml(count):
+    features = ''.join(f'{parcel(n)}\n' for n in range(count))
+    return (_HEADER + '<gml:featureMembers>\n' + features + '</gml:featureMembers>\n' + _FOOTER).encode()
+
+
+def parsed_ids(index, data, start, end):
+    """Return the gml:id of the parcels of a range wrapped like parse_range() does"""
+    root = ET.fromstring(index.root_start + data[start:end] + index.root_end)
+    return [element.get(f'{{{GML_NS}}}id') for element in root.iter(f'{{{CP_NS}}}CadastralParcel')]
+
+
+@pytest.mark.parametrize('make_gml, member_tag', [
+    (feature_member_gml, b'<gml:featureMember>'),
+    (feature_members_gml, b'<cp:CadastralParcel '),
+])
+def test_offsets_at_member_boundaries(make_gml, member_tag):
+    data = make_gml(7)
+
+    index = index_members(data)
+
+    assert len(index.offsets) == 7
+    assert all(data.startswith(member_tag, offset) for offset in index.offsets)
+    assert index.offsets == sorted(index.offsets)
+
+
+@pytest.mark.parametrize('make_gml', [feature_member_gml, feature_members_gml])
+@pytest.mark.parametrize('count', [1, 2, 3, 5, 40])
+def test_ranges_cover_all_members_in_order(make_gml, count):
+    data = make_gml(11)
+    index = index_members(data)
+
+    ranges = index.ranges(count)
+
+    assert 1 <= len(ranges) <= min(count, 11)
+    assert ranges[0][0] == index.offsets[0]
+    assert ranges[-1][1] == index.end
+    for (_, end), (start, _) in zip(ranges, ranges[1:]):
+        assert end == start
+    assert all(start in index.offsets and start < end for start, end in ranges)
+
+    ids = [gml_id for start, end in ranges for gml_id in parsed_ids(index, data, start, end)]
+    assert ids == [f'CP.{n}' for n in range(11)]
+
+
+def test_feature_members_wrapper_in_root_tags():
+    data = feature_members_gml(3)
+
+    index = index_members(data)
+
+    assert index.root_start.endswith(b'<gml:featureMembers>')
+    assert index.root_end == b'</gml:featureMembers></gml:FeatureCollection>'
+    assert data.startswith(b'</gml:featureMembers>', index.end)
+
+
+def test_mmap_buffer(tmp_path):
+    data = feature_members_gml(4)
+    path = tmp_path / 'members.gml'
+    path.write_bytes(data)
+
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+        index = index_members(buffer)
+
+    assert index.offsets == index_members(data).offsets
+    assert index.end == index_members(data).end
+
+
+def test_not_a_feature_collection():
+    assert index_members(b'') is None
+    assert index_members(_HEADER.encode()) is None
+
+
+def test_no_members():
+    index = index_members((_HEADER + _FOOTER).encode())
+
+    assert index.offsets == []
+    assert index.ranges(4) == []
+
+
+def test_ranges_of_single_member():
+    index = MemberIndex(b'<a>', b'</a>', [10], 50)
+
+    assert index.ranges(8) == [(10, 50)]
+
+
+@pytest.mark.parametrize('make_gml', [feature_member_gml, feature_members_gml])
+def test_parse_range(tmp_path, make_gml):
+    pytest.importorskip('numpy')
+    data = make_gml(6)
+    path = tmp_path / 'range.gml'
+    path.write_bytes(data)
+    index = index_members(data)
+    start, end = index.ranges(3)[1]
+
+    records, unknown = parse_range(str(path), index.root_start, index.root_end, start, end,
+                                   ['CadastralParcel'], True)
+
+    assert [record.layer for record in records] == ['CadastralParcel'] * len(records)
+    assert [record.values[0] for record in records] == parsed_ids(index, data, start, end)
+    assert unknown == set()
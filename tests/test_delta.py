@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+"""Tests of the in-place GPKG update (core/delta.py)"""
+import pytest
+
+pytest.importorskip('osgeo.ogr')
+pytest.importorskip('qgis.core')
+
+from osgeo import gdal
+from qgis.core import QgsCoordinateReferenceSystem, QgsFeature, QgsField, QgsFields, QgsGeometry
+from qgis.PyQt.QtCore import QVariant
+
+from core.delta import DeltaError, DeltaSink, HashRecorder, feature_hash, feature_key, key_indexes
+from core.gpkg_writer import GpkgWriter, read_feature_hashes
+from core.headless import start_qgis, stop_qgis
+
+
+LAYER = 'ParcelC'
+
+
+@pytest.fixture(scope='module', autouse=True)
+def qgis_app():
+    app = start_qgis()
+    yield app
+    stop_qgis(app)
+
+
+def make_fields():
+    fields = QgsFields()
+    for name in ('gml_id', 'localId', 'label'):
+        fields.append(QgsField(name, QVariant.String, 'string'))
+    return fields
+
+
+FIELDS = make_fields()
+
+
+def parcel(gml_id, label, x=0, local_id=None):
+    """Return a parcel QgsFeature, a unit square at x"""
+    feature = QgsFeature(FIELDS)
+    feature.setAttributes([gml_id, local_id if local_id is not None else gml_id, label])
+    feature.setGeometry(QgsGeometry.fromWkt(
+        f'MultiPolygon((({x} 0, {x + 1} 0, {x + 1} 1, {x} 1, {x} 0)))'
+    ))
+    return feature
+
+
+def write_full(path, features, hashes=True):
+    """Write a GPKG like a full conversion (with or without the feature hashes)"""
+    writer = GpkgWriter(str(path), QgsCoordinateReferenceSystem('EPSG:5514'),
+                        feature_hashes=HashRecorder() if hashes else None)
+    assert writer.create_layer(LAYER, FIELDS).addFeatures(features)
+    assert writer.close(), writer.error
+
+
+def update(path, features):
+    """Update a GPKG in place, return (inserted, updated, deleted)"""
+    sink = DeltaSink(str(path), [LAYER])
+    layer = sink.create_layer(LAYER, FIELDS)
+    if not layer.addFeatures(features):
+        sink.abort()
+        raise AssertionError(layer.errorMessage())
+    counts = sink.close()
+    assert counts is not None
+    return counts[LAYER]
+
+
+def rows(path):
+    """Return dict label -> (fid, gml_id) of the layer"""
+    dataset = gdal.OpenEx(str(path), gdal.OF_VECTOR)
+    result = {f.GetField('label'): (f.GetFID(), f.GetField('gml_id')) for f in dataset.GetLayerByName(LAYER)}
+    dataset = None
+    return result
+
+
+def stored_hashes(path):
+    dataset = gdal.OpenEx(str(path), gdal.OF_VECTOR)
+    hashes = read_feature_hashes(dataset, LAYER)
+    dataset = None
+    return hashes
+
+
+@pytest.fixture
+def gpkg(tmp_path):
+    path = tmp_path / 'out.gpkg'
+    write_full(path, [parcel('CP.1', 'a', 0), parcel('CP.2', 'b', 1), parcel('CP.3', 'c', 2)])
+    return path
+
+
+def test_feature_key_prefers_gml_id():
+    indexes = key_indexes(FIELDS)
+
+    assert feature_key(parcel('CP.1', 'a', local_id='1'), indexes) == 'CP.1'
+    assert feature_key(parcel('', 'a', local_id='1'), indexes) == '1'
+    assert feature_key(parcel('', 'a', local_id=''), indexes) is None
+
+
+def test_feature_hash_covers_geometry_and_attributes():
+    base = feature_hash(parcel('CP.1', 'a', 0))
+
+    assert feature_hash(parcel('CP.1', 'a', 0)) == base
+    assert feature_hash(parcel('CP.1', 'b', 0)) != base
+    assert feature_hash(parcel('CP.1', 'a', 5)) != base
+
+
+def test_full_conversion_stores_hashes(gpkg):
+    assert set(stored_hashes(gpkg)) == {'CP.1', 'CP.2', 'CP.3'}
+
+
+def test_unchanged_features_are_not_written(gpkg):
+    before = rows(gpkg)
+
+    assert update(gpkg, [parcel('CP.1', 'a', 0), parcel('CP.2', 'b', 1), parcel('CP.3', 'c', 2)]) == (0, 0, 0)
+    assert rows(gpkg) == before
+
+
+def test_insert_update_delete(gpkg):
+    before = rows(gpkg)
+
+    counts = update(gpkg, [parcel('CP.1', 'a', 0), parcel('CP.2', 'b2', 1), parcel('CP.4', 'd', 3)])
+
+    assert counts == (1, 1, 1)
+    after = rows(gpkg)
+    assert set(after) == {'a', 'b2', 'd'}
+    # Kept and updated rows keep their fid
+    assert after['a'] == before['a']
+    assert after['b2'][0] == before['b'][0]
+    assert set(stored_hashes(gpkg)) == {'CP.1', 'CP.2', 'CP.4'}
+    # The stored hashes match the new data
+    assert update(gpkg, [parcel('CP.1', 'a', 0), parcel('CP.2', 'b2', 1), parcel('CP.4', 'd', 3)]) == (0, 0, 0)
+
+
+def test_geometry_change_is_an_update(gpkg):
+    assert update(gpkg, [parcel('CP.1', 'a', 0), parcel('CP.2', 'b', 7), parcel('CP.3', 'c', 2)]) == (0, 1, 0)
+
+
+def test_file_without_hashes_only_gets_hashes(tmp_path):
+    path = tmp_path / 'plain.gpkg'
+    features = [parcel('CP.1', 'a', 0), parcel('CP.2', 'b', 1)]
+    write_full(path, features, hashes=False)
+    assert stored_hashes(path) == {}
+
+    assert update(path, features) == (0, 0, 0)
+    assert set(stored_hashes(path)) == {'CP.1', 'CP.2'}
+    assert update(path, [parcel('CP.1', 'a', 0), parcel('CP.2', 'b2', 1)]) == (0, 1, 0)
+
+
+def test_file_without_hashes_changed_row_is_updated(tmp_path):
+    path = tmp_path / 'plain.gpkg'
+    write_full(path, [parcel('CP.1', 'a', 0), parcel('CP.2', 'b', 1)], hashes=False)
+
+    assert update(path, [parcel('CP.1', 'a', 0), parcel('CP.2', 'b2', 1)]) == (0, 1, 0)
+
+
+def test_local_id_is_the_key_without_gml_id(tmp_path):
+    path = tmp_path / 'local.gpkg'
+    write_full(path, [parcel('', 'a', 0, local_id='1'), parcel('', 'b', 1, local_id='2')])
+
+    assert update(path, [parcel('', 'a', 0, local_id='1'), parcel('', 'b2', 1, local_id='2')]) == (0, 1, 0)
+
+
+def test_keyless_features_are_replaced(tmp_path):
+    path = tmp_path / 'keyless.gpkg'
+    write_full(path, [parcel('CP.1', 'a', 0), parcel('', 'x', 1, local_id=''), parcel('', 'y', 2, local_id='')])
+
+    counts = update(path, [parcel('CP.1', 'a', 0), parcel('', 'x', 1, local_id=''), parcel('', 'z', 3, local_id='')])
+
+    assert counts == (2, 0, 2)
+    assert set(rows(path)) == {'a', 'x', 'z'}
+
+
+def test_duplicate_key_in_new_data_fails_and_rolls_back(gpkg):
+    before = rows(gpkg)
+    sink = DeltaSink(str(gpkg), [LAYER])
+    layer = sink.create_layer(LAYER, FIELDS)
+
+    assert not layer.addFeatures([parcel('CP.4', 'd', 3), parcel('CP.4', 'e', 4)])
+    assert 'Duplicate key CP.4' in layer.errorMessage()
+    sink.abort()
+    assert rows(gpkg) == before
+
+
+def test_duplicate_key_in_file_is_rejected(tmp_path):
+    path = tmp_path / 'duplicates.gpkg'
+    write_full(path, [parcel('CP.1', 'a', 0), parcel('CP.1', 'b', 1)])
+
+    with pytest.raises(DeltaError, match='Duplicate key CP.1'):
+        DeltaSink(str(path), [LAYER])
+
+
+def test_missing_layer_is_rejected(gpkg):
+    with pytest.raises(DeltaError, match='ParcelE'):
+        DeltaSink(str(gpkg), [LAYER, 'ParcelE'])
+
+
+def test_not_a_geopackage(tmp_path):
+    path = tmp_path / 'broken.gpkg'
+    path.write_bytes(b'not a geopackage')
+
+    with pytest.raises(DeltaError):
+        DeltaSink(str(path), [LAYER])
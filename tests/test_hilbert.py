@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""Tests of the Hilbert curve ordering (core/hilbert.py)"""
+import pytest
+
+from core.hilbert import hilbert_index, hilbert_order, hilbert_sort
+
+
+def test_first_order_curve():
+    assert [hilbert_index(x, y, 1) for x, y in [(0, 0), (0, 1), (1, 1), (1, 0)]] == [0, 1, 2, 3]
+
+
+@pytest.mark.parametrize('order', [1, 2, 3, 5])
+def test_index_is_a_continuous_bijection(order):
+    n = 1 << order
+    cells = {hilbert_index(x, y, order): (x, y) for x in range(n) for y in range(n)}
+
+    assert sorted(cells) == list(range(n * n))
+    for d in range(n * n - 1):
+        (x0, y0), (x1, y1) = cells[d], cells[d + 1]
+        assert abs(x0 - x1) + abs(y0 - y1) == 1
+
+
+def test_order_follows_the_curve():
+    # Centres of a 4 x 4 grid in Slovak S-JTSK coordinates, shuffled
+    points = [(-500000.0 + 10 * x, -1200000.0 + 10 * y) for y in range(4) for x in range(4)]
+    points = points[5:] + points[:5]
+
+    ordered = [points[i] for i in hilbert_order(points, order=2)]
+
+    assert ordered[0] == (-500000.0, -1200000.0)
+    for (x0, y0), (x1, y1) in zip(ordered, ordered[1:]):
+        assert abs(x0 - x1) + abs(y0 - y1) == 10
+
+
+def test_missing_geometries_last_in_input_order():
+    points = [None, (1.0, 1.0), None, (0.0, 0.0)]
+
+    assert hilbert_order(points) == [3, 1, 0, 2]
+
+
+def test_degenerate_extents():
+    assert hilbert_order([]) == []
+    assert hilbert_order([None, None]) == [0, 1]
+    # Identical points keep their input order
+    assert hilbert_order([(5.0, 5.0)] * 3) == [0, 1, 2]
+    # Extent on one axis only
+    assert hilbert_order([(0.0, 3.0), (0.0, 1.0), (0.0, 2.0)]) == [1, 2, 0]
+
+
+class _Point:
+    def __init__(self, x, y):
+        self._x, self._y = x, y
+
+    def x(self):
+        return self._x
+
+    def y(self):
+        return self._y
+
+
+class _Box:
+    def __init__(self, x, y):
+        self._center = _Point(x, y)
+
+    def center(self):
+        return self._center
+
+
+class _Geometry:
+    def __init__(self, center):
+        self._center = center
+
+    def isNull(self):
+        return self._center is None
+
+    def boundingBox(self):
+        return _Box(*self._center)
+
+
+class _Feature:
+    """Stand-in for QgsFeature with the methods hilbert_sort() uses"""
+
+    def __init__(self, name, center):
+        self.name = name
+        self._geometry = _Geometry(center)
+
+    def geometry(self):
+        return self._geometry
+
+
+def test_sort_features_by_bounding_box_centre():
+    features = [_Feature('empty', None), _Feature('far', (3.0, 0.0)), _Feature('origin', (0.0, 0.0)),
+                _Feature('up', (0.0, 3.0))]
+
+    assert [feature.name for feature in hilbert_sort(features, order=2)] == ['origin', 'up', 'far', 'empty']
@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+"""Tests of the conversion manifest (core/manifest.py)"""
+import os
+import zipfile
+
+import pytest
+
+from core import manifest as manifest_module
+from core.manifest import Manifest, complete_record
+
+
+SETTINGS = {'version': '1.0', 'reader': 'ogr'}
+
+
+@pytest.fixture
+def folder(tmp_path):
+    """Input folder with one pair and an empty output folder"""
+    (tmp_path / 'C').mkdir()
+    (tmp_path / 'E').mkdir()
+    (tmp_path / 'out').mkdir()
+    (tmp_path / 'C' / '800001.gml').write_bytes(b'<C>parcels</C>')
+    (tmp_path / 'E' / '800001.gml').write_bytes(b'<E>parcels</E>')
+    return tmp_path
+
+
+@pytest.fixture
+def hashed(monkeypatch):
+    """Record the files hashed by the manifest"""
+    paths = []
+    file_hash = manifest_module.file_hash
+
+    def recording_hash(path):
+        paths.append(os.path.basename(os.path.dirname(path)))
+        return file_hash(path)
+
+    monkeypatch.setattr(manifest_module, 'file_hash', recording_hash)
+    return paths
+
+
+def pairs_of(folder):
+    return [(str(folder / 'C' / '800001.gml'), str(folder / 'E' / '800001.gml'), '800001.gml')]
+
+
+def files_for(folder):
+    return lambda basename: {'GPKG': str(folder / 'out' / basename.replace('.gml', '.gpkg'))}
+
+
+def convert(folder, settings=SETTINGS):
+    """Plan, 'convert' and record the pairs of folder like a batch does"""
+    manifest = Manifest(str(folder / 'out'))
+    todo, unchanged, records = manifest.plan(pairs_of(folder), files_for(folder), settings)
+    for c_path, e_path, filename in todo:
+        complete_record(records[filename], c_path, e_path)
+        files = files_for(folder)(filename)
+        for path in files.values():
+            with open(path, 'wb') as f:
+                f.write(b'output')
+        manifest.update(filename, records[filename], files)
+    manifest.save()
+    return todo, unchanged
+
+
+def plan(folder, settings=SETTINGS):
+    todo, unchanged, records = Manifest(str(folder / 'out')).plan(pairs_of(folder), files_for(folder), settings)
+    return [filename for _, _, filename in todo], unchanged, records
+
+
+def touch(path, content=None):
+    """Rewrite a file (or only move its mtime) so its stats change"""
+    stat = os.stat(path)
+    if content is not None:
+        path.write_bytes(content)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+
+def test_first_run_converts_without_hashing(folder, hashed):
+    todo, unchanged, records = plan(folder)
+
+    assert todo == ['800001.gml'] and unchanged == []
+    assert records['800001.gml']['inputs']['C']['hash'] is None
+    assert hashed == []
+
+
+def test_unchanged_pair_is_skipped_from_stats(folder, hashed):
+    convert(folder)
+    del hashed[:]
+
+    todo, unchanged, _ = plan(folder)
+
+    assert todo == [] and unchanged == ['800001.gml']
+    assert hashed == []
+
+
+def test_new_mtime_same_content_is_hashed_and_skipped(folder, hashed):
+    convert(folder)
+    del hashed[:]
+    touch(folder / 'C' / '800001.gml')
+
+    todo, unchanged, records = plan(folder)
+
+    assert unchanged == ['800001.gml']
+    assert hashed == ['C']
+    assert records['800001.gml']['inputs']['C']['hash'] is not None
+
+
+def test_same_size_new_content_is_converted(folder):
+    convert(folder)
+    touch(folder / 'E' / '800001.gml', b'<E>changed</E>')
+
+    todo, unchanged, _ = plan(folder)
+
+    assert todo == ['800001.gml'] and unchanged == []
+
+
+def test_new_size_is_converted_without_hashing(folder, hashed):
+    convert(folder)
+    del hashed[:]
+    touch(folder / 'E' / '800001.gml', b'<E>more parcels</E>')
+
+    todo, _, records = plan(folder)
+
+    assert todo == ['800001.gml']
+    assert records['800001.gml']['inputs']['E']['hash'] is None
+    assert hashed == []
+
+
+def test_changed_settings_are_converted_without_hashing(folder, hashed):
+    convert(folder)
+    del hashed[:]
+    touch(folder / 'C' / '800001.gml')
+
+    todo, _, _ = plan(folder, dict(SETTINGS, reader='native'))
+
+    assert todo == ['800001.gml']
+    assert hashed == []
+
+
+def test_missing_output_is_converted(folder):
+    convert(folder)
+    os.remove(folder / 'out' / '800001.gpkg')
+
+    todo, _, _ = plan(folder)
+
+    assert todo == ['800001.gml']
+
+
+def test_other_output_format_is_converted(folder):
+    convert(folder)
+    manifest = Manifest(str(folder / 'out'))
+    files = {'DXF': str(folder / 'out' / '800001.dxf')}
+    record = manifest.pair_record(*pairs_of(folder)[0], SETTINGS, files)
+
+    assert not manifest.is_unchanged('800001.gml', record, files)
+
+
+def test_record_without_hash_never_matches(folder):
+    convert(folder)
+    manifest = Manifest(str(folder / 'out'))
+    files = files_for(folder)('800001.gml')
+    record = manifest.pair_record(*pairs_of(folder)[0], SETTINGS, files)
+    record['inputs']['C'] = dict(record['inputs']['C'], hash=None)
+
+    assert not manifest.is_unchanged('800001.gml', record, files)
+
+
+def test_update_keeps_outputs_of_the_same_conversion(folder):
+    convert(folder)
+    manifest = Manifest(str(folder / 'out'))
+    record = manifest.pair_record(*pairs_of(folder)[0], SETTINGS)
+
+    manifest.update('800001.gml', record, {'DXF': str(folder / 'out' / '800001.dxf')})
+
+    assert manifest.pairs['800001.gml']['outputs'] == ['800001.dxf', '800001.gpkg']
+
+
+def test_other_manifest_version_is_ignored(folder):
+    convert(folder)
+    path = folder / 'out' / manifest_module.MANIFEST_NAME
+    path.write_text(path.read_text().replace('"version": 1', '"version": 0'))
+
+    todo, _, _ = plan(folder)
+
+    assert todo == ['800001.gml']
+
+
+def test_zip_member_hashed_from_archive_directory(folder, hashed):
+    archive = folder / 'C' / 'C.zip'
+    with zipfile.ZipFile(archive, 'w') as f:
+        f.writestr('800001.gml', b'<C>parcels</C>')
+    os.remove(folder / 'C' / '800001.gml')
+    pairs = [(f'/vsizip/{archive}/800001.gml', str(folder / 'E' / '800001.gml'), '800001.gml')]
+
+    manifest = Manifest(str(folder / 'out'))
+    record = complete_record(manifest.pair_record(*pairs[0], SETTINGS), *pairs[0][:2])
+    files = files_for(folder)('800001.gml')
+    (folder / 'out' / '800001.gpkg').write_bytes(b'output')
+    manifest.update('800001.gml', record, files)
+    manifest.save()
+
+    # Downloaded again: new archive, same member
+    with zipfile.ZipFile(archive, 'w') as f:
+        f.writestr('800001.gml', b'<C>parcels</C>')
+        f.writestr('readme.txt', b'new')
+    touch(archive)
+    del hashed[:]
+
+    todo, unchanged, records = Manifest(str(folder / 'out')).plan(pairs, files_for(folder), SETTINGS)
+
+    assert unchanged == ['800001.gml']
+    assert records['800001.gml']['inputs']['C']['hash'].startswith('zip-crc32-')
+    assert hashed == []
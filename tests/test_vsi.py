@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""Tests of the zipped and gzipped input paths (core/vsi.py)"""
+import gzip
+import os
+import zipfile
+
+import pytest
+
+from core.vsi import VsiFile, expand_inputs, gml_basename, list_inputs, real_path, split_virtual
+
+
+@pytest.mark.parametrize('path, name', [
+    ('/data/C/800001.gml', '800001.gml'),
+    ('/vsigzip//data/C/800001.gml.gz', '800001.gml'),
+    ('/vsigzip//data/C/800001.GML.GZ', '800001.GML'),
+    ('/vsizip//data/C.zip/800001.gml', '800001.gml'),
+    ('/vsizip//data/C.zip/KN/800001.gml', '800001.gml'),
+])
+def test_gml_basename(path, name):
+    assert gml_basename(path) == name
+
+
+@pytest.mark.parametrize('path, parts', [
+    ('/data/800001.gml', ('file', '/data/800001.gml', None)),
+    ('/vsigzip//data/800001.gml.gz', ('gzip', '/data/800001.gml.gz', None)),
+    ('/vsizip//data/C.zip/KN/800001.gml', ('zip', '/data/C.zip', 'KN/800001.gml')),
+    ('/vsizip//data/C.ZIP/800001.gml', ('zip', '/data/C.ZIP', '800001.gml')),
+    ('/vsizip//data/C.zip', ('zip', '/data/C.zip', '')),
+])
+def test_split_virtual(path, parts):
+    assert split_virtual(path) == parts
+    assert real_path(path) == parts[1]
+
+
+def test_expand_inputs(tmp_path):
+    archive = tmp_path / 'C.zip'
+    with zipfile.ZipFile(archive, 'w') as f:
+        f.writestr('800002.gml', b'<b/>')
+        f.writestr('KN/800001.GML', b'<a/>')
+        f.writestr('readme.txt', b'')
+    broken = tmp_path / 'broken.zip'
+    broken.write_bytes(b'not a zip')
+    plain = str(tmp_path / '800003.gml')
+    gzipped = str(tmp_path / '800004.gml.gz')
+
+    paths, unreadable = expand_inputs([str(archive), plain, gzipped, str(broken)])
+
+    assert paths == [
+        f'/vsizip/{archive}/800002.gml',
+        f'/vsizip/{archive}/KN/800001.GML',
+        plain,
+        f'/vsigzip/{gzipped}',
+    ]
+    assert unreadable == [str(broken)]
+    assert [gml_basename(path) for path in paths] == ['800002.gml', '800001.GML', '800003.gml', '800004.gml']
+
+
+def test_list_inputs(tmp_path):
+    for name in ('800001.gml', '800002.gml.gz', 'notes.txt', '800001.gfs'):
+        (tmp_path / name).write_bytes(b'')
+
+    assert list_inputs(str(tmp_path)) == [
+        os.path.join(str(tmp_path), '800001.gml'),
+        f"/vsigzip/{os.path.join(str(tmp_path), '800002.gml.gz')}",
+    ]
+
+
+@pytest.mark.parametrize('kind', ['file', 'gzip', 'zip'])
+def test_vsi_file_reads_member(tmp_path, kind):
+    data = b'<gml:FeatureCollection/>' * 1000
+    if kind == 'file':
+        path = str(tmp_path / '800001.gml')
+        with open(path, 'wb') as f:
+            f.write(data)
+    elif kind == 'gzip':
+        with gzip.open(tmp_path / '800001.gml.gz', 'wb') as f:
+            f.write(data)
+        path = f"/vsigzip/{tmp_path / '800001.gml.gz'}"
+    else:
+        with zipfile.ZipFile(tmp_path / 'C.zip', 'w', zipfile.ZIP_DEFLATED) as f:
+            f.writestr('800001.gml', data)
+        path = f"/vsizip/{tmp_path / 'C.zip'}/800001.gml"
+
+    with VsiFile(path) as stream:
+        assert stream.fraction() == 0.0
+        assert stream.read(10) == data[:10]
+        assert stream.read() == data[10:]
+        assert stream.fraction() == pytest.approx(1.0, abs=0.05)
+
+
+def test_vsi_file_missing_member(tmp_path):
+    with zipfile.ZipFile(tmp_path / 'C.zip', 'w') as f:
+        f.writestr('800001.gml', b'')
+
+    with pytest.raises(OSError):
+        VsiFile(f"/vsizip/{tmp_path / 'C.zip'}/800002.gml")
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""Tests of the in-place X/Y swap on WKB buffers (core/wkb.py)"""
+import struct
+
+import pytest
+
+from core import wkb
+from core.wkb import coordinate_arrays, swap_xy_wkb
+
+
+def point_array(points, byte_order='<'):
+    body = struct.pack(byte_order + 'I', len(points))
+    for point in points:
+        body += struct.pack(byte_order + 'd' * len(point), *point)
+    return body
+
+
+def header(wkb_type, byte_order='<'):
+    return bytes([1 if byte_order == '<' else 0]) + struct.pack(byte_order + 'I', wkb_type)
+
+
+def linestring(points, wkb_type=2, byte_order='<'):
+    return header(wkb_type, byte_order) + point_array(points, byte_order)
+
+
+def polygon(rings, wkb_type=3, byte_order='<'):
+    body = struct.pack(byte_order + 'I', len(rings))
+    for ring in rings:
+        body += point_array(ring, byte_order)
+    return header(wkb_type, byte_order) + body
+
+
+def collection(parts, wkb_type, byte_order='<'):
+    return header(wkb_type, byte_order) + struct.pack(byte_order + 'I', len(parts)) + b''.join(parts)
+
+
+def coordinates(buf):
+    """Return all vertices of a WKB buffer as tuples"""
+    runs, _ = coordinate_arrays(buf)
+    points = []
+    for byte_order, offset, count, dim in runs:
+        for index in range(count):
+            points.append(struct.unpack_from(byte_order + 'd' * dim, buf, offset + index * 8 * dim))
+    return points
+
+
+def swapped(points):
+    return [(point[1], point[0]) + tuple(point[2:]) for point in points]
+
+
+RING = [(48.1, 17.1), (48.2, 17.1), (48.2, 17.2), (48.1, 17.1)]
+RING_ZM = [(48.1, 17.1, 120.0, 1.0), (48.2, 17.1, 121.0, 2.0), (48.2, 17.2, 122.0, 3.0), (48.1, 17.1, 120.0, 1.0)]
+
+
+@pytest.fixture(params=['array', 'numpy'])
+def swap_backend(request, monkeypatch):
+    """Run a test with the array fallback and with NumPy"""
+    if request.param == 'array':
+        monkeypatch.setattr(wkb, 'numpy', None)
+    elif wkb.numpy is None:
+        pytest.skip("NumPy is not installed")
+    return request.param
+
+
+@pytest.mark.parametrize('byte_order', ['<', '>'])
+def test_polygon(swap_backend, byte_order):
+    buf = bytearray(polygon([RING, RING[::-1]], byte_order=byte_order))
+    before = coordinates(buf)
+
+    assert swap_xy_wkb(buf) == 8
+    assert coordinates(buf) == swapped(before)
+
+
+@pytest.mark.parametrize('wkb_type, ring', [
+    (1003, [point[:3] for point in RING_ZM]),
+    (2003, [point[:2] + point[3:] for point in RING_ZM]),
+    (3003, RING_ZM),
+])
+def test_iso_z_m_values_stay(swap_backend, wkb_type, ring):
+    buf = bytearray(polygon([ring], wkb_type))
+
+    swap_xy_wkb(buf)
+
+    assert coordinates(buf) == swapped(ring)
+
+
+def test_ewkb_flags_and_srid(swap_backend):
+    wkb_type = 3 | 0x80000000 | 0x20000000
+    ring = [point[:3] for point in RING_ZM]
+    body = struct.pack('<I', 1) + point_array(ring)
+    buf = bytearray(header(wkb_type) + struct.pack('<I', 4258) + body)
+
+    assert swap_xy_wkb(buf) == 4
+    assert coordinates(buf) == swapped(ring)
+    assert struct.unpack_from('<I', buf, 5) == (4258,)
+
+
+def test_multipolygon_mixed_byte_order(swap_backend):
+    buf = bytearray(collection([polygon([RING]), polygon([RING], byte_order='>')], 6))
+
+    assert swap_xy_wkb(buf) == 8
+    assert coordinates(buf) == swapped(RING + RING)
+
+
+def test_curves(swap_backend):
+    arc = linestring(RING[:3], wkb_type=8)
+    line = linestring(RING[2:], wkb_type=2)
+    compound = collection([arc, line], 9)
+    buf = bytearray(collection([compound], 10))
+    before = coordinates(buf)
+
+    assert swap_xy_wkb(buf) == 5
+    assert coordinates(buf) == swapped(before)
+
+
+def test_end_offset_of_nested_geometries():
+    buf = collection([polygon([RING]), linestring(RING)], 7)
+
+    runs, end = coordinate_arrays(buf)
+
+    assert end == len(buf)
+    assert [count for _, _, count, _ in runs] == [4, 4]
+
+
+def test_empty_geometry(swap_backend):
+    buf = bytearray(polygon([]))
+
+    assert swap_xy_wkb(buf) == 0
+
+
+def test_unsupported_type():
+    with pytest.raises(ValueError):
+        swap_xy_wkb(bytearray(header(99) + b'\0' * 16))
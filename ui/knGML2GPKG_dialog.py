@@ -2,12 +2,25 @@
 import os
 from qgis.PyQt import uic
 from qgis.PyQt import QtWidgets
+from qgis.core import Qgis
 from qgis.PyQt.QtCore import Qt, QSettings
-from qgis.PyQt.QtWidgets import QFileDialog
+from qgis.PyQt.QtGui import QTextCursor
+from qgis.PyQt.QtWidgets import QFileDialog, QMessageBox
+
+from ..core.vsi import INPUT_PATTERNS, expand_inputs, gml_basename, list_inputs
 
 FORM_CLASS, _ = uic.loadUiType(os.path.join(
     os.path.dirname(__file__), 'knGML2GPKG_dialog_base.ui'))
 
+# Lines kept in the log window (older lines are removed)
+MAX_LOG_LINES = 5000
+
+# File dialog filter for GML inputs, also offering gzipped files and ZIP archives
+GML_FILTER = f"GML Files ({' '.join(INPUT_PATTERNS)});;All Files (*)"
+
+# Log level combo box index -> lowest message level shown
+LOG_LEVELS = [Qgis.Info, Qgis.Warning, Qgis.Critical]
+
 
 class knGML2GPKGDialog(QtWidgets.QDialog, FORM_CLASS):
     def __init__(self, parent=None):
@@ -38,6 +51,12 @@ class knGML2GPKGDialog(QtWidgets.QDialog, FORM_CLASS):
         self.lineEdit_defaultC.textChanged.connect(self.save_settings)
         self.lineEdit_defaultE.textChanged.connect(self.save_settings)
         self.lineEdit_gpkg.textChanged.connect(self.save_settings)
+        self.spinBox_parallel.valueChanged.connect(self.save_settings)
+        self.checkBox_update.toggled.connect(self.save_settings)
+        self.comboBox_logLevel.currentIndexChanged.connect(self.save_settings)
+        self.checkBox_profile.toggled.connect(self.save_settings)
+
+        self.textEdit_log.document().setMaximumBlockCount(MAX_LOG_LINES)
 
         # Load settings
         self.load_settings()
@@ -76,10 +95,18 @@ class knGML2GPKGDialog(QtWidgets.QDialog, FORM_CLASS):
         default_c = self.settings.value('default_c_folder', os.path.join(downloads_dir, 'SlovenskoC'))
         default_e = self.settings.value('default_e_folder', os.path.join(downloads_dir, 'SlovenskoE'))
         default_gpkg = self.settings.value('default_gpkg_folder', downloads_dir)
+        parallel_tasks = int(self.settings.value('parallel_tasks', 1))
+        update_existing = self.settings.value('update_existing', False, type=bool)
+        log_level = int(self.settings.value('log_level', 0))
+        profile = self.settings.value('profile', False, type=bool)
 
         self.lineEdit_defaultC.setText(default_c)
         self.lineEdit_defaultE.setText(default_e)
         self.lineEdit_gpkg.setText(default_gpkg)
+        self.spinBox_parallel.setValue(parallel_tasks)
+        self.checkBox_update.setChecked(update_existing)
+        self.comboBox_logLevel.setCurrentIndex(log_level)
+        self.checkBox_profile.setChecked(profile)
 
         # Create output folder if it doesn't exist
         if not os.path.exists(default_gpkg):
@@ -90,6 +117,10 @@ class knGML2GPKGDialog(QtWidgets.QDialog, FORM_CLASS):
         self.settings.setValue('default_c_folder', self.lineEdit_defaultC.text())
         self.settings.setValue('default_e_folder', self.lineEdit_defaultE.text())
         self.settings.setValue('default_gpkg_folder', self.lineEdit_gpkg.text())
+        self.settings.setValue('parallel_tasks', self.spinBox_parallel.value())
+        self.settings.setValue('update_existing', self.checkBox_update.isChecked())
+        self.settings.setValue('log_level', self.comboBox_logLevel.currentIndex())
+        self.settings.setValue('profile', self.checkBox_profile.isChecked())
 
     def browse_default_c(self):
         """Browse for default Register C folder"""
@@ -121,10 +152,10 @@ class knGML2GPKGDialog(QtWidgets.QDialog, FORM_CLASS):
             self,
             "Select Register C GML Files (can select multiple)",
             default_folder,
-            "GML Files (*.gml);;All Files (*)"
+            GML_FILTER
         )
         if filenames:
-            self.selected_files_c = sorted(filenames)
+            self.selected_files_c = self.expand_selection(filenames)
             count = len(self.selected_files_c)
             if count == 1:
                 self.label_filesC.setText(f"1 file: {os.path.basename(self.selected_files_c[0])}")
@@ -134,6 +165,16 @@ class knGML2GPKGDialog(QtWidgets.QDialog, FORM_CLASS):
             # Auto-pick matching files from default Register E folder
             self.auto_pick_register_e_files()
 
+    def expand_selection(self, filenames):
+        """Return the sorted GML paths of selected files, ZIP archives expanded to their members"""
+        gml_paths, unreadable = expand_inputs(filenames)
+        if unreadable:
+            QMessageBox.warning(
+                self, 'Warning',
+                "Could not read archives:\n" + "\n".join(os.path.basename(path) for path in unreadable)
+            )
+        return sorted(gml_paths)
+
     def auto_pick_register_e_files(self):
         """Auto-pick matching Register E files based on selected Register C files"""
         default_e_folder = self.lineEdit_defaultE.text()
@@ -142,14 +183,14 @@ class knGML2GPKGDialog(QtWidgets.QDialog, FORM_CLASS):
         if not default_e_folder or not os.path.exists(default_e_folder):
             return
 
+        # Index the E folder (including members of ZIP archives and .gml.gz files) by GML name
+        e_files = {gml_basename(path): path for path in list_inputs(default_e_folder)}
+
         # Find matching E files for selected C files
         matched_files = []
         for c_file in self.selected_files_c:
-            basename = os.path.basename(c_file)
-            e_file_path = os.path.join(default_e_folder, basename)
-
-            # Check if matching file exists in E folder
-            if os.path.exists(e_file_path):
+            e_file_path = e_files.get(gml_basename(c_file))
+            if e_file_path:
                 matched_files.append(e_file_path)
 
         # Update selected E files and label
@@ -175,10 +216,10 @@ class knGML2GPKGDialog(QtWidgets.QDialog, FORM_CLASS):
             self,
             "Select Register E GML Files (can select multiple)",
             default_folder,
-            "GML Files (*.gml);;All Files (*)"
+            GML_FILTER
         )
         if filenames:
-            self.selected_files_e = sorted(filenames)
+            self.selected_files_e = self.expand_selection(filenames)
             count = len(self.selected_files_e)
             if count == 1:
                 self.label_filesE.setText(f"1 file: {os.path.basename(self.selected_files_e[0])}")
@@ -197,16 +238,43 @@ class knGML2GPKGDialog(QtWidgets.QDialog, FORM_CLASS):
 
     def log(self, message):
         """Add message to log"""
-        self.textEdit_log.append(message)
+        self.log_lines([message])
+
+    def log_lines(self, lines):
+        """Add several messages to the log in one edit"""
+        cursor = QTextCursor(self.textEdit_log.document())
+        cursor.movePosition(QTextCursor.End)
+        if not self.textEdit_log.document().isEmpty():
+            cursor.insertBlock()
+        cursor.insertText('\n'.join(lines))
+        scroll_bar = self.textEdit_log.verticalScrollBar()
+        scroll_bar.setValue(scroll_bar.maximum())
 
     def set_progress(self, value):
         """Set progress bar value"""
         self.progressBar.setValue(value)
 
-    def get_output_format(self):
-        """Get selected output format"""
-        if self.radioButton_gpkg.isChecked():
-            return 'GPKG'
-        elif self.radioButton_dxf.isChecked():
-            return 'DXF'
-        return 'GPKG'  # Default to GPKG
+    def get_parallel_tasks(self):
+        """Get number of GML pairs converted at the same time"""
+        return self.spinBox_parallel.value()
+
+    def get_update_existing(self):
+        """Get whether existing GeoPackages are updated in place"""
+        return self.checkBox_update.isChecked()
+
+    def get_profile(self):
+        """Get whether profiling reports are written"""
+        return self.checkBox_profile.isChecked()
+
+    def get_log_level(self):
+        """Get the lowest message level shown in the log"""
+        return LOG_LEVELS[self.comboBox_logLevel.currentIndex()]
+
+    def get_output_formats(self):
+        """Get selected output formats (all are written in one pass)"""
+        formats = []
+        if self.checkBox_gpkg.isChecked():
+            formats.append('GPKG')
+        if self.checkBox_dxf.isChecked():
+            formats.append('DXF')
+        return formats